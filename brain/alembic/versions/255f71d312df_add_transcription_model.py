@@ -0,0 +1,32 @@
+"""
+add transcription_model to processed_messages.
+
+Revision ID: 255f71d312df
+Revises: c2e9d41a7b05
+Create Date: 2026-10-18 11:26:14.508317
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "255f71d312df"
+down_revision: str | Sequence[str] | None = "c2e9d41a7b05"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "processed_messages", sa.Column("transcription_model", sa.String(), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("processed_messages", "transcription_model")
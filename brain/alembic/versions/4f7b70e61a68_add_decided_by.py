@@ -0,0 +1,30 @@
+"""
+add decided_by to processed_messages.
+
+Revision ID: 4f7b70e61a68
+Revises: aab896a5964f
+Create Date: 2026-10-18 09:12:05.318204
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "4f7b70e61a68"
+down_revision: str | Sequence[str] | None = "aab896a5964f"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("processed_messages", sa.Column("decided_by", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("processed_messages", "decided_by")
@@ -0,0 +1,37 @@
+"""
+add media_sha256 to processed_messages.
+
+Revision ID: 9b1c4e07d2a3
+Revises: 255f71d312df
+Create Date: 2026-10-18 12:04:52.190736
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9b1c4e07d2a3"
+down_revision: str | Sequence[str] | None = "255f71d312df"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("processed_messages", sa.Column("media_sha256", sa.String(), nullable=True))
+    op.create_index(
+        op.f("ix_processed_messages_media_sha256"),
+        "processed_messages",
+        ["media_sha256"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_processed_messages_media_sha256"), table_name="processed_messages")
+    op.drop_column("processed_messages", "media_sha256")
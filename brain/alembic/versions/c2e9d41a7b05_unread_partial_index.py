@@ -0,0 +1,41 @@
+"""
+partial index on unread messages.
+
+Revision ID: c2e9d41a7b05
+Revises: 4f7b70e61a68
+Create Date: 2026-10-18 10:03:41.772910
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c2e9d41a7b05"
+down_revision: str | Sequence[str] | None = "4f7b70e61a68"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_processed_messages_unread_chat_urgency",
+        "processed_messages",
+        ["chat_jid", "urgency"],
+        unique=False,
+        postgresql_where=sa.text("read_by_user = false"),
+        postgresql_include=["received_at", "sender_name"],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        "ix_processed_messages_unread_chat_urgency",
+        table_name="processed_messages",
+        postgresql_where=sa.text("read_by_user = false"),
+    )
@@ -0,0 +1,43 @@
+"""
+media_files index for retention.
+
+Revision ID: e58a0c3f6b14
+Revises: 9b1c4e07d2a3
+Create Date: 2026-10-18 12:51:30.664081
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e58a0c3f6b14"
+down_revision: str | Sequence[str] | None = "9b1c4e07d2a3"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "media_files",
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("media_sha256", sa.String(), nullable=True),
+        sa.Column("message_id", sa.String(), nullable=True),
+        sa.Column("size_bytes", sa.BigInteger(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("last_accessed_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("name"),
+    )
+    op.create_index(
+        op.f("ix_media_files_last_accessed_at"), "media_files", ["last_accessed_at"], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_media_files_last_accessed_at"), table_name="media_files")
+    op.drop_table("media_files")
@@ -0,0 +1,117 @@
+"""
+Benchmark ``MessageRepo.get_unread_summary`` against the previous Python-side grouping.
+
+Runs against ``DATABASE_URL`` inside a throwaway ``bench_unread`` schema, so it
+never touches real data. Usage (from ``brain/``)::
+
+    PYTHONPATH=src uv run python benchmarks/bench_unread_summary.py 10000 100000 1000000
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+from collections.abc import Awaitable, Callable
+
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from config import settings
+from database.models import Base, ProcessedMessage, UrgencyLevel
+from database.repo import MessageRepo
+
+SCHEMA = "bench_unread"
+CHATS = 200
+READ_RATIO = 0.5
+RUNS = 5
+
+_SEED = sa.text(
+    """
+    INSERT INTO processed_messages
+        (message_id, chat_jid, sender_name, is_group, message_type, content_preview,
+         urgency, notified, read_by_user, received_at)
+    SELECT
+        'bench-' || g,
+        'chat-' || (g % :chats),
+        'Sender ' || (g % 997),
+        g % 3 = 0,
+        'text',
+        repeat('x', 120),
+        (CASE WHEN g % 100 = 0 THEN 'CRITICAL' WHEN g % 20 = 0 THEN 'HIGH'
+              WHEN g % 5 = 0 THEN 'MEDIUM' ELSE 'LOW' END)::urgencylevel,
+        false,
+        random() < :read_ratio,
+        now() - g * interval '1 second'
+    FROM generate_series(1, :rows) AS g
+    """
+)
+
+
+async def _legacy_unread_summary(session: AsyncSession) -> list[dict]:
+    """The ORM-loading implementation this benchmark compares against."""
+    result = await session.execute(
+        sa.select(ProcessedMessage).where(ProcessedMessage.read_by_user == False)  # noqa: E712
+    )
+    grouped: dict[str, dict] = {}
+    for msg in result.scalars().all():
+        key = msg.chat_jid
+        if key not in grouped:
+            grouped[key] = {"name": msg.sender_name, "count": 0, "urgency": "LOW"}
+        grouped[key]["count"] += 1
+        current = UrgencyLevel[grouped[key]["urgency"]]
+        if UrgencyLevel[msg.urgency.value].value > current.value:
+            grouped[key]["urgency"] = msg.urgency.value
+    return list(grouped.values())
+
+
+async def _time(
+    factory: async_sessionmaker, fn: Callable[[AsyncSession], Awaitable[object]]
+) -> float:
+    samples = []
+    for _ in range(RUNS):
+        async with factory() as session:
+            start = time.perf_counter()
+            await fn(session)
+            samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+async def main(sizes: list[int]) -> None:
+    """Seed each size, time both implementations, and print a table."""
+    engine = create_async_engine(
+        settings.database_url,
+        connect_args={"server_settings": {"search_path": SCHEMA}},
+    )
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    print(f"{'rows':>10} {'unread':>10} {'legacy ms':>12} {'sql ms':>10} {'speedup':>8}")
+    try:
+        for rows in sizes:
+            async with engine.begin() as conn:
+                await conn.execute(sa.text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+                await conn.execute(sa.text(f"CREATE SCHEMA {SCHEMA}"))
+                await conn.run_sync(Base.metadata.create_all)
+                await conn.execute(_SEED, {"chats": CHATS, "read_ratio": READ_RATIO, "rows": rows})
+            async with engine.connect() as conn:
+                await conn.execution_options(isolation_level="AUTOCOMMIT")
+                await conn.execute(sa.text("VACUUM ANALYZE processed_messages"))
+                unread = (
+                    await conn.execute(
+                        sa.text("SELECT count(*) FROM processed_messages WHERE NOT read_by_user")
+                    )
+                ).scalar_one()
+
+            legacy = await _time(factory, _legacy_unread_summary)
+            current = await _time(factory, MessageRepo.get_unread_summary)
+            print(
+                f"{rows:>10} {unread:>10} {legacy * 1000:>12.1f} {current * 1000:>10.1f}"
+                f" {legacy / current:>7.1f}x"
+            )
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(sa.text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main([int(n) for n in sys.argv[1:]] or [10_000, 100_000, 1_000_000]))
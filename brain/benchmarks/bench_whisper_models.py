@@ -0,0 +1,111 @@
+"""
+Benchmark Whisper model sizes on local voice notes: latency against word error rate.
+
+Expects a fixture directory of audio files, each with a reference transcript
+next to it (``nota.ogg`` + ``nota.txt``). Every model transcribes every file
+the way the pipeline does (int8 on CPU, pt-BR) and the script prints latency
+and WER per model; with ``--plot`` it also saves a latency x WER scatter
+(requires matplotlib). Usage (from ``brain/``)::
+
+    PYTHONPATH=src uv run python benchmarks/bench_whisper_models.py fixtures/audio --plot out.png
+"""
+
+import argparse
+import re
+import statistics
+import time
+from pathlib import Path
+
+from faster_whisper import WhisperModel
+
+from config import settings
+
+AUDIO_SUFFIXES = {".ogg", ".opus", ".mp3", ".wav", ".m4a"}
+
+
+def words(text: str) -> list[str]:
+    """Normalise a transcript to lowercase words without punctuation."""
+    return re.findall(r"\w+", text.casefold())
+
+
+def wer(reference: str, hypothesis: str) -> float:
+    """Word error rate: word-level edit distance over the reference length."""
+    ref, hyp = words(reference), words(hypothesis)
+    previous = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        current = [i]
+        for j, h in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (r != h)))
+        previous = current
+    return previous[-1] / max(len(ref), 1)
+
+
+def load_fixtures(directory: Path) -> list[tuple[Path, str]]:
+    """Return ``(audio, reference)`` pairs for every audio file with a transcript."""
+    fixtures = []
+    for audio in sorted(directory.iterdir()):
+        reference = audio.with_suffix(".txt")
+        if audio.suffix in AUDIO_SUFFIXES and reference.exists():
+            fixtures.append((audio, reference.read_text()))
+    return fixtures
+
+
+def run(model_name: str, fixtures: list[tuple[Path, str]], beam_size: int) -> tuple[float, float]:
+    """Return the median latency (s) and the mean WER of one model over the fixtures."""
+    model = WhisperModel(
+        model_name,
+        device="cpu",
+        compute_type="int8",
+        cpu_threads=settings.whisper_cpu_threads,
+    )
+    latencies, errors = [], []
+    for audio, reference in fixtures:
+        start = time.perf_counter()
+        segments, _ = model.transcribe(str(audio), language="pt", beam_size=beam_size)
+        text = " ".join(s.text for s in segments)
+        latencies.append(time.perf_counter() - start)
+        errors.append(wer(reference, text))
+    return statistics.median(latencies), statistics.mean(errors)
+
+
+def plot(results: dict[str, tuple[float, float]], output: Path) -> None:
+    """Save a latency x WER scatter with one labelled point per model."""
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots()
+    for name, (latency, error) in results.items():
+        ax.scatter(latency * 1000, error * 100)
+        ax.annotate(name, (latency * 1000, error * 100))
+    ax.set_xlabel("median latency (ms)")
+    ax.set_ylabel("WER (%)")
+    fig.savefig(output)
+
+
+def main() -> None:
+    """Benchmark every requested model and print a table."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("fixtures", type=Path)
+    parser.add_argument("--models", nargs="+", default=["tiny", "base", "small", "medium"])
+    parser.add_argument("--beam-size", type=int, default=5)
+    parser.add_argument("--plot", type=Path)
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures)
+    if not fixtures:
+        parser.error(f"no audio files with a .txt transcript in {args.fixtures}")
+
+    print(f"{len(fixtures)} fixtures, beam size {args.beam_size}")
+    print(f"{'model':>10} {'median ms':>10} {'WER %':>8}")
+    results = {}
+    for name in args.models:
+        latency, error = run(name, fixtures, args.beam_size)
+        results[name] = (latency, error)
+        print(f"{name:>10} {latency * 1000:>10.0f} {error * 100:>8.1f}")
+
+    if args.plot:
+        plot(results, args.plot)
+        print(f"plot saved to {args.plot}")
+
+
+if __name__ == "__main__":
+    main()
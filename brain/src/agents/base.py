@@ -4,7 +4,7 @@ from pydantic_ai import Agent
 from pydantic_ai.settings import ModelSettings
 
 from config import settings
-from database.models import UserPreferences
+from database.preferences import PreferencesSnapshot
 
 
 def make_agent[OutputT, DepsT](
@@ -32,5 +32,5 @@ class WhatsAppDeps:
 
     chat_jid: str
     recent_messages: list[dict]
-    preferences: UserPreferences
+    preferences: PreferencesSnapshot
     whatsapp_client: object  # WhatsAppClient
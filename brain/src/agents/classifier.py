@@ -29,18 +29,49 @@ classifier_agent = make_agent(
 )
 
 
+class KeyedNotificationDecision(NotificationDecision):
+    """A NotificationDecision tagged with the message it refers to."""
+
+    message_id: str
+
+
+class BatchNotificationDecisions(BaseModel):
+    """Result of the batch classifier: one decision per input message."""
+
+    decisions: list[KeyedNotificationDecision]
+
+
+batch_classifier_agent = make_agent(
+    output_type=BatchNotificationDecisions,
+    deps_type=WhatsAppDeps,
+    instructions="""
+    Você é um filtro inteligente de notificações de WhatsApp.
+    Você recebe várias mensagens de conversas diferentes, cada uma marcada com
+    [message_id=...]. Classifique cada uma de forma independente e devolva
+    exatamente uma decisão por message_id, copiando o id sem alterações.
+    Decida se o usuário precisa ser notificado agora via Alexa.
+    Seja conservador: prefira não notificar a interromper desnecessariamente.
+    Responda sempre em pt-BR.
+    """,
+    max_tokens=4096,
+)
+
+
+@batch_classifier_agent.tool
 @classifier_agent.tool
 async def get_vip_contacts(ctx: RunContext[WhatsAppDeps]) -> list[str]:
     """Return the list of VIP contact JIDs from user preferences."""
     return ctx.deps.preferences.vip_contacts_list()
 
 
+@batch_classifier_agent.tool
 @classifier_agent.tool
 async def get_urgent_keywords(ctx: RunContext[WhatsAppDeps]) -> list[str]:
     """Return the list of urgent keywords from user preferences."""
     return ctx.deps.preferences.urgent_keywords_list()
 
 
+@batch_classifier_agent.tool
 @classifier_agent.tool
 async def is_quiet_hours(ctx: RunContext[WhatsAppDeps]) -> bool:
     """Check whether the current time falls within the user's quiet hours."""
@@ -22,3 +22,31 @@ summarizer_agent = make_agent(
     Idioma: pt-BR.
     """,
 )
+
+
+class ChatSummary(BaseModel):
+    """Summary of one conversation out of several summarised together."""
+
+    chat_id: str
+    summary: str
+
+
+class ChatSummaries(BaseModel):
+    """Result of the batch summarizer: one summary per input conversation."""
+
+    summaries: list[ChatSummary]
+
+
+batch_summarizer_agent = make_agent(
+    output_type=ChatSummaries,
+    deps_type=WhatsAppDeps,
+    instructions="""
+    Você recebe mensagens de várias conversas de WhatsApp, cada uma marcada com
+    [chat_id=...]. Resuma cada conversa separadamente, em uma frase clara e
+    natural para ser ouvida via assistente de voz, e devolva exatamente um
+    resumo por chat_id, copiando o id sem alterações.
+    Priorize informação acionável.
+    Idioma: pt-BR.
+    """,
+    max_tokens=4096,
+)
@@ -10,11 +10,11 @@ from alexa.handlers import (
     send_message,
     summarize,
 )
-from alexa.session import AlexaResponse, SessionStore
+from alexa.session import AlexaResponse, AlexaSession, SessionStore
 
 logger = logging.getLogger(__name__)
 
-AsyncHandler = Callable[[dict], Coroutine[Any, Any, dict]]
+AsyncHandler = Callable[[dict, AlexaSession], Coroutine[Any, Any, dict]]
 
 _NEGATIVE = {"não", "nao", "negativo", "errado", "errada", "cancelar", "cancel", "nope"}
 _POSITIVE = {
@@ -32,7 +32,7 @@ _POSITIVE = {
 }
 
 
-async def _help(_body: dict) -> dict:
+async def _help(_body: dict, _session: AlexaSession) -> dict:
     return AlexaResponse.speak(
         "Você pode me pedir para verificar mensagens, ler mensagens, "
         "resumir conversas, gerar respostas ou enviar mensagens.",
@@ -40,7 +40,7 @@ async def _help(_body: dict) -> dict:
     )
 
 
-async def _stop(_body: dict) -> dict:
+async def _stop(_body: dict, _session: AlexaSession) -> dict:
     return AlexaResponse.speak("Até mais!")
 
 
@@ -86,43 +86,44 @@ async def dispatch(body: dict) -> dict:
     if request_type == "IntentRequest":
         intent_name = body["request"]["intent"]["name"]
 
+        # The whole session state is read once and handed to the handlers
+        session = await SessionStore.load(body.get("session", {}).get("sessionId", ""))
+
         # When a contact confirmation is pending, intercept any intent and check
         # whether the user said something affirmative or negative before routing
         # normally — the NLU often misfires on conversational yes/no phrases.
         if intent_name not in ("AMAZON.StopIntent", "AMAZON.CancelIntent"):
-            session_id = body.get("session", {}).get("sessionId", "")
-            if session_id:
-                pending_confirm = await SessionStore.get(session_id, "pending_confirm")
-                if pending_confirm:
-                    # First check the intent name directly
-                    if intent_name == "AMAZON.YesIntent":
-                        return await send_message.handle_yes(body)
-                    if intent_name == "AMAZON.NoIntent":
-                        return await send_message.handle_no(body)
-
-                    # NLU misfired — collect slot words and check against known yes/no
-                    spoken_words: set[str] = set()
-                    for slot in body["request"]["intent"].get("slots", {}).values():
-                        for w in (slot.get("value") or "").lower().split():
-                            spoken_words.add(w)
-
-                    if spoken_words & _POSITIVE:
-                        return await send_message.handle_yes(body)
-                    if spoken_words & _NEGATIVE:
-                        return await send_message.handle_no(body)
-
-                    # Could not determine — re-ask
-                    contact = pending_confirm.get("contact", "")
-                    return AlexaResponse.speak(
-                        f"Não entendi. Encontrei {contact}. Diga sim para confirmar ou não para cancelar.",  # noqa: E501
-                        reprompt="Diga sim ou não.",
-                        end_session=False,
-                    )
+            pending_confirm = session.get("pending_confirm")
+            if pending_confirm:
+                # First check the intent name directly
+                if intent_name == "AMAZON.YesIntent":
+                    return await send_message.handle_yes(body, session)
+                if intent_name == "AMAZON.NoIntent":
+                    return await send_message.handle_no(body, session)
+
+                # NLU misfired — collect slot words and check against known yes/no
+                spoken_words: set[str] = set()
+                for slot in body["request"]["intent"].get("slots", {}).values():
+                    for w in (slot.get("value") or "").lower().split():
+                        spoken_words.add(w)
+
+                if spoken_words & _POSITIVE:
+                    return await send_message.handle_yes(body, session)
+                if spoken_words & _NEGATIVE:
+                    return await send_message.handle_no(body, session)
+
+                # Could not determine — re-ask
+                contact = pending_confirm.get("contact", "")
+                return AlexaResponse.speak(
+                    f"Não entendi. Encontrei {contact}. Diga sim para confirmar ou não para cancelar.",  # noqa: E501
+                    reprompt="Diga sim ou não.",
+                    end_session=False,
+                )
 
         handler = INTENT_MAP.get(intent_name)
         if handler:
             try:
-                return await handler(body)
+                return await handler(body, session)
             except Exception:
                 logger.exception("Error handling intent %s", intent_name)
                 return AlexaResponse.speak("Ocorreu um erro interno. Tente novamente em instantes.")
@@ -1,9 +1,9 @@
-from alexa.session import AlexaResponse
+from alexa.session import AlexaResponse, AlexaSession
 from database.engine import async_session_factory
 from database.repo import MessageRepo
 
 
-async def handle(_body: dict) -> dict:
+async def handle(_body: dict, _session: AlexaSession) -> dict:
     """Return an Alexa speech response summarising unread message counts."""
     async with async_session_factory() as session:
         unread = await MessageRepo.get_unread_summary(session)
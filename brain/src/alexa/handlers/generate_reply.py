@@ -1,14 +1,13 @@
 from agents.base import WhatsAppDeps
 from agents.reply_generator import reply_generator_agent
-from alexa.session import AlexaResponse, SessionStore
-from database.engine import async_session_factory
-from database.repo import PreferencesRepo
+from alexa.session import AlexaResponse, AlexaSession
+from database.preferences import preferences_cache
 from whatsapp.client import whatsapp_client
+from whatsapp.history import chat_history
 
 
-async def handle(body: dict) -> dict:
+async def handle(body: dict, session: AlexaSession) -> dict:
     """Generate three reply options for the specified contact and present them via Alexa."""
-    session_id = body["session"]["sessionId"]
     slots = body.get("request", {}).get("intent", {}).get("slots", {})
     contact_name = slots.get("ContactName", {}).get("value")
 
@@ -24,10 +23,9 @@ async def handle(body: dict) -> dict:
         return AlexaResponse.speak(f"Não encontrei o contato {contact_name}.")
 
     matched_name, jid = found
-    msgs = await whatsapp_client.get_messages(jid, limit=20)
+    msgs = await chat_history.recent(jid, limit=20)
 
-    async with async_session_factory() as session:
-        prefs = await PreferencesRepo.get(session)
+    prefs = await preferences_cache.get()
 
     deps = WhatsAppDeps(
         chat_jid=jid,
@@ -41,8 +39,7 @@ async def handle(body: dict) -> dict:
     )
     options = result.output.options
 
-    await SessionStore.set(
-        session_id,
+    await session.set(
         "pending_replies",
         {
             "contact": matched_name,
@@ -59,9 +56,8 @@ async def handle(body: dict) -> dict:
     return AlexaResponse.speak(speech, reprompt="Diga opção 1, 2 ou 3.", end_session=False)
 
 
-async def handle_selection(body: dict) -> dict:
+async def handle_selection(body: dict, session: AlexaSession) -> dict:
     """Send the reply option selected by the user and confirm via Alexa speech."""
-    session_id = body["session"]["sessionId"]
     slots = body.get("request", {}).get("intent", {}).get("slots", {})
     option_num_str = slots.get("OptionNumber", {}).get("value", "0")
 
@@ -70,7 +66,7 @@ async def handle_selection(body: dict) -> dict:
     except ValueError:
         option_num = 0
 
-    pending = await SessionStore.get(session_id, "pending_replies")
+    pending = session.get("pending_replies")
     if not pending or option_num not in (1, 2, 3):
         return AlexaResponse.speak(
             "Não entendi. Diga opção 1, 2 ou 3.",
@@ -82,7 +78,12 @@ async def handle_selection(body: dict) -> dict:
     contact = pending["contact"]
     jid = pending["jid"]
 
-    await whatsapp_client.send_message(jid, text)
-    await SessionStore.delete(session_id, "pending_replies")
+    # Claim the send atomically so a retried request cannot send it twice
+    if await session.take("pending_replies"):
+        try:
+            await whatsapp_client.send_message(jid, text)
+        except Exception:
+            await session.set("pending_replies", pending)
+            raise
 
     return AlexaResponse.speak(f"Mensagem enviada para {contact}.")
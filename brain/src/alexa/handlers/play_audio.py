@@ -1,11 +1,15 @@
+from xml.sax.saxutils import escape
+
 from sqlalchemy import select
 
-from alexa.session import AlexaResponse
+from alexa.session import AlexaResponse, AlexaSession
+from audio.profiles import SSML, variant_url
 from database.engine import async_session_factory
 from database.models import ProcessedMessage
+from media.signing import sign_url
 
 
-async def handle(body: dict) -> dict:
+async def handle(body: dict, _session: AlexaSession) -> dict:
     """Stream the most recent audio message via Alexa AudioPlayer, with transcription."""
     slots = body.get("request", {}).get("intent", {}).get("slots", {})
     contact_name = slots.get("ContactName", {}).get("value")
@@ -32,6 +36,8 @@ async def handle(body: dict) -> dict:
 
     transcription = msg.transcription or ""
     sender = msg.sender_name
+    stream_url = sign_url(msg.audio_public_url)
+    ssml_url = sign_url(variant_url(msg.audio_public_url, SSML))
 
     return {
         "version": "1.0",
@@ -40,7 +46,7 @@ async def handle(body: dict) -> dict:
                 "type": "SSML",
                 "ssml": (
                     f"<speak>Áudio de {sender}. {transcription}"
-                    f' <audio src="{msg.audio_public_url}"/></speak>'
+                    f' <audio src="{escape(ssml_url)}"/></speak>'
                 ),
             },
             "directives": [
@@ -50,7 +56,7 @@ async def handle(body: dict) -> dict:
                     "audioItem": {
                         "stream": {
                             "token": str(msg.id),
-                            "url": msg.audio_public_url,
+                            "url": stream_url,
                             "offsetInMilliseconds": 0,
                         }
                     },
@@ -2,13 +2,14 @@ from difflib import get_close_matches
 
 from sqlalchemy import select
 
-from alexa.session import AlexaResponse
+from alexa.session import AlexaResponse, AlexaSession
 from database.engine import async_session_factory
 from database.models import ProcessedMessage
+from database.repo import MessageRepo
 
 
-async def handle(body: dict) -> dict:
-    """Read the five most recent unread messages aloud via Alexa."""
+async def handle(body: dict, _session: AlexaSession) -> dict:
+    """Read the five most recent unread messages aloud via Alexa and mark them as read."""
     slots = body.get("request", {}).get("intent", {}).get("slots", {})
     contact_name = slots.get("ContactName", {}).get("value")
 
@@ -49,4 +50,7 @@ async def handle(body: dict) -> dict:
         preview = msg.content_preview or msg.summary or "mensagem de mídia"
         speech += f"{msg.sender_name} disse: {preview}. "
 
+    async with async_session_factory() as session:
+        await MessageRepo.mark_read_ids(session, [m.id for m in messages])
+
     return AlexaResponse.speak(speech)
@@ -1,10 +1,9 @@
-from alexa.session import AlexaResponse, SessionStore
+from alexa.session import AlexaResponse, AlexaSession
 from whatsapp.client import whatsapp_client
 
 
-async def handle(body: dict) -> dict:
+async def handle(body: dict, session: AlexaSession) -> dict:
     """Resolve the contact and ask the user to confirm before proceeding."""
-    session_id = body["session"]["sessionId"]
     slots = body.get("request", {}).get("intent", {}).get("slots", {})
     contact_name = slots.get("ContactName", {}).get("value")
 
@@ -20,7 +19,7 @@ async def handle(body: dict) -> dict:
     matched_name, jid = result
 
     # Save to session and ask for confirmation
-    await SessionStore.set(session_id, "pending_confirm", {"contact": matched_name, "jid": jid})
+    await session.set("pending_confirm", {"contact": matched_name, "jid": jid})
 
     return AlexaResponse.speak(
         f"Encontrei {matched_name}. É esse contato?",
@@ -29,19 +28,15 @@ async def handle(body: dict) -> dict:
     )
 
 
-async def handle_yes(body: dict) -> dict:
+async def handle_yes(_body: dict, session: AlexaSession) -> dict:
     """User confirmed the contact — now ask for the message content."""
-    session_id = body["session"]["sessionId"]
-
-    pending = await SessionStore.get(session_id, "pending_confirm")
+    # A retry racing the original gets the already-moved value back
+    pending = await session.move("pending_confirm", "pending_send")
     if not pending:
         return AlexaResponse.speak(
             "Não há nenhum envio pendente. Diga 'enviar mensagem para' seguido do nome."
         )
 
-    await SessionStore.delete(session_id, "pending_confirm")
-    await SessionStore.set(session_id, "pending_send", pending)
-
     return AlexaResponse.speak(
         f"O que você quer dizer para {pending['contact']}?",
         reprompt="O que você quer dizer?",
@@ -49,32 +44,35 @@ async def handle_yes(body: dict) -> dict:
     )
 
 
-async def handle_no(body: dict) -> dict:
+async def handle_no(_body: dict, session: AlexaSession) -> dict:
     """User rejected the contact — cancel and let them retry."""
-    session_id = body["session"]["sessionId"]
-    await SessionStore.delete(session_id, "pending_confirm")
+    await session.delete("pending_confirm")
     return AlexaResponse.speak(
         "Tudo bem, envio cancelado. Diga 'enviar mensagem para' com o nome correto.",
         end_session=False,
     )
 
 
-async def handle_capture(body: dict) -> dict:
+async def handle_capture(body: dict, session: AlexaSession) -> dict:
     """Receive the message content and send it to the contact saved in session."""
-    session_id = body["session"]["sessionId"]
     slots = body.get("request", {}).get("intent", {}).get("slots", {})
     content = slots.get("MessageContent", {}).get("value")
 
     if not content:
         return AlexaResponse.speak("Não entendi o que você quer dizer. Tente novamente.")
 
-    pending = await SessionStore.get(session_id, "pending_send")
+    pending = session.get("pending_send")
     if not pending:
         return AlexaResponse.speak(
             "Não sei para quem enviar. Diga 'enviar mensagem para' seguido do nome."
         )
 
-    await whatsapp_client.send_message(pending["jid"], content)
-    await SessionStore.delete(session_id, "pending_send")
+    # Claim the send atomically so a retried request cannot send it twice
+    if await session.take("pending_send"):
+        try:
+            await whatsapp_client.send_message(pending["jid"], content)
+        except Exception:
+            await session.set("pending_send", pending)
+            raise
 
     return AlexaResponse.speak(f"Mensagem enviada para {pending['contact']}.")
@@ -1,12 +1,12 @@
 from agents.base import WhatsAppDeps
 from agents.summarizer import summarizer_agent
-from alexa.session import AlexaResponse
-from database.engine import async_session_factory
-from database.repo import PreferencesRepo
+from alexa.session import AlexaResponse, AlexaSession
+from database.preferences import preferences_cache
 from whatsapp.client import whatsapp_client
+from whatsapp.history import chat_history
 
 
-async def handle(body: dict) -> dict:
+async def handle(body: dict, _session: AlexaSession) -> dict:
     """Summarise a WhatsApp conversation using the AI summarizer agent and read it aloud."""
     slots = body.get("request", {}).get("intent", {}).get("slots", {})
     contact_name = slots.get("ContactName", {}).get("value")
@@ -23,10 +23,9 @@ async def handle(body: dict) -> dict:
         return AlexaResponse.speak(f"Não encontrei o contato {contact_name}.")
 
     _matched_name, jid = found
-    msgs = await whatsapp_client.get_messages(jid, limit=20)
+    msgs = await chat_history.recent(jid, limit=20)
 
-    async with async_session_factory() as session:
-        prefs = await PreferencesRepo.get(session)
+    prefs = await preferences_cache.get()
 
     deps = WhatsAppDeps(
         chat_jid=jid,
@@ -4,8 +4,12 @@ Alexa request signature verification.
 Reference: https://developer.amazon.com/docs/custom-skills/host-a-custom-skill-as-a-web-service.html
 """
 
+import asyncio
 import base64
-from datetime import UTC, datetime
+import json
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
 from urllib.parse import urlparse
 
 import httpx
@@ -15,9 +19,19 @@ from cryptography.hazmat.primitives.asymmetric import padding
 from cryptography.hazmat.primitives.asymmetric.rsa import RSAPublicKey
 from fastapi import HTTPException, Request
 
+# Amazon rotates signing certs rarely; re-validate at least daily and keep a handful
+CERT_CACHE_TTL = timedelta(hours=24)
+CERT_CACHE_SIZE = 8
 
-async def verify_alexa_signature(request: Request) -> None:
-    """Verify the Alexa request signature and timestamp, raising HTTP 400 on failure."""
+_http = httpx.AsyncClient(timeout=5.0)
+
+
+async def verify_alexa_signature(request: Request) -> dict:
+    """
+    Verify the Alexa request signature and timestamp, raising HTTP 400 on failure.
+
+    Returns the parsed request body, so the endpoint does not parse it again.
+    """
     cert_url = request.headers.get("SignatureCertChainUrl", "")
     signature_b64 = request.headers.get("Signature", "")
     body = await request.body()
@@ -26,29 +40,21 @@ async def verify_alexa_signature(request: Request) -> None:
         raise HTTPException(status_code=400, detail="Missing Alexa signature headers")
 
     _validate_cert_url(cert_url)
-
-    cert_pem = await _fetch_cert(cert_url)
-    cert = x509.load_pem_x509_certificate(cert_pem)
-
-    _validate_cert(cert)
+    public_key = await _public_key(cert_url)
 
     signature = base64.b64decode(signature_b64)
-    public_key = cert.public_key()
-    if not isinstance(public_key, RSAPublicKey):
-        raise HTTPException(status_code=400, detail="Alexa cert must use RSA key")
     try:
         public_key.verify(signature, body, padding.PKCS1v15(), hashes.SHA1())
     except Exception as err:
         raise HTTPException(status_code=400, detail="Alexa signature verification failed") from err
 
-    import json
-
     payload = json.loads(body)
     timestamp_str = payload.get("request", {}).get("timestamp", "")
     if timestamp_str:
         ts = datetime.fromisoformat(timestamp_str.replace("Z", "+00:00"))
         if abs((datetime.now(UTC) - ts).total_seconds()) > 150:
             raise HTTPException(status_code=400, detail="Request timestamp too old")
+    return payload
 
 
 def _validate_cert_url(url: str) -> None:
@@ -71,14 +77,49 @@ def _validate_cert(cert: x509.Certificate) -> None:
         raise HTTPException(status_code=400, detail="Cert SAN mismatch")
 
 
-_cert_cache: dict[str, bytes] = {}
+@dataclass(frozen=True)
+class _CachedKey:
+    public_key: RSAPublicKey
+    expires: datetime
+
 
+_key_cache: OrderedDict[str, _CachedKey] = OrderedDict()
+_key_fetches: dict[str, asyncio.Task[_CachedKey]] = {}
 
-async def _fetch_cert(url: str) -> bytes:
-    if url in _cert_cache:
-        return _cert_cache[url]
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(url)
+
+async def _public_key(url: str) -> RSAPublicKey:
+    """Return the validated public key of the cert at ``url``, from cache when still valid."""
+    cached = _key_cache.get(url)
+    if cached is not None and cached.expires > datetime.now(UTC):
+        _key_cache.move_to_end(url)
+        return cached.public_key
+
+    task = _key_fetches.get(url)
+    if task is None:
+        task = asyncio.create_task(_load_key(url))
+        _key_fetches[url] = task
+        task.add_done_callback(lambda _: _key_fetches.pop(url, None))
+    cached = await asyncio.shield(task)
+
+    _key_cache[url] = cached
+    _key_cache.move_to_end(url)
+    while len(_key_cache) > CERT_CACHE_SIZE:
+        _key_cache.popitem(last=False)
+    return cached.public_key
+
+
+async def _load_key(url: str) -> _CachedKey:
+    """Fetch, parse, and validate a signing cert once; shared by concurrent requests."""
+    try:
+        resp = await _http.get(url)
         resp.raise_for_status()
-        _cert_cache[url] = resp.content
-        return resp.content
+    except httpx.HTTPError as err:
+        raise HTTPException(status_code=400, detail="Could not fetch Alexa cert") from err
+
+    cert = x509.load_pem_x509_certificate(resp.content)
+    _validate_cert(cert)
+    public_key = cert.public_key()
+    if not isinstance(public_key, RSAPublicKey):
+        raise HTTPException(status_code=400, detail="Alexa cert must use RSA key")
+    expires = min(cert.not_valid_after_utc, datetime.now(UTC) + CERT_CACHE_TTL)
+    return _CachedKey(public_key=public_key, expires=expires)
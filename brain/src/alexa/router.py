@@ -1,4 +1,6 @@
-from fastapi import APIRouter, Depends, Request
+from typing import Annotated
+
+from fastapi import APIRouter, Depends
 
 from alexa.dispatcher import dispatch
 from alexa.middleware import verify_alexa_signature
@@ -6,8 +8,7 @@ from alexa.middleware import verify_alexa_signature
 router = APIRouter(prefix="/alexa")
 
 
-@router.post("/skill", dependencies=[Depends(verify_alexa_signature)])
-async def skill_endpoint(request: Request) -> dict:
-    """Receive and dispatch an Alexa skill request."""
-    body = await request.json()
+@router.post("/skill")
+async def skill_endpoint(body: Annotated[dict, Depends(verify_alexa_signature)]) -> dict:
+    """Receive and dispatch an Alexa skill request (body parsed once, by the verifier)."""
     return await dispatch(body)
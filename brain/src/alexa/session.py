@@ -1,45 +1,136 @@
 import json
+from typing import Any
 
-import redis.asyncio as aioredis
+from redis.commands.core import AsyncScript
 
-from config import settings
+from database.redis import get_redis
 
-_redis: aioredis.Redis | None = None
+# Atomically remove a field and return its value (a retried request finds nothing)
+_TAKE = """
+local value = redis.call('HGET', KEYS[1], ARGV[1])
+if value then redis.call('HDEL', KEYS[1], ARGV[1]) end
+return value
+"""
 
+# Atomically rename a field and refresh the TTL; when the field is already gone
+# (a concurrent retry moved it), return what it was moved to
+_MOVE = """
+local value = redis.call('HGET', KEYS[1], ARGV[1])
+if not value then return redis.call('HGET', KEYS[1], ARGV[2]) end
+redis.call('HDEL', KEYS[1], ARGV[1])
+redis.call('HSET', KEYS[1], ARGV[2], value)
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return value
+"""
 
-def get_redis() -> aioredis.Redis:
-    """Return a singleton async Redis client."""
-    global _redis
-    if _redis is None:
-        _redis = aioredis.from_url(settings.redis_url, decode_responses=True)
-    return _redis
+_scripts: dict[str, AsyncScript] = {}
 
 
-class SessionStore:
-    """Redis-backed key-value store for Alexa session state with a 5-minute TTL."""
+def _script(source: str) -> AsyncScript:
+    script = _scripts.get(source)
+    if script is None:
+        script = _scripts[source] = get_redis().register_script(source)
+    return script
 
-    TTL = 300  # 5 minutos
 
-    @classmethod
-    async def set(cls, session_id: str, key: str, value: object) -> None:
-        """Persist a JSON-serialisable value for the given session and key."""
-        r = get_redis()
-        field = f"alexa:{session_id}:{key}"
-        await r.setex(field, cls.TTL, json.dumps(value))
+class AlexaSession:
+    """
+    Session state loaded once per request from a single Redis hash.
 
-    @classmethod
-    async def get(cls, session_id: str, key: str) -> dict | None:
-        """Retrieve and deserialise a value from the session store."""
-        r = get_redis()
-        field = f"alexa:{session_id}:{key}"
-        data = await r.get(field)
+    Reads are served from the loaded snapshot; writes go to Redis right away
+    and refresh the hash's shared TTL.
+    """
+
+    def __init__(self, session_id: str, data: dict[str, Any]) -> None:
+        self.session_id = session_id
+        self._data = data
+
+    @property
+    def key(self) -> str:
+        """Redis key of the session hash."""
+        return f"alexa:{self.session_id}"
+
+    def get(self, name: str) -> Any:  # noqa: ANN401
+        """Return a value from the loaded session state."""
+        return self._data.get(name)
+
+    async def set(self, name: str, value: object) -> None:
+        """Persist a JSON-serialisable value and refresh the session TTL."""
+        self._data[name] = value
+        async with get_redis().pipeline(transaction=True) as pipe:
+            pipe.hset(self.key, name, json.dumps(value))
+            pipe.expire(self.key, SessionStore.TTL)
+            await pipe.execute()
+
+    async def delete(self, *names: str) -> None:
+        """Remove values from the session."""
+        for name in names:
+            self._data.pop(name, None)
+        await get_redis().hdel(self.key, *names)
+
+    async def take(self, name: str) -> Any:  # noqa: ANN401
+        """Remove and return a value atomically; None if another request took it first."""
+        self._data.pop(name, None)
+        data = await _script(_TAKE)(keys=[self.key], args=[name])
         return json.loads(data) if data else None
 
+    async def move(self, source: str, target: str) -> Any:  # noqa: ANN401
+        """
+        Atomically rename ``source`` to ``target`` and return the moved value.
+
+        If another request already moved it, the current ``target`` value is
+        returned instead; None means neither field is set.
+        """
+        data = await _script(_MOVE)(keys=[self.key], args=[source, target, SessionStore.TTL])
+        self._data.pop(source, None)
+        if not data:
+            return None
+        value = json.loads(data)
+        self._data[target] = value
+        return value
+
+
+class LocalSession(AlexaSession):
+    """
+    Request-scoped session for requests without a session id.
+
+    State lives only in memory, so such requests never share the bare
+    ``alexa:`` key.
+    """
+
+    async def set(self, name: str, value: object) -> None:
+        """Keep a value for the rest of the request."""
+        self._data[name] = value
+
+    async def delete(self, *names: str) -> None:
+        """Remove values from the session."""
+        for name in names:
+            self._data.pop(name, None)
+
+    async def take(self, name: str) -> Any:  # noqa: ANN401
+        """Remove and return a value."""
+        return self._data.pop(name, None)
+
+    async def move(self, source: str, target: str) -> Any:  # noqa: ANN401
+        """Rename ``source`` to ``target``; return the value now under ``target``."""
+        if source not in self._data:
+            return self._data.get(target)
+        value = self._data[target] = self._data.pop(source)
+        return value
+
+
+class SessionStore:
+    """Loads Alexa session state (one Redis hash per session, 5-minute TTL)."""
+
+    TTL = 300  # 5 minutos
+
     @classmethod
-    async def delete(cls, session_id: str, key: str) -> None:
-        """Remove a key from the session store."""
-        r = get_redis()
-        await r.delete(f"alexa:{session_id}:{key}")
+    async def load(cls, session_id: str) -> AlexaSession:
+        """Fetch every value of a session in one round trip."""
+        if not session_id:
+            return LocalSession(session_id, {})
+        raw = await get_redis().hgetall(f"alexa:{session_id}")
+        return AlexaSession(session_id, {k: json.loads(v) for k, v in raw.items()})
 
 
 class AlexaResponse:
@@ -0,0 +1,73 @@
+"""Pick the Whisper model and decoding settings for a voice note."""
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Smallest to largest; pressure steps down this ladder
+MODEL_LADDER = ("tiny", "base", "small", "medium", "large-v3")
+
+
+@dataclass(frozen=True)
+class TranscriptionPlan:
+    """Model and beam size chosen for one transcription."""
+
+    model: str
+    beam_size: int
+
+
+def choose_plan(duration: float | None, queue_depth: int, *, vip: bool) -> TranscriptionPlan:
+    """
+    Choose a model for a note of ``duration`` seconds with ``queue_depth`` jobs waiting.
+
+    Short clips use the fast model and greedy decoding; long notes and VIP
+    senders use the accurate one. Every ``whisper_pressure_depth`` queued jobs
+    step the choice one size down (never below the default model for VIPs)
+    and switch to greedy decoding.
+    """
+    if vip or (duration is not None and duration >= settings.whisper_long_seconds):
+        model = settings.whisper_model_accurate
+    elif duration is not None and duration <= settings.whisper_short_seconds:
+        model = settings.whisper_model_fast
+    else:
+        model = settings.whisper_model
+
+    beam_size = 1 if model == settings.whisper_model_fast else 5
+    steps = queue_depth // settings.whisper_pressure_depth if settings.whisper_pressure_depth else 0
+    if steps and model in MODEL_LADDER:
+        floor = settings.whisper_model if vip else MODEL_LADDER[0]
+        index = max(MODEL_LADDER.index(model) - steps, _ladder_index(floor))
+        model = MODEL_LADDER[index]
+        beam_size = 1
+    return TranscriptionPlan(model=model, beam_size=beam_size)
+
+
+def _ladder_index(model: str) -> int:
+    return MODEL_LADDER.index(model) if model in MODEL_LADDER else 0
+
+
+async def probe_duration(path: Path | str) -> float | None:
+    """Return the duration of an audio file in seconds, read by ffprobe from the container."""
+    proc = await asyncio.create_subprocess_exec(
+        "ffprobe",
+        "-v",
+        "error",
+        "-show_entries",
+        "format=duration",
+        "-of",
+        "default=noprint_wrappers=1:nokey=1",
+        str(path),
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+    stdout, _ = await proc.communicate()
+    try:
+        return float(stdout)
+    except ValueError:
+        logger.warning("ffprobe could not read the duration of %s", path)
+        return None
@@ -1,81 +1,245 @@
 """Audio processing: convert OGG voice notes to MP3 and transcribe with Whisper."""
 
 import asyncio
+import hashlib
 import logging
-import shutil
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
 from pathlib import Path
 
+from audio.policy import choose_plan, probe_duration
+from audio.profiles import DEFAULT, encode
+from audio.transcriber import transcriber
 from config import settings
+from database.engine import async_session_factory, db_stage
+from database.repo import MessageRepo
+from media.retention import record_access, register as register_media
+from metrics import metrics
 
 logger = logging.getLogger(__name__)
 
 MEDIA_DIR = Path(settings.media_dir)
 
 
+@dataclass(frozen=True)
+class ProcessedAudio:
+    """Result of processing a voice note, shared by every copy of the same file."""
+
+    local_path: str | None  # None when the MP3 could not be encoded
+    public_url: str | None
+    transcription: str | None
+    transcription_model: str | None
+    media_sha256: str
+
+
+# Recent results by content hash: joins concurrent copies of a file and covers
+# the window before deferred audio columns reach the database
+_recent: OrderedDict[str, asyncio.Task[ProcessedAudio]] = OrderedDict()
+RECENT_MAX = 256
+
+
 class AudioProcessor:
     """Handles converting and transcribing WhatsApp voice note messages."""
 
     @staticmethod
-    async def process(message_id: str, local_audio_path: str) -> tuple[str, str, str | None]:
+    async def process(
+        message_id: str,
+        local_audio_path: str,
+        on_partial: Callable[[str], Awaitable[None]] | None = None,
+        *,
+        vip: bool = False,
+    ) -> ProcessedAudio:
         """
         Convert a local OGG file to MP3 and optionally transcribe it.
 
         The WhatsApp Go container writes audio to a local path inside the shared
         volume (e.g. ``/data/media/xxxx.ogg``). This method converts it to MP3
-        for Alexa playback and runs Whisper if enabled.
-
-        Returns:
-            Tuple of ``(local_mp3_path, public_url, transcription_or_None)``.
+        for Alexa playback and runs Whisper if enabled. For long notes,
+        ``on_partial`` receives the transcription of the first chunk early.
+        The Whisper model is picked from the note's duration, the transcription
+        backlog, and ``vip`` (see :func:`audio.policy.choose_plan`).
 
+        Media is content-addressed by the SHA-256 of the source file: a file
+        seen before (forwarded notes) reuses the stored MP3 and transcription.
         """
         MEDIA_DIR.mkdir(parents=True, exist_ok=True)
 
         ogg_src = Path(local_audio_path)
         ogg_dst = MEDIA_DIR / f"{message_id}.ogg"
 
-        # Copy to our media dir if the file lives elsewhere
-        if ogg_src != ogg_dst:
-            shutil.copy2(ogg_src, ogg_dst)
-
-        # Convert OGG → MP3
-        mp3_path = MEDIA_DIR / f"{message_id}.mp3"
-        proc = await asyncio.create_subprocess_exec(
-            "ffmpeg",
-            "-i",
-            str(ogg_dst),
-            "-codec:a",
-            "libmp3lame",
-            "-q:a",
-            "4",
-            str(mp3_path),
-            "-y",
-            stdout=asyncio.subprocess.DEVNULL,
-            stderr=asyncio.subprocess.DEVNULL,
+        # Hold our own link to the source so it survives until both jobs are done
+        ogg_path = _link(ogg_src, ogg_dst)
+        try:
+            digest = await asyncio.to_thread(_sha256, ogg_path)
+        except BaseException:
+            ogg_dst.unlink(missing_ok=True)
+            raise
+
+        task = _recent.get(digest)
+        if task is not None and task.done() and not await asyncio.to_thread(_usable, task):
+            # Retention removed the MP3 (or it never got encoded); process the file again
+            del _recent[digest]
+            task = None
+        if task is not None:
+            # Same file seen moments ago (or still being processed) in this process
+            ogg_dst.unlink(missing_ok=True)
+            _recent.move_to_end(digest)
+            metrics.incr("audio.dedup.hit")
+            audio = await asyncio.shield(task)
+            if audio.local_path:
+                await record_access(Path(audio.local_path).name)
+            return audio
+
+        task = asyncio.create_task(
+            _load_or_convert(digest, message_id, ogg_path, ogg_dst, on_partial, vip)
         )
-        await proc.wait()
+        task.add_done_callback(lambda t: _forget_failed(digest, t))
+        _recent[digest] = task
+        while len(_recent) > RECENT_MAX:
+            _recent.popitem(last=False)
+        return await asyncio.shield(task)
+
+
+def _usable(task: asyncio.Task[ProcessedAudio]) -> bool:
+    if task.cancelled() or task.exception() is not None:
+        return False
+    local_path = task.result().local_path
+    return local_path is not None and Path(local_path).exists()
+
+
+def _sha256(path: Path) -> str:
+    with path.open("rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+async def _load_or_convert(
+    digest: str,
+    message_id: str,
+    ogg_path: Path,
+    ogg_dst: Path,
+    on_partial: Callable[[str], Awaitable[None]] | None,
+    vip: bool,
+) -> ProcessedAudio:
+    try:
+        stored = await _find_stored(digest)
+    except BaseException:
+        ogg_dst.unlink(missing_ok=True)
+        raise
+    if stored is not None:
+        ogg_dst.unlink(missing_ok=True)
+        metrics.incr("audio.dedup.hit")
+        return stored
+    metrics.incr("audio.dedup.miss")
+    return await _convert(digest, message_id, ogg_path, ogg_dst, on_partial, vip)
+
+
+async def _find_stored(digest: str) -> ProcessedAudio | None:
+    """Return the result of an earlier message with the same source file, if still on disk."""
+    with db_stage("ingest"):
+        async with async_session_factory() as session:
+            row = await MessageRepo.find_audio_by_hash(
+                session, digest, with_transcription=settings.whisper_enabled
+            )
+    if row is None or not row.audio_local_path or not Path(row.audio_local_path).exists():
+        return None
+    await record_access(Path(row.audio_local_path).name)
+    return ProcessedAudio(
+        local_path=row.audio_local_path,
+        public_url=row.audio_public_url or _public_url(digest),
+        transcription=row.transcription,
+        transcription_model=row.transcription_model,
+        media_sha256=digest,
+    )
+
+
+def _forget_failed(digest: str, task: asyncio.Task) -> None:
+    if (task.cancelled() or task.exception() is not None) and _recent.get(digest) is task:
+        del _recent[digest]
+
+
+async def _convert(
+    digest: str,
+    message_id: str,
+    ogg_path: Path,
+    ogg_dst: Path,
+    on_partial: Callable[[str], Awaitable[None]] | None,
+    vip: bool,
+) -> ProcessedAudio:
+    mp3_path = MEDIA_DIR / f"{digest}.mp3"
+    try:
+        # Whisper decodes the original OGG while ffmpeg encodes the streaming MP3 for Alexa
+        with metrics.timer("audio.process"):
+            encoded, (transcription, model) = await asyncio.gather(
+                encode(ogg_path, mp3_path, DEFAULT),
+                _transcribe(message_id, ogg_path, on_partial, vip=vip),
+            )
+    finally:
         ogg_dst.unlink(missing_ok=True)
 
-        public_url = f"{settings.public_base_url}/media/{message_id}.mp3"
-
-        transcription = None
-        if settings.whisper_enabled:
-            try:
-                transcription = await _transcribe(mp3_path)
-            except Exception:
-                logger.exception("Whisper transcription failed for %s", message_id)
-
-        return str(mp3_path), public_url, transcription
-
-
-async def _transcribe(mp3_path: Path) -> str:
-    """Run faster-whisper transcription in a thread pool executor."""
-    from faster_whisper import WhisperModel
-
-    loop = asyncio.get_event_loop()
-
-    def _run() -> str:
-        model = WhisperModel(settings.whisper_model, device="cpu", compute_type="int8")
-        segments, _ = model.transcribe(str(mp3_path), language="pt")
-        return " ".join(s.text for s in segments).strip()
+    if not encoded:
+        return ProcessedAudio(
+            local_path=None,
+            public_url=None,
+            transcription=transcription,
+            transcription_model=model,
+            media_sha256=digest,
+        )
 
-    return await loop.run_in_executor(None, _run)
+    size = (await asyncio.to_thread(mp3_path.stat)).st_size
+    with db_stage("ingest"):
+        await register_media(mp3_path.name, size, digest, message_id)
+    return ProcessedAudio(
+        local_path=str(mp3_path),
+        public_url=_public_url(digest),
+        transcription=transcription,
+        transcription_model=model,
+        media_sha256=digest,
+    )
+
+
+def _public_url(digest: str) -> str:
+    return f"{settings.public_base_url}/media/{digest}.mp3"
+
+
+def _link(src: Path, dst: Path) -> Path:
+    """Hardlink ``src`` into the media dir, or read it in place across devices."""
+    if src == dst:
+        return src
+    try:
+        dst.unlink(missing_ok=True)
+        dst.hardlink_to(src)
+    except OSError:
+        return src
+    return dst
+
+
+async def _transcribe(
+    message_id: str,
+    src: Path,
+    on_partial: Callable[[str], Awaitable[None]] | None,
+    *,
+    vip: bool,
+) -> tuple[str | None, str | None]:
+    """
+    Transcribe ``src`` when Whisper is enabled and return ``(text, model)``.
+
+    Failures yield no transcription.
+    """
+    if not settings.whisper_enabled:
+        return None, None
+    duration = await probe_duration(src)
+    plan = choose_plan(duration, transcriber.queue_depth, vip=vip)
+    metrics.incr(f"transcription.model.{plan.model}")
+    try:
+        text = await transcriber.transcribe(
+            src,
+            on_partial=on_partial,
+            model=plan.model,
+            beam_size=plan.beam_size,
+            duration=duration,
+        )
+    except Exception:
+        logger.exception("Whisper transcription failed for %s", message_id)
+        return None, None
+    return text, plan.model
@@ -0,0 +1,110 @@
+"""
+Named ffmpeg encoding profiles for the audio Alexa plays.
+
+``stream`` is written eagerly by the pipeline as ``<name>.mp3`` and used for
+AudioPlayer. Other profiles (e.g. ``ssml``) are derived from it on first request
+as ``<name>.<profile>.mp3`` and cached next to it.
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+
+from config import settings
+from media.retention import register
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class EncodingProfile:
+    """ffmpeg output options for one use of the audio."""
+
+    name: str
+    args: tuple[str, ...]
+
+
+# SSML <audio> only accepts 48 kbps MP3 at 16/22.05/24 kHz
+SSML = EncodingProfile(
+    "ssml", ("-ac", "1", "-ar", "24000", "-codec:a", "libmp3lame", "-b:a", "48k")
+)
+# AudioPlayer streams; mono voice at 64 kbps starts fast and sounds clean
+STREAM = EncodingProfile(
+    "stream", ("-ac", "1", "-ar", "24000", "-codec:a", "libmp3lame", "-b:a", "64k")
+)
+
+PROFILES = {p.name: p for p in (SSML, STREAM)}
+DEFAULT = STREAM
+
+_pending: dict[str, asyncio.Task[bool]] = {}
+
+
+def variant_name(name: str, profile: EncodingProfile) -> str:
+    """Return the file name of ``profile``'s encoding of the default-profile file ``name``."""
+    if profile is DEFAULT:
+        return name
+    return f"{name.removesuffix('.mp3')}.{profile.name}.mp3"
+
+
+def variant_url(url: str, profile: EncodingProfile) -> str:
+    """Return the public URL of ``profile``'s encoding of a default-profile URL."""
+    base, _, name = url.rpartition("/")
+    return f"{base}/{variant_name(name, profile)}"
+
+
+async def encode(src: Path, dst: Path, profile: EncodingProfile) -> bool:
+    """Encode ``src`` with ``profile``, publishing ``dst`` atomically once complete."""
+    partial = dst.with_name(f"{dst.name}.{src.stem}.part")
+    proc = await asyncio.create_subprocess_exec(
+        "ffmpeg",
+        "-i",
+        str(src),
+        *profile.args,
+        "-f",
+        "mp3",
+        str(partial),
+        "-y",
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+    if await proc.wait() != 0:
+        logger.warning(
+            "ffmpeg exited with %s encoding %s as %s", proc.returncode, src, profile.name
+        )
+        await asyncio.to_thread(partial.unlink, missing_ok=True)
+        return False
+    await asyncio.to_thread(partial.replace, dst)
+    return True
+
+
+async def ensure_variant(name: str) -> Path | None:
+    """
+    Create a missing ``<base>.<profile>.mp3`` from ``<base>.mp3``.
+
+    Returns the file's path, or None when ``name`` is not a profile variant or
+    its source is gone. Concurrent requests for the same file share one encode.
+    """
+    base, _, profile_name = name.removesuffix(".mp3").rpartition(".")
+    profile = PROFILES.get(profile_name)
+    if not base or profile is None or profile is DEFAULT:
+        return None
+
+    media_dir = Path(settings.media_dir)
+    task = _pending.get(name)
+    if task is None:
+        task = asyncio.create_task(_derive(media_dir / f"{base}.mp3", media_dir / name, profile))
+        _pending[name] = task
+        task.add_done_callback(lambda _: _pending.pop(name, None))
+    return media_dir / name if await asyncio.shield(task) else None
+
+
+async def _derive(src: Path, dst: Path, profile: EncodingProfile) -> bool:
+    if not await asyncio.to_thread(src.exists):
+        return False
+    if not await encode(src, dst, profile):
+        return False
+    size = (await asyncio.to_thread(dst.stat)).st_size
+    sha = src.name.removesuffix(".mp3")
+    await register(dst.name, size, sha if len(sha) == 64 else None, None)
+    return True
@@ -0,0 +1,260 @@
+"""
+Warm Whisper transcription service.
+
+Models are loaded once per worker process (by the pool initializer) and kept
+for the life of the process, instead of being rebuilt for every voice note.
+Other sizes requested per job are loaded on demand; each worker keeps at most
+``whisper_models_per_worker`` models, dropping the least recently used.
+Jobs wait in the pool's call queue when every worker is busy, so concurrent
+notes never load extra copies of the weights.
+
+Long notes are decoded once to 16 kHz PCM, split on silences (Silero VAD)
+into chunks of about ``whisper_chunk_seconds`` and the chunks' samples are
+transcribed in parallel across the workers and stitched back in order; the
+first chunk's text is handed to the caller as soon as it is ready.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from config import settings
+from metrics import metrics
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16_000
+
+type Clip = tuple[float, float]
+
+# Worker-process state, set by ``_init_worker``
+_models: OrderedDict = OrderedDict()
+_max_models = 1
+_cpu_threads = 0
+
+
+def _init_worker(model_name: str, cpu_threads: int, max_models: int) -> None:
+    global _cpu_threads, _max_models
+    _cpu_threads = cpu_threads
+    _max_models = max(1, max_models)
+    _load(model_name)
+
+
+def _load(model_name: str):  # noqa: ANN202
+    from faster_whisper import WhisperModel
+
+    model = _models.get(model_name)
+    if model is not None:
+        _models.move_to_end(model_name)
+        return model
+
+    while len(_models) >= _max_models:
+        _models.popitem(last=False)  # free the weights before loading the next model
+    model = WhisperModel(
+        model_name,
+        device="cpu",
+        compute_type="int8",
+        cpu_threads=_cpu_threads,
+        num_workers=1,
+    )
+    _models[model_name] = model
+    return model
+
+
+def _ping() -> None:
+    """No-op job used to spawn (and so warm up) the worker processes."""
+
+
+def _plan(
+    path: str, chunk_seconds: float, min_seconds: float
+) -> tuple[np.ndarray, list[Clip] | None]:
+    """
+    Decode the note and return its samples with the chunks to transcribe.
+
+    The chunks are None when the note is short enough for one pass.
+    """
+    from faster_whisper.audio import decode_audio
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+    audio = decode_audio(path, sampling_rate=SAMPLE_RATE)
+    if len(audio) < min_seconds * SAMPLE_RATE:
+        return audio, None
+    speech = get_speech_timestamps(audio, VadOptions(min_silence_duration_ms=500))
+    spans = [(s["start"] / SAMPLE_RATE, s["end"] / SAMPLE_RATE) for s in speech]
+    return audio, pack_chunks(spans, chunk_seconds)
+
+
+def pack_chunks(spans: list[Clip], chunk_seconds: float) -> list[Clip]:
+    """
+    Group consecutive speech spans into chunks of at most ``chunk_seconds``.
+
+    Chunks end on a silence whenever possible; a single span longer than the
+    limit is cut at fixed intervals.
+    """
+    chunks: list[Clip] = []
+    for start, end in spans:
+        if chunks and end - chunks[-1][0] <= chunk_seconds:
+            chunks[-1] = (chunks[-1][0], end)
+            continue
+        while end - start > chunk_seconds:
+            chunks.append((start, start + chunk_seconds))
+            start += chunk_seconds
+        chunks.append((start, end))
+    return chunks
+
+
+def _run(
+    audio: str | np.ndarray, model_name: str, language: str, beam_size: int
+) -> tuple[str, float]:
+    """Transcribe a file path or already decoded 16 kHz samples."""
+    start = time.perf_counter()
+    segments, _ = _load(model_name).transcribe(audio, language=language, beam_size=beam_size)
+    text = " ".join(s.text for s in segments).strip()
+    return text, time.perf_counter() - start
+
+
+class TranscriptionService:
+    """Pool of worker processes, each holding a loaded Whisper model."""
+
+    def __init__(
+        self,
+        workers: int,
+        cpu_threads: int,
+        model_name: str,
+        chunk_seconds: float,
+        min_chunked_seconds: float,
+        max_models: int = 1,
+    ) -> None:
+        self._workers = max(1, workers)
+        self._cpu_threads = cpu_threads
+        self._model_name = model_name
+        self._max_models = max_models
+        self._chunk_seconds = chunk_seconds
+        self._min_chunked_seconds = min_chunked_seconds
+        self._executor: ProcessPoolExecutor | None = None
+        self._in_flight = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of jobs waiting for a free worker."""
+        return max(0, self._in_flight - self._workers)
+
+    def start(self) -> None:
+        """Spawn the workers and load the model in the background."""
+        executor = self._get_executor()
+        for _ in range(self._workers):
+            executor.submit(_ping)
+
+    def shutdown(self) -> None:
+        """Stop the workers, dropping queued jobs."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def transcribe(
+        self,
+        path: Path | str,
+        language: str = "pt",
+        on_partial: Callable[[str], Awaitable[None]] | None = None,
+        *,
+        model: str | None = None,
+        beam_size: int = 5,
+        duration: float | None = None,
+    ) -> str:
+        """
+        Transcribe an audio file, waiting for a free worker if needed.
+
+        ``model`` defaults to the preloaded one; other sizes are loaded by each
+        worker on first use and kept while they are among its most recently
+        used. When the note is long enough to be chunked, ``on_partial`` is
+        awaited with the first chunk's text while the remaining chunks are still
+        being transcribed. A known ``duration`` below the chunking threshold
+        skips the VAD pass.
+        """
+        job = (model or self._model_name, language, beam_size)
+        audio: str | np.ndarray = str(path)
+        clips = None
+        long_enough = duration is None or duration >= self._min_chunked_seconds
+        if self._min_chunked_seconds > 0 and long_enough:
+            audio, clips = await self._call(
+                _plan, str(path), self._chunk_seconds, self._min_chunked_seconds
+            )
+        if clips is None:
+            return await self._transcribe_clip(audio, *job)
+
+        metrics.incr("transcription.chunked")
+        tasks = [
+            asyncio.ensure_future(
+                self._transcribe_clip(
+                    audio[int(start * SAMPLE_RATE) : int(end * SAMPLE_RATE)], *job
+                )
+            )
+            for start, end in clips
+        ]
+        try:
+            if tasks and on_partial is not None:
+                first = await tasks[0]
+                try:
+                    await on_partial(first)
+                except Exception:
+                    logger.exception("Partial transcription callback failed for %s", path)
+            texts = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        return " ".join(text for text in texts if text)
+
+    async def _transcribe_clip(
+        self, audio: str | np.ndarray, model: str, language: str, beam_size: int
+    ) -> str:
+        start = time.perf_counter()
+        text, inference = await self._call(_run, audio, model, language, beam_size)
+        metrics.observe("transcription.inference", inference)
+        metrics.observe(f"transcription.inference.{model}", inference)
+        metrics.observe("transcription.queue_wait", time.perf_counter() - start - inference)
+        return text
+
+    async def _call[R](self, fn: Callable[..., R], *args: object) -> R:
+        loop = asyncio.get_running_loop()
+        self._in_flight += 1
+        metrics.gauge("transcription.queue_depth", self.queue_depth)
+        try:
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM); start a fresh pool for the next job
+            self.shutdown()
+            raise
+        finally:
+            self._in_flight -= 1
+            metrics.gauge("transcription.queue_depth", self.queue_depth)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self._workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self._model_name, self._cpu_threads, self._max_models),
+            )
+        return self._executor
+
+
+transcriber = TranscriptionService(
+    workers=settings.whisper_workers,
+    cpu_threads=settings.whisper_cpu_threads,
+    model_name=settings.whisper_model,
+    chunk_seconds=settings.whisper_chunk_seconds,
+    min_chunked_seconds=settings.whisper_chunk_min_seconds,
+    max_models=settings.whisper_models_per_worker,
+)
@@ -13,10 +13,36 @@ class Settings(BaseSettings):
     # Redis
     redis_url: str = "redis://localhost:6379/0"
 
+    # Ingestion queue (Redis Streams)
+    ingestion_embedded_worker: bool = True  # run a worker pool inside the API process
+    ingestion_concurrency: int = 8  # max pipelines in flight per worker process
+    ingestion_max_retries: int = 3
+    ingestion_retry_idle_ms: int = 60_000
+    ingestion_stream_maxlen: int = 100_000
+
+    # Per-chat burst coalescing (quiet <= 0 disables it)
+    coalesce_quiet_seconds: float = 3.0
+    coalesce_max_wait_seconds: float = 10.0
+
+    # Write audio results together with the classification instead of right away
+    pipeline_defer_writes: bool = True
+
+    # Batched LLM classification: batch once the ingestion backlog exceeds `threshold` messages
+    classifier_batch_threshold: int = 4
+    classifier_batch_size: int = 10  # <= 1 disables batching
+    classifier_batch_linger_seconds: float = 0.2
+
+    # Preferences snapshot cache (invalidated over Redis pub/sub; TTL is a safety net)
+    preferences_cache_ttl_seconds: float = 300.0
+
     # WhatsApp Go REST
     whatsapp_api_url: str = "http://localhost:3000"
     whatsapp_device_id: str = "brain"
     webhook_secret: str = ""
+    history_max_messages: int = 50  # per-chat ring buffer fed by webhooks
+    history_ttl_seconds: int = 7 * 24 * 3600
+    contacts_refresh_seconds: float = 900.0
+    contacts_min_refresh_seconds: float = 60.0  # floor between refreshes forced by lookup misses
 
     # AI - model string no formato "provider:model-name"
     ai_model: KnownModelName = "anthropic:claude-sonnet-4-6"
@@ -26,14 +52,45 @@ class Settings(BaseSettings):
     alexa_client_id: str = ""
     alexa_client_secret: str = ""
     alexa_user_id: str = ""
+    alexa_token_refresh_seconds: float = 300.0  # refresh the access token this long before expiry
+    notify_merge_seconds: float = 3.0  # alerts per sender/urgency merged into one event
+    notify_rate_limit: int = 10  # events per user per rate window (<= 0 disables)
+    notify_rate_window_seconds: int = 60
+    notify_outbox_concurrency: int = 4  # requests in flight to the Proactive Events API
+    notify_max_attempts: int = 8
+    notify_retry_base_seconds: float = 2.0  # doubles on every failed attempt
+    notify_retry_max_seconds: float = 300.0
+    quiet_deferred_max: int = 1000  # messages held back during quiet hours for the briefing
+
+    # Morning digest
+    digest_concurrency: int = 4  # summaries in flight at once
+    digest_small_chat_messages: int = 3  # chats this small share a prompt
+    digest_pack_size: int = 8  # small chats per shared prompt
+    digest_timeout_seconds: float = 120.0
 
     # Media
     media_dir: str = "/data/media"
     public_base_url: str = "http://localhost:8000"
+    media_url_secret: str = ""  # signs /media URLs; empty serves them unsigned
+    media_url_ttl_seconds: int = 24 * 3600
+    media_quota_bytes: int = 5 * 1024**3
+    media_max_age_days: int = 7
+    media_retention_interval_minutes: int = 60
+    media_retention_batch_size: int = 500
 
     # Whisper
     whisper_enabled: bool = True
-    whisper_model: str = "small"
+    whisper_model: str = "small"  # default, preloaded by every worker
+    whisper_model_fast: str = "base"  # short clips
+    whisper_model_accurate: str = "medium"  # long notes and VIP senders
+    whisper_short_seconds: float = 15.0
+    whisper_long_seconds: float = 120.0
+    whisper_pressure_depth: int = 4  # queued jobs per step down to a smaller model (0 disables)
+    whisper_workers: int = 1  # processes, each holding its own copy of the model
+    whisper_models_per_worker: int = 2  # loaded models kept per worker, least recently used go
+    whisper_cpu_threads: int = 4  # inference threads per worker process
+    whisper_chunk_min_seconds: float = 60.0  # longer notes are split on silences (<= 0 disables)
+    whisper_chunk_seconds: float = 30.0
 
 
 settings = Settings()
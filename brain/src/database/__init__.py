@@ -1 +1 @@
-"""Database engine, ORM models, and repository layer."""
+"""Database engine, ORM models, repository layer, and shared Redis client."""
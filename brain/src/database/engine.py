@@ -1,13 +1,37 @@
-from collections.abc import AsyncGenerator
+from collections.abc import AsyncGenerator, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
 
 import sqlalchemy as sa
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
 from config import settings
+from metrics import metrics
 
 engine = create_async_engine(settings.database_url, echo=False)
 async_session_factory = async_sessionmaker(engine, expire_on_commit=False)
 
+_db_stage: ContextVar[str] = ContextVar("db_stage", default="other")
+
+
+@contextmanager
+def db_stage(name: str) -> Iterator[None]:
+    """Attribute the DB round trips issued inside the block to pipeline stage ``name``."""
+    token = _db_stage.set(name)
+    try:
+        yield
+    finally:
+        _db_stage.reset(token)
+
+
+def _count_round_trip(*_args: object) -> None:
+    metrics.incr(f"db.round_trips.{_db_stage.get()}")
+
+
+# Every statement plus BEGIN/COMMIT/ROLLBACK is one network round trip with asyncpg
+for _event in ("before_cursor_execute", "begin", "commit", "rollback"):
+    sa.event.listen(engine.sync_engine, _event, _count_round_trip)
+
 
 async def get_session() -> AsyncGenerator[AsyncSession]:
     """Yield an async database session for use as a FastAPI dependency."""
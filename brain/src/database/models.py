@@ -3,7 +3,7 @@ import enum
 import json
 from datetime import UTC
 
-from sqlalchemy import Enum as SAEnum, Text
+from sqlalchemy import BigInteger, Enum as SAEnum, Index, Text, text
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
 
@@ -24,6 +24,16 @@ class ProcessedMessage(Base):
     """Log de todas as mensagens recebidas e como foram tratadas."""
 
     __tablename__ = "processed_messages"
+    __table_args__ = (
+        # Serves get_unread_summary with an index-only scan over unread rows only
+        Index(
+            "ix_processed_messages_unread_chat_urgency",
+            "chat_jid",
+            "urgency",
+            postgresql_where=text("read_by_user = false"),
+            postgresql_include=["received_at", "sender_name"],
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     message_id: Mapped[str] = mapped_column(unique=True, index=True)
@@ -35,9 +45,12 @@ class ProcessedMessage(Base):
     audio_local_path: Mapped[str | None]
     audio_public_url: Mapped[str | None]
     transcription: Mapped[str | None] = mapped_column(Text)
+    transcription_model: Mapped[str | None]  # Whisper model size used
+    media_sha256: Mapped[str | None] = mapped_column(index=True)  # SHA-256 of the source audio
     summary: Mapped[str | None] = mapped_column(Text)
     urgency: Mapped[UrgencyLevel] = mapped_column(SAEnum(UrgencyLevel), default=UrgencyLevel.LOW)
     notified: Mapped[bool] = mapped_column(default=False)
+    decided_by: Mapped[str | None]  # rules | llm
     read_by_user: Mapped[bool] = mapped_column(default=False)
     received_at: Mapped[datetime.datetime] = mapped_column(
         default=lambda: datetime.datetime.now(UTC).replace(tzinfo=None)
@@ -45,6 +58,23 @@ class ProcessedMessage(Base):
     processed_at: Mapped[datetime.datetime | None]
 
 
+class MediaFile(Base):
+    """Índice dos arquivos em ``media_dir``, usado pela retenção por cota e idade."""
+
+    __tablename__ = "media_files"
+
+    name: Mapped[str] = mapped_column(primary_key=True)  # file name inside media_dir
+    media_sha256: Mapped[str | None]
+    message_id: Mapped[str | None]  # WhatsApp message that first produced the file
+    size_bytes: Mapped[int] = mapped_column(BigInteger)
+    created_at: Mapped[datetime.datetime] = mapped_column(
+        default=lambda: datetime.datetime.now(UTC).replace(tzinfo=None)
+    )
+    last_accessed_at: Mapped[datetime.datetime] = mapped_column(
+        default=lambda: datetime.datetime.now(UTC).replace(tzinfo=None), index=True
+    )
+
+
 class UserPreferences(Base):
     """Configurações do usuário (único usuário no sistema self-hosted)."""
 
@@ -0,0 +1,180 @@
+"""
+Immutable, pre-parsed UserPreferences snapshot with a process-level cache.
+
+Every hot path (message pipeline, Alexa handlers, proactive notifier) reads
+``await preferences_cache.get()`` instead of querying ``user_preferences``.
+Writers go through :class:`PreferencesRepo`, which publishes on
+``PREFERENCES_CHANNEL``; every process listening on it drops its snapshot.
+"""
+
+import asyncio
+import datetime
+import json
+import logging
+import re
+import time
+from dataclasses import dataclass
+
+from redis.exceptions import RedisError
+
+from config import settings
+from database.engine import async_session_factory
+from database.models import UserPreferences
+from database.redis import PREFERENCES_CHANNEL, get_redis
+from database.repo import PreferencesRepo
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def compile_keywords(keywords: list[str] | tuple[str, ...]) -> re.Pattern[str] | None:
+    """
+    Build a single matcher for every keyword, scanning the text once.
+
+    Longest keywords come first so "muito urgente" wins over "urgente", and
+    matches must sit on word boundaries so "ajuda" does not fire on "ajudante".
+    """
+    words = sorted({k.strip().casefold() for k in keywords if k.strip()}, key=len, reverse=True)
+    if not words:
+        return None
+    alternation = "|".join(re.escape(w) for w in words)
+    return re.compile(rf"(?<!\w)(?:{alternation})(?!\w)")
+
+
+def _parse_hhmm(value: str) -> datetime.time:
+    hour, minute = value.split(":", 1)
+    return datetime.time(int(hour), int(minute))
+
+
+@dataclass(frozen=True)
+class PreferencesSnapshot:
+    """Read-only view of UserPreferences with JSON lists and times already parsed."""
+
+    vip_contacts: tuple[str, ...]
+    vip_lookup: frozenset[str]  # casefolded entries plus the phone part of JIDs
+    urgent_keywords: tuple[str, ...]
+    keyword_pattern: re.Pattern[str] | None
+    important_groups: frozenset[str]
+    quiet_hours_start: datetime.time
+    quiet_hours_end: datetime.time
+    quiet_hours_allow_vip: bool
+    notify_on_group_mention: bool
+    group_notify_threshold: int
+    long_message_threshold: int
+    language: str
+    whisper_transcription: bool
+
+    @classmethod
+    def from_model(cls, prefs: UserPreferences) -> PreferencesSnapshot:
+        """Parse an ORM row into a snapshot."""
+        vip_contacts = tuple(prefs.vip_contacts_list())
+        urgent_keywords = tuple(prefs.urgent_keywords_list())
+        return cls(
+            vip_contacts=vip_contacts,
+            vip_lookup=frozenset(
+                v
+                for entry in vip_contacts
+                for v in (entry.strip().casefold(), entry.strip().casefold().split("@", 1)[0])
+                if v
+            ),
+            urgent_keywords=urgent_keywords,
+            keyword_pattern=compile_keywords(urgent_keywords),
+            important_groups=frozenset(
+                g.strip().casefold() for g in json.loads(prefs.important_groups)
+            ),
+            quiet_hours_start=_parse_hhmm(prefs.quiet_hours_start),
+            quiet_hours_end=_parse_hhmm(prefs.quiet_hours_end),
+            quiet_hours_allow_vip=prefs.quiet_hours_allow_vip,
+            notify_on_group_mention=prefs.notify_on_group_mention,
+            group_notify_threshold=prefs.group_notify_threshold,
+            long_message_threshold=prefs.long_message_threshold,
+            language=prefs.language,
+            whisper_transcription=prefs.whisper_transcription,
+        )
+
+    def vip_contacts_list(self) -> list[str]:
+        """Return the VIP contacts as a Python list."""
+        return list(self.vip_contacts)
+
+    def urgent_keywords_list(self) -> list[str]:
+        """Return the urgent keywords as a Python list."""
+        return list(self.urgent_keywords)
+
+    def match_keyword(self, text: str) -> str | None:
+        """Return the first urgent keyword found in ``text``, if any."""
+        if self.keyword_pattern is None or not text:
+            return None
+        found = self.keyword_pattern.search(text.casefold())
+        return found.group(0) if found else None
+
+    def is_quiet_hours_now(self) -> bool:
+        """Return True if the current time is within the configured quiet hours."""
+        now = datetime.datetime.now().time().replace(second=0, microsecond=0)
+        start, end = self.quiet_hours_start, self.quiet_hours_end
+        if start <= end:
+            return start <= now < end
+        # overnight: e.g. 22:00 - 07:00
+        return now >= start or now < end
+
+
+class PreferencesCache:
+    """
+    Process-level holder of the current :class:`PreferencesSnapshot`.
+
+    The snapshot is dropped when a change is announced on
+    ``PREFERENCES_CHANNEL`` and, as a safety net for missed messages, after
+    ``preferences_cache_ttl_seconds``.
+    """
+
+    def __init__(self) -> None:
+        self._snapshot: PreferencesSnapshot | None = None
+        self._loaded_at = 0.0
+        self._generation = 0
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> PreferencesSnapshot:
+        """Return the cached snapshot, loading it from the database when missing or stale."""
+        snapshot = self._snapshot
+        if snapshot is not None and not self._expired():
+            metrics.incr("preferences_cache.hit")
+            return snapshot
+
+        async with self._lock:
+            if self._snapshot is not None and not self._expired():
+                return self._snapshot
+
+            metrics.incr("preferences_cache.miss")
+            generation = self._generation
+            async with async_session_factory() as session:
+                snapshot = PreferencesSnapshot.from_model(await PreferencesRepo.get(session))
+            # Only keep it if nobody invalidated while we were loading
+            if generation == self._generation:
+                self._snapshot = snapshot
+                self._loaded_at = time.monotonic()
+            return snapshot
+
+    def invalidate(self) -> None:
+        """Drop the cached snapshot so the next ``get`` reloads it."""
+        self._generation += 1
+        self._snapshot = None
+
+    async def listen(self) -> None:
+        """Drop the snapshot whenever another process announces a change. Runs until cancelled."""
+        while True:
+            try:
+                async with get_redis().pubsub() as pubsub:
+                    await pubsub.subscribe(PREFERENCES_CHANNEL)
+                    # Anything may have changed while we were not subscribed
+                    self.invalidate()
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self.invalidate()
+            except RedisError:
+                logger.exception("Preferences invalidation listener lost Redis, reconnecting")
+                await asyncio.sleep(5)
+
+    def _expired(self) -> bool:
+        return time.monotonic() - self._loaded_at > settings.preferences_cache_ttl_seconds
+
+
+preferences_cache = PreferencesCache()
@@ -0,0 +1,29 @@
+import logging
+
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+PREFERENCES_CHANNEL = "prefs:changed"
+
+_redis: aioredis.Redis | None = None
+
+
+def get_redis() -> aioredis.Redis:
+    """Return a singleton async Redis client."""
+    global _redis
+    if _redis is None:
+        _redis = aioredis.from_url(settings.redis_url, decode_responses=True)
+    return _redis
+
+
+async def publish_preferences_changed() -> None:
+    """Tell every process to drop its cached preferences snapshot."""
+    try:
+        await get_redis().publish(PREFERENCES_CHANNEL, "1")
+    except RedisError:
+        # The cache TTL still picks the change up
+        logger.warning("Could not publish the preferences change", exc_info=True)
@@ -1,11 +1,13 @@
 import datetime
 from datetime import UTC
 
-from sqlalchemy import select
-from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy import ColumnElement, String, delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import ARRAY, aggregate_order_by, insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 
-from database.models import ProcessedMessage, UrgencyLevel, UserPreferences
+from database.models import MediaFile, ProcessedMessage, UrgencyLevel, UserPreferences
+from database.redis import publish_preferences_changed
 
 
 class MessageRepo:
@@ -29,56 +31,115 @@ class MessageRepo:
         return result.scalar_one_or_none()
 
     @staticmethod
-    async def get_unread_summary(session: AsyncSession) -> list[dict]:
-        """Return per-chat unread counts and highest urgency level."""
+    async def get_unprocessed(session: AsyncSession, message_id: str) -> ProcessedMessage | None:
+        """Return the message if it was persisted but never classified, else None."""
         result = await session.execute(
-            select(ProcessedMessage).where(ProcessedMessage.read_by_user == False)  # noqa: E712
+            select(ProcessedMessage).where(
+                ProcessedMessage.message_id == message_id,
+                ProcessedMessage.processed_at.is_(None),
+            )
         )
-        messages = result.scalars().all()
+        return result.scalar_one_or_none()
 
-        grouped: dict[str, dict] = {}
-        for msg in messages:
-            key = msg.chat_jid
-            if key not in grouped:
-                grouped[key] = {"name": msg.sender_name, "count": 0, "urgency": "LOW"}
-            grouped[key]["count"] += 1
-            current = UrgencyLevel[grouped[key]["urgency"]]
-            if UrgencyLevel[msg.urgency.value].value > current.value:
-                grouped[key]["urgency"] = msg.urgency.value
+    @staticmethod
+    async def get_unread_summary(session: AsyncSession) -> list[dict]:
+        """
+        Return per-chat unread counts, highest urgency, and latest sender name.
 
-        return list(grouped.values())
+        Aggregated in a single GROUP BY served by the partial unread index; chats
+        are ordered by urgency, then by unread count.
+        """
+        latest_sender = func.array_agg(
+            aggregate_order_by(ProcessedMessage.sender_name, ProcessedMessage.received_at.desc()),
+            type_=ARRAY(String),
+        )[1]
+        max_urgency = func.max(ProcessedMessage.urgency)
+        unread_count = func.count()
+        result = await session.execute(
+            select(
+                latest_sender.label("name"),
+                unread_count.label("count"),
+                max_urgency.label("urgency"),
+            )
+            .where(ProcessedMessage.read_by_user == False)  # noqa: E712
+            .group_by(ProcessedMessage.chat_jid)
+            .order_by(max_urgency.desc(), unread_count.desc())
+        )
+        return [
+            {"name": row.name, "count": row.count, "urgency": row.urgency.value} for row in result
+        ]
 
     @staticmethod
     async def update_audio(
         session: AsyncSession,
         record_id: int,
-        local_path: str,
-        public_url: str,
+        local_path: str | None,
+        public_url: str | None,
         transcription: str | None,
+        transcription_model: str | None = None,
+        media_sha256: str | None = None,
     ) -> None:
         """Update audio paths and transcription for a processed message."""
-        msg = await session.get(ProcessedMessage, record_id)
-        if msg:
-            msg.audio_local_path = local_path
-            msg.audio_public_url = public_url
-            msg.transcription = transcription
-            await session.commit()
+        await session.execute(
+            update(ProcessedMessage)
+            .where(ProcessedMessage.id == record_id)
+            .values(
+                audio_local_path=local_path,
+                audio_public_url=public_url,
+                transcription=transcription,
+                transcription_model=transcription_model,
+                media_sha256=media_sha256,
+            )
+        )
+        await session.commit()
+
+    @staticmethod
+    async def find_audio_by_hash(
+        session: AsyncSession, media_sha256: str, *, with_transcription: bool = False
+    ) -> ProcessedMessage | None:
+        """Return the latest message whose processed audio came from the same source file."""
+        stmt = select(ProcessedMessage).where(
+            ProcessedMessage.media_sha256 == media_sha256,
+            ProcessedMessage.audio_public_url.is_not(None),
+        )
+        if with_transcription:
+            stmt = stmt.where(ProcessedMessage.transcription.is_not(None))
+        result = await session.execute(stmt.order_by(ProcessedMessage.id.desc()).limit(1))
+        return result.scalar_one_or_none()
 
     @staticmethod
     async def update_classification(
         session: AsyncSession,
-        record_id: int,
+        record_ids: list[int],
         urgency: str,
         summary: str,
         notified: bool,
+        decided_by: str,
     ) -> None:
-        """Update urgency, summary, and notified status after AI classification."""
-        msg = await session.get(ProcessedMessage, record_id)
-        if msg:
-            msg.urgency = UrgencyLevel[urgency]
-            msg.summary = summary
-            msg.notified = notified
-            msg.processed_at = datetime.datetime.now(UTC).replace(tzinfo=None)
+        """Write one classification result to every given message in a single UPDATE."""
+        await session.execute(
+            update(ProcessedMessage)
+            .where(ProcessedMessage.id.in_(record_ids))
+            .values(
+                urgency=UrgencyLevel[urgency],
+                summary=summary,
+                notified=notified,
+                decided_by=decided_by,
+                processed_at=datetime.datetime.now(UTC).replace(tzinfo=None),
+            )
+        )
+        await session.commit()
+
+    @staticmethod
+    async def update_many(session: AsyncSession, rows: list[dict]) -> None:
+        """
+        Apply per-row column values in one executemany UPDATE keyed by primary key.
+
+        Each dict holds ``id`` plus the columns to set; give every dict the same
+        keys so the rows go out as a single batch.
+        """
+        if rows:
+            await session.execute(update(ProcessedMessage), rows)
             await session.commit()
 
     @staticmethod
@@ -91,17 +152,140 @@ class MessageRepo:
         return list(result.scalars().all())
 
     @staticmethod
-    async def mark_read(session: AsyncSession, chat_jid: str) -> None:
-        """Mark all unread messages in a given chat as read."""
+    async def count_unread(session: AsyncSession, chat_jid: str) -> int:
+        """Return how many unread messages a chat currently has."""
         result = await session.execute(
-            select(ProcessedMessage).where(
+            select(func.count()).where(
                 ProcessedMessage.chat_jid == chat_jid,
                 ProcessedMessage.read_by_user == False,  # noqa: E712
             )
         )
-        for msg in result.scalars().all():
-            msg.read_by_user = True
+        return result.scalar_one()
+
+    @staticmethod
+    async def mark_read(session: AsyncSession, chat_jid: str) -> list[int]:
+        """Mark all unread messages in a given chat as read and return their ids."""
+        return await MessageRepo.mark_read_chats(session, [chat_jid])
+
+    @staticmethod
+    async def mark_read_chats(
+        session: AsyncSession,
+        chat_jids: list[str],
+        before: datetime.datetime | None = None,
+    ) -> list[int]:
+        """Mark unread messages of several chats (optionally up to ``before``) as read."""
+        conditions = [ProcessedMessage.chat_jid.in_(chat_jids)]
+        if before is not None:
+            conditions.append(ProcessedMessage.received_at <= _naive_utc(before))
+        return await MessageRepo._mark_read_where(session, *conditions)
+
+    @staticmethod
+    async def mark_read_before(session: AsyncSession, before: datetime.datetime) -> list[int]:
+        """Mark every unread message received up to ``before`` as read, across all chats."""
+        return await MessageRepo._mark_read_where(
+            session, ProcessedMessage.received_at <= _naive_utc(before)
+        )
+
+    @staticmethod
+    async def mark_read_ids(session: AsyncSession, record_ids: list[int]) -> list[int]:
+        """Mark specific messages as read (e.g. the ones just read aloud)."""
+        return await MessageRepo._mark_read_where(session, ProcessedMessage.id.in_(record_ids))
+
+    @staticmethod
+    async def _mark_read_where(
+        session: AsyncSession, *conditions: ColumnElement[bool]
+    ) -> list[int]:
+        """Flip read_by_user in one UPDATE ... RETURNING id and commit."""
+        result = await session.execute(
+            update(ProcessedMessage)
+            .where(ProcessedMessage.read_by_user == False, *conditions)  # noqa: E712
+            .values(read_by_user=True)
+            .returning(ProcessedMessage.id)
+        )
         await session.commit()
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def clear_audio(
+        session: AsyncSession, media_sha256s: list[str], local_paths: list[str]
+    ) -> int:
+        """Null out the audio file columns of messages whose file was deleted."""
+        conditions = []
+        if media_sha256s:
+            conditions.append(ProcessedMessage.media_sha256.in_(media_sha256s))
+        if local_paths:
+            conditions.append(ProcessedMessage.audio_local_path.in_(local_paths))
+        if not conditions:
+            return 0
+        result = await session.execute(
+            update(ProcessedMessage)
+            .where(or_(*conditions))
+            .values(audio_local_path=None, audio_public_url=None)
+        )
+        return result.rowcount
+
+
+class MediaRepo:
+    """Repository for the media file index (``media_files``)."""
+
+    @staticmethod
+    async def register(session: AsyncSession, rows: list[dict]) -> None:
+        """Insert files into the index, leaving already indexed ones untouched."""
+        if rows:
+            await session.execute(insert(MediaFile).on_conflict_do_nothing(), rows)
+            await session.commit()
+
+    @staticmethod
+    async def touch(session: AsyncSession, accessed: dict[str, datetime.datetime]) -> None:
+        """Record last access times, in one executemany UPDATE keyed by name."""
+        if accessed:
+            await session.execute(
+                update(MediaFile),
+                [{"name": name, "last_accessed_at": at} for name, at in accessed.items()],
+            )
+            await session.commit()
+
+    @staticmethod
+    async def indexed_names(session: AsyncSession) -> set[str]:
+        """Return the names of every indexed file."""
+        result = await session.execute(select(MediaFile.name))
+        return set(result.scalars().all())
+
+    @staticmethod
+    async def select_evictable(
+        session: AsyncSession, quota_bytes: int, accessed_before: datetime.datetime
+    ) -> list[MediaFile]:
+        """
+        Return files to evict: idle since ``accessed_before``, or beyond the quota.
+
+        Files are ranked most recently used first; every file past the point
+        where the running total exceeds ``quota_bytes`` is evicted (LRU).
+        """
+        running = (
+            func.sum(MediaFile.size_bytes)
+            .over(order_by=(MediaFile.last_accessed_at.desc(), MediaFile.name))
+            .label("running")
+        )
+        ranked = select(MediaFile, running).subquery()
+        file = aliased(MediaFile, ranked)
+        result = await session.execute(
+            select(file)
+            .where(or_(ranked.c.last_accessed_at < accessed_before, ranked.c.running > quota_bytes))
+            .order_by(ranked.c.last_accessed_at)
+        )
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def delete(session: AsyncSession, names: list[str]) -> None:
+        """Remove files from the index (the caller commits)."""
+        await session.execute(delete(MediaFile).where(MediaFile.name.in_(names)))
+
+
+def _naive_utc(value: datetime.datetime) -> datetime.datetime:
+    """Convert to the naive-UTC representation used by the timestamp columns."""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(UTC).replace(tzinfo=None)
 
 
 class PreferencesRepo:
@@ -117,6 +301,7 @@ class PreferencesRepo:
             session.add(prefs)
             await session.commit()
             await session.refresh(prefs)
+            await publish_preferences_changed()
         return prefs
 
     @staticmethod
@@ -129,4 +314,15 @@ class PreferencesRepo:
         prefs = await PreferencesRepo.get(session)
         prefs.alexa_proactive_token = token
         prefs.alexa_proactive_token_expires = expires
+        # Not announced: the token is not part of the cached preferences snapshot
+        await session.commit()
+
+    @staticmethod
+    async def revoke_token(session: AsyncSession, token: str) -> None:
+        """Clear the stored Alexa proactive token, unless it was already replaced."""
+        await session.execute(
+            update(UserPreferences)
+            .where(UserPreferences.id == 1, UserPreferences.alexa_proactive_token == token)
+            .values(alexa_proactive_token=None, alexa_proactive_token_expires=None)
+        )
         await session.commit()
@@ -0,0 +1 @@
+"""Durable Redis Streams ingestion queue and its consumer-group worker pool."""
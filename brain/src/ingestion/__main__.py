@@ -0,0 +1,42 @@
+"""
+Standalone ingestion worker process.
+
+Run with ``python -m ingestion`` to scale workers independently of the API
+(set ``INGESTION_EMBEDDED_WORKER=false`` on the API to stop it consuming).
+"""
+
+import asyncio
+import logging
+import signal
+
+from audio.transcriber import transcriber
+from config import settings
+from database.engine import init_db
+from database.preferences import preferences_cache
+from ingestion.worker import IngestionWorker
+from webhook.processor import process_incoming_message
+
+
+async def main() -> None:
+    """Run one worker pool until SIGINT/SIGTERM."""
+    await init_db()
+    worker = IngestionWorker(process_incoming_message)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    prefs_listener = asyncio.create_task(preferences_cache.listen())
+    if settings.whisper_enabled:
+        transcriber.start()
+    worker.start()
+    await stop.wait()
+    await worker.stop()
+    transcriber.shutdown()
+    prefs_listener.cancel()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,56 @@
+"""Redis Streams producer side and queue introspection for incoming webhook events."""
+
+from redis.exceptions import ResponseError
+
+from config import settings
+from database.redis import get_redis
+from metrics import metrics
+from whatsapp.models import WebhookPayload
+
+STREAM = "ingest:messages"
+DEAD_LETTER_STREAM = "ingest:dead"
+GROUP = "brain"
+
+
+async def enqueue(payload: WebhookPayload) -> str:
+    """Append a validated webhook payload to the ingestion stream and return its entry id."""
+    r = get_redis()
+    entry_id = await r.xadd(
+        STREAM,
+        {"payload": payload.model_dump_json()},
+        maxlen=settings.ingestion_stream_maxlen,
+        approximate=True,
+    )
+    metrics.incr("ingestion.enqueued")
+    return entry_id
+
+
+async def ensure_group() -> None:
+    """Create the consumer group (and the stream) if they do not exist yet."""
+    r = get_redis()
+    try:
+        await r.xgroup_create(STREAM, GROUP, id="0", mkstream=True)
+    except ResponseError as err:
+        if "BUSYGROUP" not in str(err):
+            raise
+
+
+async def queue_stats() -> dict:
+    """Return queue depth figures for the ingestion stream and its dead-letter stream."""
+    r = get_redis()
+    async with r.pipeline(transaction=False) as pipe:
+        pipe.xlen(STREAM)
+        pipe.xlen(DEAD_LETTER_STREAM)
+        length, dead = await pipe.execute()
+
+    pending = lag = 0
+    try:
+        groups = await r.xinfo_groups(STREAM)
+    except ResponseError:
+        groups = []  # stream not created yet
+    for group in groups:
+        if group["name"] == GROUP:
+            pending = group["pending"]
+            lag = group.get("lag") or 0
+
+    return {"length": length, "pending": pending, "lag": lag, "dead_letter": dead}
@@ -0,0 +1,211 @@
+"""Consumer-group worker pool that drains the ingestion stream with bounded concurrency."""
+
+import asyncio
+import logging
+import os
+import socket
+import time
+from collections.abc import Awaitable, Callable
+
+from pydantic import ValidationError
+from redis.exceptions import RedisError
+
+from config import settings
+from database.redis import get_redis
+from ingestion.stream import DEAD_LETTER_STREAM, GROUP, STREAM, ensure_group
+from metrics import metrics
+from whatsapp.models import WebhookPayload
+
+logger = logging.getLogger(__name__)
+
+# May return an awaitable for the rest of the work, which runs outside the slot
+Handler = Callable[..., Awaitable[Awaitable[None] | None]]
+
+BLOCK_MS = 5_000
+CLAIM_INTERVAL = 15.0
+
+
+class IngestionWorker:
+    """
+    Reads webhook events from the ingestion stream through a Redis consumer group.
+
+    At most ``concurrency`` pipelines run at once; nothing more is read from the
+    stream until a slot frees up, so bursts accumulate in Redis instead of in
+    memory. A handler that returns an awaitable (e.g. a coalescing window to
+    wait for) gives its slot back right away; the entry is acknowledged only
+    once that awaitable completes too. Entries in flight are re-claimed
+    periodically, which resets their idle time, so long pipelines are not
+    handed to another consumer. Failed entries stay pending and are reclaimed
+    after ``ingestion_retry_idle_ms``; after ``ingestion_max_retries`` failed
+    retries they are moved to the dead-letter stream.
+    """
+
+    def __init__(
+        self,
+        handler: Handler,
+        *,
+        concurrency: int | None = None,
+        consumer: str | None = None,
+    ) -> None:
+        self._handler = handler
+        self._concurrency = concurrency or settings.ingestion_concurrency
+        self._consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self._tasks: set[asyncio.Task] = set()  # entries holding a slot
+        self._waiting: set[asyncio.Task] = set()  # entries waiting outside their slot
+        self._active: set[str] = set()  # ids of every entry in flight
+        self._freed = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self._runner: asyncio.Task | None = None
+
+    def start(self) -> None:
+        """Start the read loop as a background task on the running event loop."""
+        self._runner = asyncio.create_task(self.run())
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        """Stop reading and wait up to ``timeout`` seconds for in-flight entries."""
+        self._stopping.set()
+        if self._runner is None:
+            return
+        try:
+            await asyncio.wait_for(self._runner, timeout)
+        except TimeoutError:
+            logger.warning(
+                "Ingestion worker did not drain in %.0fs; unacked entries will be retried",
+                timeout,
+            )
+
+    async def run(self) -> None:
+        """Consume the stream until ``stop`` is called."""
+        await ensure_group()
+        r = get_redis()
+        last_claim = 0.0
+        heartbeat = asyncio.create_task(self._heartbeat())
+
+        try:
+            while not self._stopping.is_set():
+                if len(self._tasks) >= self._concurrency:
+                    self._freed.clear()
+                    await self._freed.wait()
+                    continue
+
+                free = self._concurrency - len(self._tasks)
+                try:
+                    if time.monotonic() - last_claim >= CLAIM_INTERVAL:
+                        last_claim = time.monotonic()
+                        await self._reclaim(free)
+                        continue
+
+                    response = await r.xreadgroup(
+                        GROUP, self._consumer, {STREAM: ">"}, count=free, block=BLOCK_MS
+                    )
+                except RedisError:
+                    logger.exception("Ingestion stream read failed, backing off")
+                    await asyncio.sleep(1)
+                    continue
+
+                for _stream, entries in response or []:
+                    for entry_id, fields in entries:
+                        self._spawn(entry_id, fields, redelivered=False)
+        finally:
+            while self._tasks or self._waiting:
+                await asyncio.gather(*self._tasks, *self._waiting, return_exceptions=True)
+            heartbeat.cancel()
+            await asyncio.gather(heartbeat, return_exceptions=True)
+
+    def _spawn(self, entry_id: str, fields: dict, *, redelivered: bool) -> None:
+        self._active.add(entry_id)
+        task = asyncio.create_task(self._handle(entry_id, fields, redelivered=redelivered))
+        self._tasks.add(task)
+        task.add_done_callback(self._release)
+        task.add_done_callback(lambda _: self._active.discard(entry_id))
+
+    def _release(self, task: asyncio.Task) -> None:
+        """Give the task's slot back to the read loop."""
+        self._tasks.discard(task)
+        self._freed.set()
+
+    async def _heartbeat(self) -> None:
+        """Keep in-flight entries from going idle long enough to be reclaimed."""
+        interval = settings.ingestion_retry_idle_ms / 1000 / 4
+        while True:
+            await asyncio.sleep(interval)
+            if not self._active:
+                continue
+            try:
+                # JUSTID: resets the idle time without counting a delivery
+                await get_redis().xclaim(
+                    STREAM,
+                    GROUP,
+                    self._consumer,
+                    min_idle_time=0,
+                    message_ids=list(self._active),
+                    justid=True,
+                )
+            except RedisError:
+                logger.warning("Could not refresh in-flight ingestion entries", exc_info=True)
+
+    async def _reclaim(self, count: int) -> None:
+        """Claim entries left pending by failed attempts or crashed consumers."""
+        r = get_redis()
+        _next_id, claimed, *_ = await r.xautoclaim(
+            STREAM,
+            GROUP,
+            self._consumer,
+            min_idle_time=settings.ingestion_retry_idle_ms,
+            count=count,
+        )
+        for entry_id, fields in claimed:
+            if entry_id in self._active:
+                continue  # still running here; a missed heartbeat let it go idle
+            if not fields:
+                # Entry was trimmed from the stream while pending
+                await r.xack(STREAM, GROUP, entry_id)
+                continue
+
+            info = await r.xpending_range(STREAM, GROUP, min=entry_id, max=entry_id, count=1)
+            deliveries = info[0]["times_delivered"] if info else 1
+            if deliveries > settings.ingestion_max_retries + 1:
+                await self._dead_letter(entry_id, fields, f"gave up after {deliveries} deliveries")
+                continue
+
+            metrics.incr("ingestion.retried")
+            self._spawn(entry_id, fields, redelivered=True)
+
+    async def _handle(self, entry_id: str, fields: dict, *, redelivered: bool) -> None:
+        r = get_redis()
+        enqueued_ms = int(entry_id.split("-", 1)[0])
+        metrics.observe("ingestion.queue_wait", max(time.time() * 1000 - enqueued_ms, 0) / 1000)
+
+        try:
+            payload = WebhookPayload.model_validate_json(fields["payload"])
+        except KeyError, ValidationError:
+            logger.exception("Malformed ingestion entry %s", entry_id)
+            await self._dead_letter(entry_id, fields, "malformed payload")
+            return
+
+        try:
+            with metrics.timer("ingestion.process"):
+                rest = await self._handler(payload, redelivered=redelivered)
+            if rest is not None:
+                task = asyncio.current_task()
+                self._waiting.add(task)
+                task.add_done_callback(self._waiting.discard)
+                self._release(task)
+                with metrics.timer("ingestion.wait"):
+                    await rest
+        except Exception:
+            metrics.incr("ingestion.failed")
+            logger.exception("Ingestion failed for entry %s, will retry", entry_id)
+            return
+
+        await r.xack(STREAM, GROUP, entry_id)
+        metrics.incr("ingestion.acked")
+
+    async def _dead_letter(self, entry_id: str, fields: dict, reason: str) -> None:
+        r = get_redis()
+        async with r.pipeline(transaction=True) as pipe:
+            pipe.xadd(DEAD_LETTER_STREAM, {**fields, "entry_id": entry_id, "reason": reason})
+            pipe.xack(STREAM, GROUP, entry_id)
+            await pipe.execute()
+        metrics.incr("ingestion.dead_lettered")
+        logger.error("Moved ingestion entry %s to dead-letter stream: %s", entry_id, reason)
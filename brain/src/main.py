@@ -1,30 +1,74 @@
+import asyncio
 from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 
 from alexa.router import router as alexa_router
+from audio.transcriber import transcriber
+from config import settings
 from database.engine import init_db
-from scheduler.tasks import scheduler
+from database.preferences import preferences_cache
+from ingestion.stream import queue_stats
+from ingestion.worker import IngestionWorker
+from media.retention import adopt_strays
+from media.router import router as media_router
+from messages.router import router as messages_router
+from metrics import metrics
+from notifications.outbox import OutboxWorker, outbox_stats
+from notifications.proactive import ProactiveNotifier, alert_aggregator
+from scheduler.tasks import schedule_quiet_hours_briefing, scheduler
+from webhook.processor import process_incoming_message
 from webhook.router import router as webhook_router
+from whatsapp.client import whatsapp_client
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None]:  # noqa: ARG001
-    """Initialise the database and scheduler on startup; shut down on exit."""
+    """Initialise the database, media index, scheduler and workers on startup; stop them on exit."""
     await init_db()
+    await adopt_strays()
+    prefs_listener = asyncio.create_task(preferences_cache.listen())
+    contacts_refresher = asyncio.create_task(whatsapp_client.contacts.run_refresher())
     scheduler.start()
+    await schedule_quiet_hours_briefing(catch_up=True)
+    worker = IngestionWorker(process_incoming_message)
+    outbox_worker = OutboxWorker(ProactiveNotifier.post_event)
+    outbox_worker.start()
+    alert_aggregator.start()
+    if settings.ingestion_embedded_worker:
+        if settings.whisper_enabled:
+            transcriber.start()
+        worker.start()
     yield
+    await worker.stop()
+    await alert_aggregator.stop()
+    await outbox_worker.stop()
+    transcriber.shutdown()
     scheduler.shutdown()
+    prefs_listener.cancel()
+    contacts_refresher.cancel()
 
 
 app = FastAPI(title="WhatsApp Brain", version="0.1.0", lifespan=lifespan)
 
 app.include_router(alexa_router)
 app.include_router(webhook_router)
+app.include_router(messages_router)
+app.include_router(media_router)
 
 
 @app.get("/health")
 async def health() -> dict:
     """Return a simple liveness check payload."""
     return {"status": "ok"}
+
+
+@app.get("/metrics")
+async def get_metrics() -> dict:
+    """Return in-process metrics plus ingestion and notification queue depth."""
+    return {
+        **metrics.snapshot(),
+        "ingestion": await queue_stats(),
+        "notifications": await outbox_stats(),
+    }
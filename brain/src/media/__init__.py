@@ -0,0 +1 @@
+"""Serving processed audio files to Alexa devices."""
@@ -0,0 +1,161 @@
+"""
+Quota- and age-based retention of processed media.
+
+Driven by the ``media_files`` index rather than by globbing ``media_dir``:
+files idle for longer than ``media_max_age_days`` and the least recently used
+files beyond ``media_quota_bytes`` are deleted in batches, and the messages
+pointing at them lose their audio URL in the same pass. Access times are
+noted in a Redis hash by whichever process serves or reuses a file and folded
+into the index at the start of each run; files the index does not know about
+are adopted once, at startup. All file I/O runs in worker threads.
+"""
+
+import asyncio
+import datetime
+import logging
+import os
+import re
+import time
+from datetime import UTC
+from itertools import batched
+from pathlib import Path
+
+from redis.exceptions import RedisError
+
+from config import settings
+from database.engine import async_session_factory
+from database.redis import get_redis
+from database.repo import MediaRepo, MessageRepo
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Leftovers of interrupted processing (OGG links, partial encodes) older than this are removed
+STALE_TEMP_SECONDS = 3600
+
+_CONTENT_ADDRESSED = re.compile(r"[0-9a-f]{64}")
+
+# Access times noted since the last run (name -> ISO time), flushed to the index in one batch
+ACCESSED_KEY = "media:accessed"
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(UTC).replace(tzinfo=None)
+
+
+async def record_access(name: str) -> None:
+    """Note that a media file was served; persisted by the next retention run."""
+    try:
+        await get_redis().hset(ACCESSED_KEY, name, _now().isoformat())
+    except RedisError:
+        logger.warning("Could not record access to %s", name, exc_info=True)
+
+
+async def register(
+    name: str, size_bytes: int, media_sha256: str | None, message_id: str | None
+) -> None:
+    """Add a newly written media file to the index."""
+    async with async_session_factory() as session:
+        await MediaRepo.register(
+            session,
+            [
+                {
+                    "name": name,
+                    "size_bytes": size_bytes,
+                    "media_sha256": media_sha256,
+                    "message_id": message_id,
+                }
+            ],
+        )
+
+
+async def enforce_retention() -> int:
+    """Flush access times and evict from the index; return the number of files deleted."""
+    media_dir = Path(settings.media_dir)
+    with metrics.timer("media.retention"):
+        async with get_redis().pipeline(transaction=True) as pipe:
+            pipe.hgetall(ACCESSED_KEY)
+            pipe.delete(ACCESSED_KEY)
+            accessed, _ = await pipe.execute()
+        async with async_session_factory() as session:
+            await MediaRepo.touch(
+                session,
+                {name: datetime.datetime.fromisoformat(at) for name, at in accessed.items()},
+            )
+
+        cutoff = _now() - datetime.timedelta(days=settings.media_max_age_days)
+        async with async_session_factory() as session:
+            evictable = await MediaRepo.select_evictable(
+                session, settings.media_quota_bytes, cutoff
+            )
+
+        removed = 0
+        for batch in batched(evictable, max(1, settings.media_retention_batch_size), strict=False):
+            names = [f.name for f in batch]
+            await asyncio.to_thread(_unlink_all, media_dir, names)
+            # Only the canonical MP3 backs audio_public_url; other files just leave the index
+            shas = [f.media_sha256 for f in batch if f.name == f"{f.media_sha256}.mp3"]
+            paths = [str(media_dir / f.name) for f in batch if f.media_sha256 is None]
+            async with async_session_factory() as session:
+                await MessageRepo.clear_audio(session, shas, paths)
+                await MediaRepo.delete(session, names)
+                await session.commit()
+            removed += len(names)
+
+    metrics.incr("media.evicted", removed)
+    return removed
+
+
+async def adopt_strays() -> None:
+    """Index MP3s written outside the pipeline (e.g. before the index existed); drop stale temps."""
+    media_dir = Path(settings.media_dir)
+    entries = await asyncio.to_thread(_scan, media_dir)
+    if not entries:
+        return
+    async with async_session_factory() as session:
+        indexed = await MediaRepo.indexed_names(session)
+
+    stale_before = time.time() - STALE_TEMP_SECONDS
+    adopt, stale = [], []
+    for name, size, mtime in entries:
+        if name in indexed:
+            continue
+        if name.endswith(".mp3"):
+            modified = datetime.datetime.fromtimestamp(mtime, UTC).replace(tzinfo=None)
+            sha = name.split(".", 1)[0]
+            adopt.append(
+                {
+                    "name": name,
+                    "size_bytes": size,
+                    "media_sha256": sha if _CONTENT_ADDRESSED.fullmatch(sha) else None,
+                    "message_id": None,
+                    "created_at": modified,
+                    "last_accessed_at": modified,
+                }
+            )
+        elif mtime < stale_before:
+            stale.append(name)
+
+    if adopt:
+        async with async_session_factory() as session:
+            await MediaRepo.register(session, adopt)
+        logger.info("Indexed %d media files found on disk", len(adopt))
+    if stale:
+        await asyncio.to_thread(_unlink_all, media_dir, stale)
+        logger.info("Removed %d stale temporary media files", len(stale))
+
+
+def _scan(media_dir: Path) -> list[tuple[str, int, float]]:
+    if not media_dir.exists():
+        return []
+    with os.scandir(media_dir) as it:
+        return [
+            (entry.name, stat.st_size, stat.st_mtime)
+            for entry in it
+            if entry.is_file() and (stat := entry.stat())
+        ]
+
+
+def _unlink_all(media_dir: Path, names: list[str]) -> None:
+    for name in names:
+        (media_dir / name).unlink(missing_ok=True)
@@ -0,0 +1,59 @@
+import asyncio
+import os
+import re
+from pathlib import Path
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+
+from audio.profiles import ensure_variant
+from config import settings
+from media.retention import record_access
+from media.signing import verify
+
+router = APIRouter(prefix="/media")
+
+_NAME = re.compile(r"[\w-]+(\.[\w-]+)*\.mp3")
+_CONTENT_ADDRESSED = re.compile(r"[0-9a-f]{64}")
+
+# Media files are never rewritten under the same name
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@router.api_route("/{name}", methods=["GET", "HEAD"])
+async def get_media(
+    name: str, request: Request, exp: int | None = None, sig: str | None = None
+) -> Response:
+    """
+    Serve a processed audio file.
+
+    Range requests (AudioPlayer seeking), If-Range and HEAD are handled by
+    :class:`FileResponse`, which streams from disk in chunks or hands the path
+    to the server (``http.response.pathsend``) when supported. Content-addressed
+    files get their hash as a strong ETag.
+    """
+    if not _NAME.fullmatch(name) or not verify(name, exp, sig):
+        raise HTTPException(status_code=404)
+
+    path = Path(settings.media_dir) / name
+    try:
+        stat = await asyncio.to_thread(os.stat, path)
+    except FileNotFoundError:
+        # Other encoding profiles are derived from the streaming MP3 on first request
+        if await ensure_variant(name) is None:
+            raise HTTPException(status_code=404) from None
+        stat = await asyncio.to_thread(os.stat, path)
+
+    headers = {"cache-control": CACHE_CONTROL}
+    stem = name.removesuffix(".mp3")
+    if _CONTENT_ADDRESSED.match(stem):
+        headers["etag"] = f'"{stem}"'
+
+    if request.method == "GET":
+        await record_access(name)
+
+    response = FileResponse(path, media_type="audio/mpeg", headers=headers, stat_result=stat)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and response.headers["etag"] in {t.strip() for t in if_none_match.split(",")}:
+        return Response(status_code=304, headers={**headers, "etag": response.headers["etag"]})
+    return response
@@ -0,0 +1 @@
+"""HTTP API for message read state."""
@@ -0,0 +1,35 @@
+import datetime
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+
+from database.engine import async_session_factory
+from database.repo import MessageRepo
+from whatsapp.webhook import verify_webhook_hmac
+
+router = APIRouter(prefix="/messages")
+
+
+class MarkReadRequest(BaseModel):
+    """Selects which unread messages to mark as read."""
+
+    chat_jids: list[str] = []
+    before: datetime.datetime | None = None  # alone: every chat; with chat_jids: upper bound
+
+
+@router.post("/read", dependencies=[Depends(verify_webhook_hmac)])
+async def mark_read(body: MarkReadRequest) -> dict:
+    """
+    Mark messages as read in bulk.
+
+    Signed with the same HMAC secret as the WhatsApp webhook.
+    """
+    async with async_session_factory() as session:
+        if body.chat_jids:
+            ids = await MessageRepo.mark_read_chats(session, body.chat_jids, body.before)
+        elif body.before is not None:
+            ids = await MessageRepo.mark_read_before(session, body.before)
+        else:
+            raise HTTPException(status_code=400, detail="Provide chat_jids and/or before")
+
+    return {"marked": len(ids), "ids": ids}
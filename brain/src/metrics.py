@@ -0,0 +1,72 @@
+"""Lightweight in-process counters, gauges, and timings exposed on ``GET /metrics``."""
+
+import time
+from collections import defaultdict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+
+@dataclass
+class Timing:
+    """Running aggregate of observed durations for a single metric."""
+
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    def observe(self, seconds: float) -> None:
+        """Record one duration, in seconds."""
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def as_dict(self) -> dict:
+        """Return the aggregate in milliseconds, suitable for JSON output."""
+        avg = self.total / self.count if self.count else 0.0
+        return {
+            "count": self.count,
+            "avg_ms": round(avg * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+class Metrics:
+    """Process-local metrics registry. Not shared between worker processes."""
+
+    def __init__(self) -> None:
+        self._counters: dict[str, int] = defaultdict(int)
+        self._gauges: dict[str, float] = {}
+        self._timings: dict[str, Timing] = defaultdict(Timing)
+
+    def incr(self, name: str, value: int = 1) -> None:
+        """Increment a counter."""
+        self._counters[name] += value
+
+    def gauge(self, name: str, value: float) -> None:
+        """Set a gauge to its current value."""
+        self._gauges[name] = value
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Record a duration for a timing metric."""
+        self._timings[name].observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """Time the enclosed block and record it under ``name``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self) -> dict:
+        """Return a JSON-serialisable copy of every metric."""
+        return {
+            "counters": dict(self._counters),
+            "gauges": dict(self._gauges),
+            "timings": {name: t.as_dict() for name, t in self._timings.items()},
+        }
+
+
+metrics = Metrics()
@@ -0,0 +1,228 @@
+"""
+Merge proactive alerts into fewer Alexa events.
+
+Alerts for the same sender and urgency class arriving within ``window``
+seconds become one ``MessageAlert`` event carrying the real count and the
+highest urgency seen. Events are also held to a per-user rate limit (a fixed
+window counted in Redis); alerts held back by it keep merging until a slot
+frees up.
+
+Pending groups live in Redis, not in process memory: ``submit`` returns only
+once the alert is stored (so the ingestion ack never loses it), groups merge
+across worker processes, and whichever process runs the flusher
+(:meth:`AlertAggregator.start`) sends them once they are due. A group is
+leased while it is being sent, so a crash mid-send delays it instead of
+dropping it.
+"""
+
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable, Sequence
+from dataclasses import dataclass
+
+from redis.commands.core import AsyncScript
+from redis.exceptions import RedisError
+
+from database.redis import get_redis
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+URGENCY_ORDER = ("LOW", "NORMAL", "MEDIUM", "HIGH", "CRITICAL", "URGENT")
+
+DUE_KEY = "notify:due"  # sorted set of group ids scored by when they may be sent
+PREFIX = "notify:pending:"  # <id> hash (user_id, sender, urgency, rank) and <id>:ids list
+POLL_SECONDS = 0.5
+BATCH = 100  # due groups handled per poll
+LEASE_SECONDS = 30  # how long a group being sent stays claimed
+
+# Create the group, or merge into it keeping the highest urgency
+_SUBMIT = """
+local rank = tonumber(redis.call('HGET', KEYS[1], 'rank'))
+if not rank then
+  redis.call('HSET', KEYS[1], 'user_id', ARGV[2], 'sender', ARGV[3],
+             'urgency', ARGV[4], 'rank', ARGV[5])
+  redis.call('ZADD', KEYS[3], ARGV[6], ARGV[1])
+elseif tonumber(ARGV[5]) > rank then
+  redis.call('HSET', KEYS[1], 'urgency', ARGV[4], 'rank', ARGV[5])
+end
+if #ARGV > 6 then redis.call('RPUSH', KEYS[2], unpack(ARGV, 7)) end
+return rank and 1 or 0
+"""
+
+# Push a due group's score past the lease, unless another flusher already did
+_CLAIM = """
+local due = tonumber(redis.call('ZSCORE', KEYS[1], ARGV[1]))
+if not due or due > tonumber(ARGV[2]) then return 0 end
+redis.call('ZADD', KEYS[1], ARGV[3], ARGV[1])
+return 1
+"""
+
+# Drop the ids just sent; ids merged in meanwhile stay and start a new window
+_DONE = """
+redis.call('LTRIM', KEYS[2], ARGV[2], -1)
+if redis.call('LLEN', KEYS[2]) > 0 then
+  redis.call('ZADD', KEYS[3], ARGV[3], ARGV[1])
+else
+  redis.call('DEL', KEYS[1])
+  redis.call('ZREM', KEYS[3], ARGV[1])
+end
+"""
+
+_scripts: dict[str, AsyncScript] = {}
+
+
+def _script(source: str) -> AsyncScript:
+    script = _scripts.get(source)
+    if script is None:
+        script = _scripts[source] = get_redis().register_script(source)
+    return script
+
+
+@dataclass
+class PendingAlert:
+    """Alerts merged so far for one user, sender and urgency class."""
+
+    user_id: str
+    sender: str
+    urgency: str
+    message_ids: list[str]
+
+    @property
+    def count(self) -> int:
+        """Number of messages the alert stands for."""
+        return len(self.message_ids)
+
+
+class AlertAggregator:
+    """Redis-backed merge windows in front of a proactive event sender."""
+
+    def __init__(
+        self,
+        send: Callable[[PendingAlert], Awaitable[None]],
+        *,
+        group: Callable[[str], str],
+        window: float,
+        rate_limit: int,
+        rate_window: int,
+    ) -> None:
+        self._send = send
+        self._group = group
+        self._window = window
+        self._rate_limit = rate_limit
+        self._rate_window = rate_window
+        self._runner: asyncio.Task | None = None
+
+    async def submit(
+        self, sender: str, urgency: str, user_id: str, message_ids: Sequence[str]
+    ) -> None:
+        """Store one alert; it is sent once its window closes and the rate limit allows."""
+        gid = f"{user_id}|{self._group(urgency)}|{sender}"
+        merged = await _script(_SUBMIT)(
+            keys=[PREFIX + gid, f"{PREFIX}{gid}:ids", DUE_KEY],
+            args=[
+                gid,
+                user_id,
+                sender,
+                urgency,
+                _rank(urgency),
+                time.time() + self._window,
+                *message_ids,
+            ],
+        )
+        if merged:
+            metrics.incr("notify.merged")
+
+    def start(self) -> None:
+        """Start sending due groups as a background task on the running event loop."""
+        self._runner = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stop the flusher; groups not sent yet stay in Redis for the next one."""
+        if self._runner is not None:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+
+    async def run(self) -> None:
+        """Send due groups until cancelled."""
+        while True:
+            try:
+                await self.flush_due()
+            except RedisError:
+                logger.exception("Pending alert flush failed, backing off")
+            await asyncio.sleep(POLL_SECONDS)
+
+    async def flush_due(self) -> int:
+        """Send every group whose window has closed; return how many were sent."""
+        now = time.time()
+        due = await get_redis().zrangebyscore(DUE_KEY, "-inf", now, start=0, num=BATCH)
+        sent = 0
+        for gid in due:
+            sent += await self._flush(gid, now)
+        return sent
+
+    async def _flush(self, gid: str, now: float) -> bool:
+        r = get_redis()
+        alert_key, ids_key = PREFIX + gid, f"{PREFIX}{gid}:ids"
+        if not await _script(_CLAIM)(keys=[DUE_KEY], args=[gid, now, now + LEASE_SECONDS]):
+            return False  # taken by another flusher
+
+        async with r.pipeline(transaction=True) as pipe:
+            pipe.hgetall(alert_key)
+            pipe.lrange(ids_key, 0, -1)
+            fields, message_ids = await pipe.execute()
+        if not fields:
+            await r.zrem(DUE_KEY, gid)
+            return False
+
+        delay = await self._acquire(fields["user_id"])
+        if delay > 0:
+            metrics.incr("notify.rate_limited")
+            await r.zadd(DUE_KEY, {gid: now + delay})
+            return False
+
+        alert = PendingAlert(
+            user_id=fields["user_id"],
+            sender=fields["sender"],
+            urgency=fields["urgency"],
+            message_ids=message_ids,
+        )
+        try:
+            await self._send(alert)
+        except Exception:
+            # Left claimed: sent again once the lease runs out
+            logger.exception("Proactive alert for %s failed", alert.sender)
+            return False
+        metrics.incr("notify.events")
+        metrics.incr("notify.alerts", alert.count)
+
+        await _script(_DONE)(
+            keys=[alert_key, ids_key, DUE_KEY],
+            args=[gid, len(message_ids), time.time() + self._window],
+        )
+        return True
+
+    async def _acquire(self, user_id: str) -> float:
+        """Take one event slot for ``user_id``; return the seconds to wait when none is left."""
+        if self._rate_limit <= 0:
+            return 0.0
+        now = time.time()
+        slot = int(now // self._rate_window)
+        key = f"notify:rate:{user_id}:{slot}"
+        try:
+            async with get_redis().pipeline(transaction=True) as pipe:
+                pipe.incr(key)
+                pipe.expire(key, self._rate_window)
+                used, _ = await pipe.execute()
+        except RedisError:
+            # Better an extra chime than a lost alert
+            logger.warning("Could not check the notification rate limit", exc_info=True)
+            return 0.0
+        if used <= self._rate_limit:
+            return 0.0
+        return (slot + 1) * self._rate_window - now
+
+
+def _rank(urgency: str) -> int:
+    return URGENCY_ORDER.index(urgency) if urgency in URGENCY_ORDER else 0
@@ -0,0 +1,250 @@
+"""
+Durable outbox for proactive Alexa events.
+
+Events are appended to a Redis stream and delivered by :class:`OutboxWorker`
+through a consumer group, so an Amazon outage or a restart delays alerts
+instead of losing them, and the ingestion pipeline never waits on the
+Proactive Events API. A failed delivery is re-queued with exponential backoff
+(``not_before``) until it succeeds, its ``expiryTime`` passes or it runs out
+of attempts.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import time
+from collections.abc import Awaitable, Callable
+from datetime import datetime
+
+import httpx
+from redis.exceptions import RedisError, ResponseError
+
+from config import settings
+from database.redis import get_redis
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+STREAM = "notify:outbox"
+DEAD_LETTER_STREAM = "notify:dead"
+GROUP = "brain"
+
+MAXLEN = 10_000
+BLOCK_MS = 5_000
+MAX_HELD = 100  # entries read and waiting (mostly on their backoff) per consumer
+CLAIM_INTERVAL = 30.0
+RETRYABLE = {401, 403, 408, 429}
+
+Deliver = Callable[[dict], Awaitable[httpx.Response]]
+
+
+async def enqueue(event: dict) -> str:
+    """Append a proactive event to the outbox and return its entry id."""
+    entry_id = await get_redis().xadd(
+        STREAM,
+        {"event": json.dumps(event, ensure_ascii=False), "attempt": 0, "not_before": 0},
+        maxlen=MAXLEN,
+        approximate=True,
+    )
+    metrics.incr("notify.enqueued")
+    return entry_id
+
+
+async def ensure_group() -> None:
+    """Create the consumer group (and the stream) if they do not exist yet."""
+    try:
+        await get_redis().xgroup_create(STREAM, GROUP, id="0", mkstream=True)
+    except ResponseError as err:
+        if "BUSYGROUP" not in str(err):
+            raise
+
+
+async def outbox_stats() -> dict:
+    """Return depth figures for the outbox and its dead-letter stream."""
+    r = get_redis()
+    async with r.pipeline(transaction=False) as pipe:
+        pipe.xlen(STREAM)
+        pipe.xlen(DEAD_LETTER_STREAM)
+        length, dead = await pipe.execute()
+
+    pending = lag = 0
+    try:
+        groups = await r.xinfo_groups(STREAM)
+    except ResponseError:
+        groups = []  # stream not created yet
+    for group in groups:
+        if group["name"] == GROUP:
+            pending = group["pending"]
+            lag = group.get("lag") or 0
+
+    return {"length": length, "pending": pending, "lag": lag, "dead_letter": dead}
+
+
+class OutboxWorker:
+    """
+    Delivers outbox entries, acking only settled ones.
+
+    Entries waiting for their ``not_before`` are held in memory (up to
+    ``MAX_HELD``) so they do not block the ones behind them; at most
+    ``notify_outbox_concurrency`` requests are in flight at once.
+    """
+
+    def __init__(self, deliver: Deliver, *, consumer: str | None = None) -> None:
+        self._deliver = deliver
+        self._sending = asyncio.Semaphore(settings.notify_outbox_concurrency)
+        self._consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self._tasks: set[asyncio.Task] = set()
+        self._stopping = asyncio.Event()
+        self._runner: asyncio.Task | None = None
+
+    def start(self) -> None:
+        """Start the read loop as a background task on the running event loop."""
+        self._runner = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stop reading; unsettled entries stay pending and are reclaimed later."""
+        self._stopping.set()
+        if self._runner is None:
+            return
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(self._runner, return_exceptions=True)
+
+    async def run(self) -> None:
+        """Consume the outbox until ``stop`` is called."""
+        await ensure_group()
+        r = get_redis()
+        last_claim = 0.0
+
+        try:
+            while not self._stopping.is_set():
+                if len(self._tasks) >= MAX_HELD:
+                    await asyncio.wait(self._tasks, return_when=asyncio.FIRST_COMPLETED)
+                    continue
+
+                free = MAX_HELD - len(self._tasks)
+                try:
+                    if time.monotonic() - last_claim >= CLAIM_INTERVAL:
+                        last_claim = time.monotonic()
+                        await self._reclaim(free)
+                        continue
+
+                    response = await r.xreadgroup(
+                        GROUP, self._consumer, {STREAM: ">"}, count=free, block=BLOCK_MS
+                    )
+                except RedisError:
+                    logger.exception("Outbox read failed, backing off")
+                    await asyncio.sleep(1)
+                    continue
+
+                for _stream, entries in response or []:
+                    for entry_id, fields in entries:
+                        self._spawn(entry_id, fields)
+        finally:
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _spawn(self, entry_id: str, fields: dict) -> None:
+        task = asyncio.create_task(self._handle(entry_id, fields))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _reclaim(self, count: int) -> None:
+        """Claim entries left pending by a consumer that stopped or crashed."""
+        r = get_redis()
+        _next_id, claimed, *_ = await r.xautoclaim(
+            STREAM,
+            GROUP,
+            self._consumer,
+            # Longer than any backoff, so a consumer still waiting on an entry keeps it
+            min_idle_time=int((settings.notify_retry_max_seconds + 60) * 1000),
+            count=count,
+        )
+        for entry_id, fields in claimed:
+            if not fields:
+                await r.xack(STREAM, GROUP, entry_id)
+                continue
+            self._spawn(entry_id, fields)
+
+    async def _handle(self, entry_id: str, fields: dict) -> None:
+        try:
+            event = json.loads(fields["event"])
+            attempt = int(fields.get("attempt", 0))
+            not_before = float(fields.get("not_before", 0))
+            created = datetime.fromisoformat(event["timestamp"]).timestamp()
+            expires = datetime.fromisoformat(event["expiryTime"]).timestamp()
+            reference = event["referenceId"]
+        except KeyError, ValueError, TypeError:
+            logger.exception("Malformed outbox entry %s", entry_id)
+            await self._dead_letter(entry_id, fields, "malformed entry")
+            return
+
+        delay = not_before - time.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if expires <= time.time():
+            await get_redis().xack(STREAM, GROUP, entry_id)
+            metrics.incr("notify.expired")
+            logger.warning("Proactive event %s expired before delivery", reference)
+            return
+
+        retry_after = None
+        try:
+            async with self._sending:
+                with metrics.timer("notify.post"):
+                    resp = await self._deliver(event)
+        except httpx.HTTPError as err:
+            reason = f"{type(err).__name__}: {err}"
+        else:
+            if resp.is_success:
+                await get_redis().xack(STREAM, GROUP, entry_id)
+                metrics.observe("notify.delivery_latency", max(time.time() - created, 0))
+                metrics.incr("notify.delivered")
+                return
+            reason = f"HTTP {resp.status_code}: {resp.text[:200]}"
+            if resp.status_code not in RETRYABLE and resp.status_code < 500:
+                await self._dead_letter(entry_id, fields, reason)
+                return
+            retry_after = _retry_after(resp)
+
+        if attempt + 1 >= settings.notify_max_attempts:
+            await self._dead_letter(entry_id, fields, f"gave up after {attempt + 1} attempts")
+            return
+        await self._retry(entry_id, fields, attempt, retry_after)
+        logger.warning("Proactive event %s failed (%s), retrying", reference, reason)
+
+    async def _retry(
+        self, entry_id: str, fields: dict, attempt: int, retry_after: float | None
+    ) -> None:
+        """Re-queue an entry to be sent again after an exponential, jittered delay."""
+        backoff = min(
+            settings.notify_retry_base_seconds * 2**attempt, settings.notify_retry_max_seconds
+        )
+        delay = max(backoff * random.uniform(0.5, 1.0), retry_after or 0)
+        async with get_redis().pipeline(transaction=True) as pipe:
+            pipe.xadd(
+                STREAM,
+                {**fields, "attempt": attempt + 1, "not_before": time.time() + delay},
+            )
+            pipe.xack(STREAM, GROUP, entry_id)
+            await pipe.execute()
+        metrics.incr("notify.retried")
+
+    async def _dead_letter(self, entry_id: str, fields: dict, reason: str) -> None:
+        async with get_redis().pipeline(transaction=True) as pipe:
+            pipe.xadd(DEAD_LETTER_STREAM, {**fields, "entry_id": entry_id, "reason": reason})
+            pipe.xack(STREAM, GROUP, entry_id)
+            await pipe.execute()
+        metrics.incr("notify.dead_lettered")
+        logger.error("Moved outbox entry %s to dead-letter stream: %s", entry_id, reason)
+
+
+def _retry_after(resp: httpx.Response) -> float | None:
+    try:
+        return float(resp.headers["Retry-After"])
+    except KeyError, ValueError:
+        return None
@@ -1,14 +1,20 @@
+import hashlib
 import logging
+from collections.abc import Sequence
 from datetime import UTC, datetime, timedelta
 
 import httpx
 
 from config import settings
-from database.engine import async_session_factory
-from database.repo import PreferencesRepo
+from notifications import outbox
+from notifications.aggregator import AlertAggregator, PendingAlert
+from notifications.token import TokenHolder
 
 logger = logging.getLogger(__name__)
 
+# One pooled HTTP/2 client: events reuse the TLS connection to Amazon
+_http = httpx.AsyncClient(http2=True, timeout=10.0)
+
 
 def _to_amazon_urgency(urgency: str) -> str:
     """Normalise internal urgency values to the two values Amazon's API accepts."""
@@ -17,6 +23,12 @@ def _to_amazon_urgency(urgency: str) -> str:
     return "NORMAL"
 
 
+def _reference_id(message_ids: Sequence[str]) -> str:
+    """Derive the event's referenceId from its messages, so a re-sent alert keeps it."""
+    digest = hashlib.sha256("\n".join(sorted(message_ids)).encode()).hexdigest()
+    return f"msg-{digest[:32]}"
+
+
 class ProactiveNotifier:
     """Sends proactive Alexa notifications using the Alexa Proactive Events API."""
 
@@ -24,49 +36,78 @@ class ProactiveNotifier:
     TOKEN_URL = "https://api.amazon.com/auth/o2/token"
 
     @classmethod
-    async def notify_text(cls, sender: str, content: str, urgency: str) -> None:  # noqa: ARG003
-        """Deliver a proactive message-alert event to the user's Alexa device."""
-        token = await cls._get_token()
-        if not token:
-            logger.warning("No Alexa token available, skipping notification")
+    async def notify_text(
+        cls,
+        sender: str,
+        content: str,  # noqa: ARG003
+        urgency: str,
+        message_ids: Sequence[str],
+    ) -> None:
+        """
+        Queue a proactive message alert for the user's Alexa device.
+
+        Alerts from the same sender are merged into one event (see
+        :class:`AlertAggregator`), so a burst chimes once with its real count.
+        ``message_ids`` are the messages the alert stands for.
+        """
+        if not settings.alexa_client_id or not settings.alexa_client_secret:
+            logger.warning("Alexa credentials not configured, skipping notification")
             return
+        await alert_aggregator.submit(sender, urgency, settings.alexa_user_id, message_ids)
 
+    @classmethod
+    async def send_alert(cls, alert: PendingAlert) -> None:
+        """Write one message-alert event for a group of merged alerts to the outbox."""
         now = datetime.now(UTC)
-        payload = {
+        event = {
             "timestamp": now.isoformat(),
-            "referenceId": f"msg-{now.timestamp()}",
+            "referenceId": _reference_id(alert.message_ids),
             "expiryTime": (now + timedelta(hours=1)).isoformat(),
             "event": {
                 "name": "AMAZON.MessageAlert.Activated",
                 "payload": {
                     "state": {"status": "UNREAD", "freshness": "NEW"},
                     "messageGroup": {
-                        "creator": {"name": sender},
-                        "count": 1,
-                        "urgency": _to_amazon_urgency(urgency),
+                        "creator": {"name": alert.sender},
+                        "count": alert.count,
+                        "urgency": _to_amazon_urgency(alert.urgency),
                     },
                 },
             },
             "relevantAudience": {
                 "type": "Unicast",
-                "payload": {"user": {"userId": settings.alexa_user_id}},
+                "payload": {"user": {"userId": alert.user_id}},
             },
         }
+        await outbox.enqueue(event)
 
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(
-                cls.EVENTS_URL,
-                json=payload,
-                headers={"Authorization": f"Bearer {token}"},
-            )
-            if resp.status_code not in (200, 202):
-                logger.error("Proactive event failed: %s %s", resp.status_code, resp.text)
+    @classmethod
+    async def post_event(cls, event: dict) -> httpx.Response:
+        """POST one event to the Proactive Events API (called by the outbox worker)."""
+        token = await alexa_token.get()
+        resp = await _http.post(
+            cls.EVENTS_URL,
+            json=event,
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        if resp.status_code == 401:
+            # Revoked before its expiry; the retry fetches a new one
+            await alexa_token.invalidate(token)
+        return resp
 
     @classmethod
-    async def notify_audio(cls, sender: str, audio_url: str, transcription: str | None) -> None:  # noqa: ARG003
+    async def notify_audio(
+        cls,
+        sender: str,
+        audio_url: str,  # noqa: ARG003
+        transcription: str | None,
+        message_ids: Sequence[str],
+    ) -> None:
         """Notify Alexa about a new audio message, using the transcription as content."""
         content = transcription or f"Áudio de {sender}"
-        await cls.notify_text(sender=sender, content=content, urgency="NORMAL")
+        await cls.notify_text(
+            sender=sender, content=content, urgency="NORMAL", message_ids=message_ids
+        )
 
     @classmethod
     async def notify_silent(cls) -> None:
@@ -74,35 +115,31 @@ class ProactiveNotifier:
         logger.debug("Silent notification (LED only) — not yet implemented")
 
     @classmethod
-    async def _get_token(cls) -> str | None:
-        if not settings.alexa_client_id or not settings.alexa_client_secret:
-            return None
-
-        async with async_session_factory() as session:
-            prefs = await PreferencesRepo.get(session)
-
-            now = datetime.now(UTC)
-            if (
-                prefs.alexa_proactive_token
-                and prefs.alexa_proactive_token_expires
-                and prefs.alexa_proactive_token_expires.replace(tzinfo=UTC) > now
-            ):
-                return prefs.alexa_proactive_token
-
-            async with httpx.AsyncClient() as client:
-                resp = await client.post(
-                    cls.TOKEN_URL,
-                    data={
-                        "grant_type": "client_credentials",
-                        "client_id": settings.alexa_client_id,
-                        "client_secret": settings.alexa_client_secret,
-                        "scope": "alexa::proactive_events",
-                    },
-                )
-                resp.raise_for_status()
-
-            token_data = resp.json()
-            expires = now + timedelta(seconds=token_data["expires_in"] - 60)
-
-            await PreferencesRepo.update_token(session, token_data["access_token"], expires)
-            return token_data["access_token"]
+    async def _fetch_token(cls) -> tuple[str, float]:
+        resp = await _http.post(
+            cls.TOKEN_URL,
+            data={
+                "grant_type": "client_credentials",
+                "client_id": settings.alexa_client_id,
+                "client_secret": settings.alexa_client_secret,
+                "scope": "alexa::proactive_events",
+            },
+        )
+        resp.raise_for_status()
+        token_data = resp.json()
+        return token_data["access_token"], token_data["expires_in"]
+
+
+alert_aggregator = AlertAggregator(
+    ProactiveNotifier.send_alert,
+    group=_to_amazon_urgency,
+    window=settings.notify_merge_seconds,
+    rate_limit=settings.notify_rate_limit,
+    rate_window=settings.notify_rate_window_seconds,
+)
+
+alexa_token = TokenHolder(
+    ProactiveNotifier._fetch_token,
+    key="alexa:proactive_token",
+    refresh_margin=settings.alexa_token_refresh_seconds,
+)
@@ -0,0 +1,104 @@
+"""
+Alerts held back during quiet hours, released as one briefing when they end.
+
+Alerts for non-VIP bursts that arrive during quiet hours are appended to a
+Redis list (capped at ``quiet_deferred_max`` messages) instead of being sent.
+When quiet hours end, :func:`release_briefing` summarises everything in a
+single LLM call and sends one proactive event covering all of it; the
+messages are removed from the list only once that event has been queued.
+"""
+
+import json
+import logging
+from dataclasses import asdict, dataclass
+
+from agents.base import WhatsAppDeps
+from agents.summarizer import summarizer_agent
+from config import settings
+from database.preferences import preferences_cache
+from database.redis import get_redis
+from metrics import metrics
+from notifications.proactive import ProactiveNotifier
+from whatsapp.client import whatsapp_client
+
+logger = logging.getLogger(__name__)
+
+KEY = "quiet:deferred"
+CONTENT_LIMIT = 300  # characters of each message kept for the briefing
+
+
+@dataclass(frozen=True)
+class DeferredMessage:
+    """A message whose alert was held back during quiet hours."""
+
+    id: str
+    chat_jid: str
+    sender: str
+    content: str
+
+
+async def defer(messages: list[DeferredMessage]) -> None:
+    """Hold back the alerts for ``messages`` until quiet hours end."""
+    if not messages:
+        return
+    async with get_redis().pipeline(transaction=True) as pipe:
+        pipe.rpush(KEY, *(json.dumps(asdict(m), ensure_ascii=False) for m in messages))
+        pipe.ltrim(KEY, -settings.quiet_deferred_max, -1)
+        await pipe.execute()
+    metrics.incr("quiet_hours.deferred", len(messages))
+
+
+async def release_briefing() -> int:
+    """Send one briefing for every held-back message, if quiet hours are over."""
+    prefs = await preferences_cache.get()
+    if prefs.is_quiet_hours_now():
+        return 0
+
+    r = get_redis()
+    raw = await r.lrange(KEY, 0, -1)
+    messages = [DeferredMessage(**json.loads(item)) for item in raw]
+    if not messages:
+        return 0
+
+    deps = WhatsAppDeps(
+        chat_jid="",
+        recent_messages=[],
+        preferences=prefs,
+        whatsapp_client=whatsapp_client,
+    )
+    try:
+        result = await summarizer_agent.run(_briefing_prompt(messages), deps=deps)
+        summary = result.output.summary
+    except Exception:
+        logger.exception("Quiet-hours briefing summarizer failed")
+        summary = f"{len(messages)} mensagens recebidas durante o horário de silêncio."
+
+    await ProactiveNotifier.notify_text(
+        sender="Resumo do horário de silêncio",
+        content=summary,
+        urgency="MEDIUM",
+        message_ids=[m.id for m in messages],
+    )
+    # Anything deferred since the read stays for the next briefing
+    await r.ltrim(KEY, len(raw), -1)
+    metrics.incr("quiet_hours.released", len(messages))
+    return len(messages)
+
+
+def _briefing_prompt(messages: list[DeferredMessage]) -> str:
+    chats: dict[str, list[DeferredMessage]] = {}
+    for m in messages:
+        chats.setdefault(m.chat_jid, []).append(m)
+
+    sections = []
+    for chat_jid, msgs in chats.items():
+        title = (
+            f"Grupo {chat_jid}" if chat_jid.endswith("@g.us") else f"Conversa com {msgs[0].sender}"
+        )
+        lines = "\n".join(f"- {m.sender}: {m.content[:CONTENT_LIMIT]}" for m in msgs)
+        sections.append(f"{title}:\n{lines}")
+    return (
+        f"Mensagens recebidas durante o horário de silêncio ({len(messages)} no total). "
+        "Faça um único resumo para o usuário, por conversa, destacando o que exige ação:\n\n"
+        + "\n\n".join(sections)
+    )
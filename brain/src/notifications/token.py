@@ -0,0 +1,178 @@
+"""
+Process-level holder for the Alexa proactive-events access token.
+
+The token is kept in memory and in a Redis hash shared by every worker
+process, so one rotation serves them all; the database only seeds a cold
+start (empty Redis). A refresh starts ``refresh_margin`` seconds before
+expiry while callers keep using the current token. Refreshes are
+single-flight within a process and guarded by a short Redis lock across
+processes, so an expired token costs one request to Amazon.
+"""
+
+import asyncio
+import datetime
+import logging
+import secrets
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from datetime import UTC
+
+from redis.exceptions import RedisError
+
+from database.engine import async_session_factory
+from database.redis import get_redis
+from database.repo import PreferencesRepo
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+LOCK_SECONDS = 10
+LOCK_WAIT = 5.0  # how long to wait for another process's refresh before fetching anyway
+
+# Delete the lock only while we still own it (it may have expired and been retaken)
+_RELEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) end
+return 0
+"""
+
+# Returns the new token and its lifetime in seconds
+type Fetch = Callable[[], Awaitable[tuple[str, float]]]
+
+
+@dataclass(frozen=True)
+class AccessToken:
+    """An access token and its expiry (epoch seconds)."""
+
+    value: str
+    expires: float
+
+    def fresh(self, margin: float = 0.0) -> bool:
+        """Return whether the token is still valid ``margin`` seconds from now."""
+        return self.expires - margin > time.time()
+
+
+class TokenHolder:
+    """Cached access token with proactive, single-flight refresh."""
+
+    def __init__(self, fetch: Fetch, *, key: str, refresh_margin: float) -> None:
+        self._fetch = fetch
+        self._key = key
+        self._margin = refresh_margin
+        self._token: AccessToken | None = None
+        self._refresh: asyncio.Task[AccessToken] | None = None
+
+    async def get(self) -> str:
+        """Return a valid token, refreshing it first only when it has already expired."""
+        token = self._token
+        if token is not None and token.fresh(self._margin):
+            return token.value
+        task = self._start_refresh()
+        if token is not None and token.fresh():
+            return token.value  # still valid; the refresh runs in the background
+        return (await asyncio.shield(task)).value
+
+    async def invalidate(self, value: str) -> None:
+        """Forget ``value`` after Amazon rejected it, unless it was already replaced."""
+        if self._token is not None and self._token.value == value:
+            self._token = None
+        try:
+            r = get_redis()
+            if await r.hget(self._key, "value") == value:
+                await r.delete(self._key)
+        except RedisError:
+            logger.warning("Could not drop the shared Alexa token", exc_info=True)
+        # Otherwise the next cold start would seed Redis with it again
+        async with async_session_factory() as session:
+            await PreferencesRepo.revoke_token(session, value)
+
+    def _start_refresh(self) -> asyncio.Task[AccessToken]:
+        if self._refresh is None:
+            self._refresh = asyncio.create_task(self._load())
+            self._refresh.add_done_callback(self._refreshed)
+        return self._refresh
+
+    def _refreshed(self, task: asyncio.Task[AccessToken]) -> None:
+        self._refresh = None
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            logger.error("Alexa token refresh failed", exc_info=task.exception())
+            return
+        self._token = task.result()
+
+    async def _load(self) -> AccessToken:
+        token = await self._shared()
+        if token is not None and token.fresh(self._margin):
+            metrics.incr("alexa_token.shared")
+            return token
+
+        r = get_redis()
+        lock = f"{self._key}:lock"
+        owner = secrets.token_hex(8)
+        try:
+            locked = await r.set(lock, owner, nx=True, ex=LOCK_SECONDS)
+        except RedisError:
+            logger.warning("Could not take the Alexa token lock", exc_info=True)
+            return await self._rotate()
+        if locked:
+            try:
+                return await self._rotate()
+            finally:
+                try:
+                    await r.register_script(_RELEASE)(keys=[lock], args=[owner])
+                except RedisError:
+                    logger.warning("Could not release the Alexa token lock", exc_info=True)
+
+        # Another process is refreshing; pick up its token once it is shared
+        deadline = time.monotonic() + LOCK_WAIT
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.2)
+            token = await self._shared()
+            if token is not None and token.fresh(self._margin):
+                metrics.incr("alexa_token.shared")
+                return token
+        return await self._rotate()
+
+    async def _shared(self) -> AccessToken | None:
+        """Return the token in Redis, seeding Redis from the database when it is empty."""
+        try:
+            stored = await get_redis().hgetall(self._key)
+        except RedisError:
+            logger.warning("Could not read the shared Alexa token", exc_info=True)
+            return await self._stored()
+        if stored:
+            return AccessToken(stored["value"], float(stored["expires"]))
+
+        token = await self._stored()
+        if token is not None and token.fresh():
+            await self._share(token)
+        return token
+
+    async def _stored(self) -> AccessToken | None:
+        async with async_session_factory() as session:
+            prefs = await PreferencesRepo.get(session)
+        if not prefs.alexa_proactive_token or not prefs.alexa_proactive_token_expires:
+            return None
+        expires = prefs.alexa_proactive_token_expires.replace(tzinfo=UTC).timestamp()
+        return AccessToken(prefs.alexa_proactive_token, expires)
+
+    async def _rotate(self) -> AccessToken:
+        """Fetch a new token from Amazon and store it in Redis and the database."""
+        value, lifetime = await self._fetch()
+        token = AccessToken(value, time.time() + lifetime)
+        metrics.incr("alexa_token.fetched")
+        await self._share(token)
+        expires = datetime.datetime.fromtimestamp(token.expires, UTC).replace(tzinfo=None)
+        async with async_session_factory() as session:
+            await PreferencesRepo.update_token(session, token.value, expires)
+        return token
+
+    async def _share(self, token: AccessToken) -> None:
+        try:
+            async with get_redis().pipeline(transaction=True) as pipe:
+                pipe.hset(self._key, mapping={"value": token.value, "expires": token.expires})
+                pipe.expireat(self._key, int(token.expires))
+                await pipe.execute()
+        except RedisError:
+            logger.warning("Could not share the Alexa token", exc_info=True)
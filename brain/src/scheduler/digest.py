@@ -0,0 +1,169 @@
+"""
+Map-reduce engine behind the morning digest.
+
+Messages are grouped by chat. Chats with at most ``digest_small_chat_messages``
+messages are packed ``digest_pack_size`` at a time into shared prompts; the
+others get a prompt each. The map step runs those prompts with at most
+``digest_concurrency`` LLM calls in flight and stops waiting after
+``digest_timeout_seconds`` (unfinished parts fall back to a plain count).
+Packed prompts answer with one summary per chat, so the reduce step orders
+chats, not prompts, by urgency, highest first, and joins them.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+
+from agents.base import WhatsAppDeps
+from agents.summarizer import batch_summarizer_agent, summarizer_agent
+from config import settings
+from database.models import ProcessedMessage, UrgencyLevel
+from database.preferences import PreferencesSnapshot
+from metrics import metrics
+from whatsapp.client import whatsapp_client
+
+logger = logging.getLogger(__name__)
+
+CONTENT_LIMIT = 300  # characters of each message sent to the summarizer
+
+_URGENCY_RANK = {level: rank for rank, level in enumerate(UrgencyLevel)}
+
+
+@dataclass
+class ChatMessages:
+    """Messages of one chat within the digest window."""
+
+    chat_jid: str
+    messages: list[ProcessedMessage]
+
+    @property
+    def title(self) -> str:
+        """Spoken name of the chat."""
+        first = self.messages[0]
+        if not first.is_group:
+            return first.sender_name
+        senders = list(dict.fromkeys(m.sender_name for m in self.messages))
+        return f"grupo com {', '.join(senders[:3])}"
+
+    @property
+    def urgency(self) -> UrgencyLevel:
+        """Highest urgency among the chat's messages."""
+        return max((m.urgency for m in self.messages), key=_URGENCY_RANK.__getitem__)
+
+
+@dataclass
+class Digest:
+    """Outcome of one digest run."""
+
+    text: str
+    message_ids: list[str]
+    chats: int
+    prompts: int
+    timed_out: int
+    elapsed: float
+
+
+def group_by_chat(messages: list[ProcessedMessage]) -> list[ChatMessages]:
+    """Group messages by chat JID, keeping each chat's messages in arrival order."""
+    grouped: dict[str, list[ProcessedMessage]] = {}
+    for msg in sorted(messages, key=lambda m: m.received_at):
+        grouped.setdefault(msg.chat_jid, []).append(msg)
+    return [ChatMessages(jid, msgs) for jid, msgs in grouped.items()]
+
+
+def pack(chats: list[ChatMessages]) -> list[list[ChatMessages]]:
+    """Split chats into prompts: one per busy chat, small chats packed together."""
+    small = [c for c in chats if len(c.messages) <= settings.digest_small_chat_messages]
+    busy = [[c] for c in chats if len(c.messages) > settings.digest_small_chat_messages]
+    size = max(1, settings.digest_pack_size)
+    return busy + [small[i : i + size] for i in range(0, len(small), size)]
+
+
+async def build_digest(messages: list[ProcessedMessage], prefs: PreferencesSnapshot) -> Digest:
+    """Summarise ``messages`` chat by chat and join the parts, most urgent first."""
+    start = time.perf_counter()
+    chats = group_by_chat(messages)
+    batches = pack(chats)
+    limit = asyncio.Semaphore(max(1, settings.digest_concurrency))
+
+    async def summarize(batch: list[ChatMessages]) -> dict[str, str]:
+        async with limit:
+            return await _summarize(batch, prefs)
+
+    # Map
+    tasks = [asyncio.ensure_future(summarize(batch)) for batch in batches]
+    done, pending = await asyncio.wait(tasks, timeout=settings.digest_timeout_seconds)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+
+    # Reduce
+    parts = []
+    for batch, task in zip(batches, tasks, strict=True):
+        texts: dict[str, str] = {}
+        if task in done and task.exception() is None:
+            texts = task.result()
+        elif task in done:
+            logger.error("Digest summary failed for %s", _titles(batch), exc_info=task.exception())
+        for chat in batch:
+            text = texts.get(chat.chat_jid) or _fallback(chat)
+            parts.append((_URGENCY_RANK[chat.urgency], len(chat.messages), text))
+    parts.sort(key=lambda p: (p[0], p[1]), reverse=True)
+
+    elapsed = time.perf_counter() - start
+    metrics.observe("digest.duration", elapsed)
+    metrics.incr("digest.prompts", len(batches))
+    metrics.incr("digest.timed_out", len(pending))
+    return Digest(
+        text=". ".join(text for _, _, text in parts),
+        message_ids=[m.message_id for c in chats for m in c.messages],
+        chats=len(chats),
+        prompts=len(batches),
+        timed_out=len(pending),
+        elapsed=elapsed,
+    )
+
+
+async def _summarize(batch: list[ChatMessages], prefs: PreferencesSnapshot) -> dict[str, str]:
+    """Return a ``"title: summary"`` part per chat JID; chats left out of the answer are missing."""
+    deps = WhatsAppDeps(
+        chat_jid=batch[0].chat_jid if len(batch) == 1 else "",
+        recent_messages=[],
+        preferences=prefs,
+        whatsapp_client=whatsapp_client,
+    )
+    if len(batch) == 1:
+        result = await summarizer_agent.run(_prompt(batch), deps=deps)
+        return {batch[0].chat_jid: f"{batch[0].title}: {result.output.summary}"}
+
+    packed = await batch_summarizer_agent.run(_prompt(batch), deps=deps)
+    titles = {c.chat_jid: c.title for c in batch}
+    return {
+        s.chat_id: f"{titles[s.chat_id]}: {s.summary}"
+        for s in packed.output.summaries
+        if s.chat_id in titles
+    }
+
+
+def _prompt(batch: list[ChatMessages]) -> str:
+    if len(batch) == 1:
+        return "Resuma brevemente as mensagens da noite:\n\n" + _section(batch[0])
+    sections = "\n\n".join(f"[chat_id={c.chat_jid}] {_section(c)}" for c in batch)
+    return "Resuma brevemente as mensagens da noite destas conversas:\n\n" + sections
+
+
+def _section(chat: ChatMessages) -> str:
+    lines = "\n".join(
+        f"- {m.sender_name}: {(m.transcription or m.content_preview or '')[:CONTENT_LIMIT]}"
+        for m in chat.messages
+    )
+    return f"Conversa com {chat.title}:\n{lines}"
+
+
+def _fallback(chat: ChatMessages) -> str:
+    return f"{chat.title}: {len(chat.messages)} mensagens"
+
+
+def _titles(batch: list[ChatMessages]) -> str:
+    return ", ".join(c.title for c in batch)
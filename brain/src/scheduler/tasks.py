@@ -2,24 +2,20 @@ import logging
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
-from agents.base import WhatsAppDeps
-from agents.summarizer import summarizer_agent
+from config import settings
 from database.engine import async_session_factory
-from database.repo import MessageRepo, PreferencesRepo
+from database.preferences import preferences_cache
+from database.repo import MessageRepo
+from media.retention import enforce_retention
 from notifications.proactive import ProactiveNotifier
-from whatsapp.client import whatsapp_client
+from notifications.quiet_hours import release_briefing
+from scheduler.digest import build_digest
 
 logger = logging.getLogger(__name__)
 
 scheduler = AsyncIOScheduler()
 
-
-def _group_by_chat(messages: list) -> dict:
-    grouped: dict = {}
-    for msg in messages:
-        key = msg.sender_name
-        grouped.setdefault(key, []).append(msg)
-    return grouped
+BRIEFING_JOB = "quiet_hours_briefing"
 
 
 @scheduler.scheduled_job("cron", hour=8, minute=0)
@@ -30,49 +26,56 @@ async def morning_digest() -> None:
         if not overnight:
             return
 
-        prefs = await PreferencesRepo.get(session)
-
-    grouped = _group_by_chat(overnight)
-    summary_parts = []
-
-    for chat_name, msgs in grouped.items():
-        try:
-            deps = WhatsAppDeps(
-                chat_jid=msgs[0].chat_jid,
-                recent_messages=[
-                    {"content": m.content_preview, "sender": m.sender_name} for m in msgs
-                ],
-                preferences=prefs,
-                whatsapp_client=whatsapp_client,
-            )
-            result = await summarizer_agent.run("Resuma brevemente", deps=deps)
-            summary_parts.append(f"{chat_name}: {result.output.summary}")
-        except Exception:
-            logger.exception("Morning digest summarizer failed for %s", chat_name)
-
-    if summary_parts:
-        full = "Bom dia! Resumo da noite: " + ". ".join(summary_parts)
-        await ProactiveNotifier.notify_text("Sistema", full, "MEDIUM")
-
-
-@scheduler.scheduled_job("interval", hours=24)
-async def cleanup_old_media() -> None:
-    """Remove MP3s com mais de 7 dias."""
-    import time
-    from pathlib import Path
-
-    from config import settings
-
-    media_dir = Path(settings.media_dir)
-    if not media_dir.exists():
-        return
-
-    cutoff = time.time() - 7 * 24 * 3600
-    removed = 0
-    for f in media_dir.glob("*.mp3"):
-        if f.stat().st_mtime < cutoff:
-            f.unlink(missing_ok=True)
-            removed += 1
-
+    prefs = await preferences_cache.get()
+    digest = await build_digest(overnight, prefs)
+    logger.info(
+        "Morning digest: %d chats in %d prompts, %.1fs (%d timed out)",
+        digest.chats,
+        digest.prompts,
+        digest.elapsed,
+        digest.timed_out,
+    )
+
+    if digest.text:
+        full = "Bom dia! Resumo da noite: " + digest.text
+        await ProactiveNotifier.notify_text(
+            "Sistema", full, "MEDIUM", message_ids=digest.message_ids
+        )
+
+
+async def quiet_hours_briefing() -> None:
+    """Ao fim do horário de silêncio, envia um único resumo dos alertas retidos."""
+    released = await release_briefing()
+    if released:
+        logger.info("Quiet-hours briefing released %d messages", released)
+    # Pick up a changed quiet_hours_end for the next night
+    await schedule_quiet_hours_briefing()
+
+
+async def schedule_quiet_hours_briefing(*, catch_up: bool = False) -> None:
+    """
+    Schedule the briefing at the configured ``quiet_hours_end``.
+
+    With ``catch_up`` (on startup), alerts held back while the process was
+    down are released right away when quiet hours are already over.
+    """
+    prefs = await preferences_cache.get()
+    end = prefs.quiet_hours_end
+    scheduler.add_job(
+        quiet_hours_briefing,
+        "cron",
+        hour=end.hour,
+        minute=end.minute,
+        id=BRIEFING_JOB,
+        replace_existing=True,
+    )
+    if catch_up and not prefs.is_quiet_hours_now():
+        scheduler.add_job(quiet_hours_briefing)
+
+
+@scheduler.scheduled_job("interval", minutes=settings.media_retention_interval_minutes)
+async def media_retention() -> None:
+    """Remove mídias ociosas há mais de ``media_max_age_days`` ou além da cota de disco."""
+    removed = await enforce_retention()
     if removed:
-        logger.info("Cleaned up %d old MP3 files", removed)
+        logger.info("Media retention removed %d files", removed)
@@ -0,0 +1,158 @@
+"""Adaptive single/batch dispatch of classification requests to the LLM."""
+
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, replace
+
+from agents.base import WhatsAppDeps
+from agents.classifier import NotificationDecision, batch_classifier_agent, classifier_agent
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ClassificationRequest:
+    """One classification job: a prompt keyed by the message id it decides."""
+
+    key: str
+    prompt: str
+    deps: WhatsAppDeps
+
+
+type _Outcome = NotificationDecision | Exception
+
+# Returns the number of messages waiting to be processed
+type Backlog = Callable[[], Awaitable[int]]
+
+BACKLOG_TTL = 1.0  # seconds a backlog reading is reused
+
+
+class ClassificationBatcher:
+    """
+    Route classification requests to ``classifier_agent`` or ``batch_classifier_agent``.
+
+    While the ``backlog`` (messages waiting in the ingestion stream, across
+    every worker process) is at most ``threshold`` each request gets its own
+    agent run. Beyond that, requests are queued for ``linger`` seconds and
+    packed up to ``max_batch`` per batch run, sharing the instructions and tool
+    round trips. Only requests with the same preferences share a batch; each
+    one's chat is named in its section of the prompt. A failed batch is split
+    in halves until single requests remain, and ids missing from a batch answer
+    are retried one by one.
+    """
+
+    def __init__(self, *, backlog: Backlog, threshold: int, max_batch: int, linger: float) -> None:
+        self._backlog = backlog
+        self._threshold = threshold
+        self._max_batch = max_batch
+        self._linger = linger
+        self._depth = 0
+        self._depth_at = float("-inf")
+        self._probe: asyncio.Task | None = None
+        self._queue: list[tuple[ClassificationRequest, asyncio.Future]] = []
+        self._collector: asyncio.Task | None = None
+        self._batches: set[asyncio.Task] = set()
+
+    async def classify(self, request: ClassificationRequest) -> NotificationDecision:
+        """Return the decision for ``request``, batching it with others under load."""
+        if self._max_batch <= 1 or await self._load() <= self._threshold:
+            return await _classify_single(request)
+
+        future: asyncio.Future[NotificationDecision] = asyncio.get_running_loop().create_future()
+        self._queue.append((request, future))
+        if self._collector is None or self._collector.done():
+            self._collector = asyncio.create_task(self._collect())
+        return await future
+
+    async def _load(self) -> int:
+        """Return the current backlog, read at most once per ``BACKLOG_TTL`` seconds."""
+        if time.monotonic() - self._depth_at >= BACKLOG_TTL:
+            if self._probe is None or self._probe.done():
+                self._probe = asyncio.create_task(self._backlog())
+            try:
+                self._depth = await asyncio.shield(self._probe)
+            except Exception:
+                logger.warning("Could not read the ingestion backlog", exc_info=True)
+                self._depth = 0
+            self._depth_at = time.monotonic()
+            metrics.gauge("classifier.backlog", self._depth)
+        return self._depth
+
+    async def _collect(self) -> None:
+        while self._queue:
+            if len(self._queue) < self._max_batch:
+                await asyncio.sleep(self._linger)
+            prefs = self._queue[0][0].deps.preferences
+            batch, rest = [], []
+            for item in self._queue:
+                fits = len(batch) < self._max_batch and item[0].deps.preferences == prefs
+                (batch if fits else rest).append(item)
+            self._queue = rest
+            task = asyncio.create_task(self._run_batch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _run_batch(self, batch: list[tuple[ClassificationRequest, asyncio.Future]]) -> None:
+        try:
+            outcomes = await self._classify_many([request for request, _ in batch])
+        except Exception as err:
+            outcomes = {request.key: err for request, _ in batch}
+
+        for request, future in batch:
+            if future.done():
+                continue
+            outcome = outcomes[request.key]
+            if isinstance(outcome, Exception):
+                future.set_exception(outcome)
+            else:
+                future.set_result(outcome)
+
+    async def _classify_many(self, requests: list[ClassificationRequest]) -> dict[str, _Outcome]:
+        if len(requests) == 1:
+            return await _classify_one_outcome(requests[0])
+
+        metrics.incr("classifier.requests.batch")
+        metrics.incr("classifier.batched_messages", len(requests))
+        prompt = "\n\n".join(
+            f"[message_id={r.key}] [chat={r.deps.chat_jid}] {r.prompt}" for r in requests
+        )
+        # The batch shares preferences (see ``_collect``) but no single chat
+        deps = replace(requests[0].deps, chat_jid="", recent_messages=[])
+        try:
+            result = await batch_classifier_agent.run(prompt, deps=deps)
+        except Exception:
+            logger.warning("Batch classification of %d messages failed, splitting", len(requests))
+            metrics.incr("classifier.batch_splits")
+            mid = len(requests) // 2
+            left, right = await asyncio.gather(
+                self._classify_many(requests[:mid]),
+                self._classify_many(requests[mid:]),
+            )
+            return {**left, **right}
+
+        decided = {d.message_id: d for d in result.output.decisions}
+        outcomes: dict[str, _Outcome] = {
+            r.key: decided[r.key] for r in requests if r.key in decided
+        }
+        missing = [r for r in requests if r.key not in decided]
+        if missing:
+            logger.warning("Batch answer skipped %d messages, retrying singly", len(missing))
+            for partial in await asyncio.gather(*(_classify_one_outcome(r) for r in missing)):
+                outcomes.update(partial)
+        return outcomes
+
+
+async def _classify_single(request: ClassificationRequest) -> NotificationDecision:
+    metrics.incr("classifier.requests.single")
+    result = await classifier_agent.run(request.prompt, deps=request.deps)
+    return result.output
+
+
+async def _classify_one_outcome(request: ClassificationRequest) -> dict[str, _Outcome]:
+    try:
+        return {request.key: await _classify_single(request)}
+    except Exception as err:
+        return {request.key: err}
@@ -0,0 +1,88 @@
+"""Per-chat debounce window that groups message bursts into one classification."""
+
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Window[T]:
+    items: list[T]
+    opened_at: float
+    last_at: float
+    done: asyncio.Future = field(default_factory=lambda: asyncio.get_running_loop().create_future())
+
+
+class ChatCoalescer[T]:
+    """
+    Collect items per key until the key goes quiet, then flush them together.
+
+    A window closes ``quiet`` seconds after its latest item or ``max_wait``
+    seconds after its first one, whichever comes first. ``add`` returns a future
+    that resolves once the window holding the item has been flushed (and
+    carries any flush error), so callers (and the ingestion ack) can wait for
+    the whole burst without holding anything else meanwhile. Windows are per
+    process: bursts split across worker processes are coalesced per process.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[list[T]], Awaitable[None]],
+        *,
+        quiet: float,
+        max_wait: float,
+    ) -> None:
+        self._flush = flush
+        self._quiet = quiet
+        self._max_wait = max_wait
+        self._windows: dict[str, _Window[T]] = {}
+        self._timers: set[asyncio.Task] = set()
+
+    async def submit(self, key: str, item: T) -> None:
+        """Add ``item`` to the open window for ``key`` and wait until it is flushed."""
+        await self.add(key, item)
+
+    def add(self, key: str, item: T) -> Awaitable[None]:
+        """Add ``item`` to the open window for ``key``; return an awaitable for its flush."""
+        if self._quiet <= 0:
+            return asyncio.ensure_future(self._flush([item]))
+
+        now = time.monotonic()
+        window = self._windows.get(key)
+        if window is None:
+            window = _Window(items=[item], opened_at=now, last_at=now)
+            self._windows[key] = window
+            timer = asyncio.create_task(self._close_when_quiet(key, window))
+            self._timers.add(timer)
+            timer.add_done_callback(self._timers.discard)
+        else:
+            window.items.append(item)
+            window.last_at = now
+
+        return asyncio.shield(window.done)
+
+    async def _close_when_quiet(self, key: str, window: _Window[T]) -> None:
+        while True:
+            deadline = min(window.last_at + self._quiet, window.opened_at + self._max_wait)
+            delay = deadline - time.monotonic()
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+
+        self._windows.pop(key, None)
+        metrics.incr("coalescer.bursts")
+        metrics.incr("coalescer.messages", len(window.items))
+        try:
+            await self._flush(window.items)
+        except Exception as err:
+            window.done.set_exception(err)
+            # Mark retrieved so an all-cancelled window does not log "never retrieved"
+            window.done.exception()
+        else:
+            window.done.set_result(None)
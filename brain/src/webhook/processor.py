@@ -1,109 +1,398 @@
 """Webhook processing pipeline — classifies and routes incoming WhatsApp messages."""
 
+import dataclasses
+import datetime
 import logging
+from collections.abc import Awaitable
+from dataclasses import dataclass
+from datetime import UTC
 
 from agents.base import WhatsAppDeps
-from agents.classifier import classifier_agent
+from agents.classifier import NotificationDecision
 from agents.summarizer import summarizer_agent
 from audio.processor import AudioProcessor
-from database.engine import async_session_factory
-from database.repo import MessageRepo, PreferencesRepo
+from config import settings
+from database.engine import async_session_factory, db_stage
+from database.models import UrgencyLevel
+from database.preferences import PreferencesSnapshot, preferences_cache
+from database.repo import MessageRepo
+from ingestion.stream import queue_stats
+from metrics import metrics
 from notifications.proactive import ProactiveNotifier
+from notifications.quiet_hours import DeferredMessage, defer
+from webhook.batcher import ClassificationBatcher, ClassificationRequest
+from webhook.coalescer import ChatCoalescer
+from webhook.rules import MessageFacts, evaluate, is_vip
 from whatsapp.client import whatsapp_client
-from whatsapp.models import WebhookPayload
+from whatsapp.history import chat_history
+from whatsapp.models import MessagePayload, WebhookPayload
 
 logger = logging.getLogger(__name__)
 
+_URGENCY_ORDER = ("LOW", "MEDIUM", "HIGH", "CRITICAL")
 
-async def process_incoming_message(payload: WebhookPayload) -> None:
-    """Async pipeline executed as a FastAPI background task for each incoming message."""
+
+@dataclass
+class IngestedMessage:
+    """A persisted message (with its audio processed) waiting to be classified."""
+
+    record_id: int
+    payload: MessagePayload
+    local_path: str | None = None
+    public_url: str | None = None
+    transcription: str | None = None
+    transcription_model: str | None = None
+    media_sha256: str | None = None
+    audio_pending: bool = False  # audio columns not written yet (deferred)
+    partial: bool = False  # transcription covers only the start of a long note
+    early_urgency: str | None = None  # alert already sent from a partial transcript
+
+    @property
+    def content(self) -> str:
+        """Return the transcription for voice notes, the text body otherwise."""
+        return self.transcription or self.payload.body or ""
+
+    def audio_values(self) -> dict:
+        """Return this message's audio columns (all None for text messages)."""
+        return {
+            "audio_local_path": self.local_path,
+            "audio_public_url": self.public_url,
+            "transcription": self.transcription,
+            "transcription_model": self.transcription_model,
+            "media_sha256": self.media_sha256,
+        }
+
+
+async def process_incoming_message(
+    payload: WebhookPayload, *, redelivered: bool = False
+) -> Awaitable[None] | None:
+    """
+    Async pipeline executed by the ingestion workers for each incoming message.
+
+    The message is persisted and its audio processed right away; classification
+    and notification happen once per burst of messages from the same chat (see
+    :class:`ChatCoalescer`). Returns an awaitable that completes after the burst
+    is handled, so the worker can free the message's slot while the coalescing
+    window is open and ack it only afterwards.
+
+    With ``pipeline_defer_writes`` the audio results are held in memory and
+    written together with the classification, so a message costs one INSERT
+    and one share of a batched UPDATE.
+
+    ``redelivered`` is set when a previous attempt failed mid-way; in that case
+    a message that was persisted but never classified is resumed instead of
+    being skipped as a duplicate.
+    """
+    ingested = await _ingest(payload, redelivered=redelivered)
+    if ingested is None:
+        return None
+    return chat_coalescer.add(ingested.payload.chat_id, ingested)
+
+
+async def _ingest(payload: WebhookPayload, *, redelivered: bool) -> IngestedMessage | None:
     msg = payload.payload
 
-    async with async_session_factory() as session:
-        # 1. Persist raw message to DB
-        record = await MessageRepo.create(session, payload.to_db_dict())
-        if record is None:
-            logger.debug("Duplicate webhook for message %s, skipping.", payload.payload.id)
-            return
+    # 1. Persist raw message to DB
+    with db_stage("ingest"):
+        async with async_session_factory() as session:
+            record = await MessageRepo.create(session, payload.to_db_dict())
+            if record is None and redelivered:
+                record = await MessageRepo.get_unprocessed(session, msg.id)
+    if record is None:
+        logger.debug("Duplicate webhook for message %s, skipping.", payload.payload.id)
+        return None
 
-        # 2. Process audio when present
-        transcription: str | None = None
-        public_url: str | None = None
-        if msg.message_type == "audio" and msg.audio:
-            try:
-                local_path, public_url, transcription = await AudioProcessor.process(
-                    message_id=msg.id,
-                    local_audio_path=msg.audio,
-                )
-                await MessageRepo.update_audio(
-                    session, record.id, local_path, public_url, transcription
-                )
-            except Exception:
-                logger.exception("Failed to process audio for message %s", msg.id)
+    await chat_history.record(msg)
+
+    ingested = IngestedMessage(record_id=record.id, payload=msg)
 
-        # 3. Fetch recent conversation context
-        recent = await whatsapp_client.get_messages(msg.chat_id, limit=10)
+    # 2. Process audio when present
+    if msg.message_type == "audio" and msg.audio:
 
-        # 4. Load user preferences
-        prefs = await PreferencesRepo.get(session)
+        async def triage_partial(text: str) -> None:
+            await _triage_partial(ingested, text)
 
-    effective_content = transcription or msg.body or ""
+        prefs = await preferences_cache.get()
+        vip = is_vip(
+            prefs,
+            MessageFacts(
+                chat_jid=msg.chat_id,
+                sender_jid=msg.from_,
+                sender_name=msg.from_name,
+                is_group=msg.is_group,
+                content="",
+            ),
+        )
+        try:
+            audio = await AudioProcessor.process(
+                message_id=msg.id,
+                local_audio_path=msg.audio,
+                on_partial=triage_partial,
+                vip=vip,
+            )
+        except Exception:
+            logger.exception("Failed to process audio for message %s", msg.id)
+            return ingested
+
+        ingested.local_path = audio.local_path
+        ingested.public_url = audio.public_url
+        ingested.transcription = audio.transcription
+        ingested.transcription_model = audio.transcription_model
+        ingested.media_sha256 = audio.media_sha256
+        ingested.audio_pending = settings.pipeline_defer_writes
+        if not settings.pipeline_defer_writes:
+            with db_stage("ingest"):
+                async with async_session_factory() as session:
+                    await MessageRepo.update_audio(
+                        session,
+                        record.id,
+                        audio.local_path,
+                        audio.public_url,
+                        audio.transcription,
+                        audio.transcription_model,
+                        audio.media_sha256,
+                    )
+
+    return ingested
+
+
+async def _triage_partial(ingested: IngestedMessage, text: str) -> None:
+    """Classify a long voice note from its first chunk so urgent alerts go out early."""
+    partial = dataclasses.replace(ingested, transcription=text, audio_pending=False, partial=True)
+    await classify_burst([partial], preliminary=True)
+    ingested.early_urgency = partial.early_urgency
+
+
+async def classify_burst(burst: list[IngestedMessage], *, preliminary: bool = False) -> None:
+    """
+    Classify a burst of messages from one chat once and act on the decision.
+
+    A ``preliminary`` pass (on a partial transcription) writes nothing and only
+    sends CRITICAL/HIGH alerts; the final pass then alerts again only if the
+    urgency went up.
+    """
+    first = burst[0].payload
+    last = burst[-1].payload
+    record_ids = [m.record_id for m in burst]
+
+    # 3. Load user preferences and the chat's unread backlog for the rules
+    prefs = await preferences_cache.get()
+    unread = 0
+    if first.is_group:
+        with db_stage("classify"):
+            async with async_session_factory() as session:
+                unread = await MessageRepo.count_unread(session, first.chat_id)
 
     deps = WhatsAppDeps(
-        chat_jid=msg.chat_id,
-        recent_messages=recent,
+        chat_jid=first.chat_id,
+        recent_messages=[],
         preferences=prefs,
         whatsapp_client=whatsapp_client,
     )
 
-    try:
-        decision = await classifier_agent.run(
-            f"Mensagem de {msg.from_name}: {effective_content}",
-            deps=deps,
-        )
-        result = decision.output
-    except Exception:
-        logger.exception("Classifier agent failed for message %s", msg.id)
-        return
+    # 4. Settle clear-cut cases with the rule engine, fall back to the LLM otherwise
+    quiet_hours = prefs.is_quiet_hours_now()
+    result = _evaluate_rules(burst, prefs, unread, quiet_hours)
+    decided_by = "rules"
 
-    # 5. Update DB with classification result
-    async with async_session_factory() as session:
-        await MessageRepo.update_classification(
-            session,
-            record.id,
-            urgency=result.urgency,
-            summary=result.summary,
-            notified=result.should_notify,
-        )
+    if result is None:
+        decided_by = "llm"
+        deps.recent_messages = await chat_history.recent(first.chat_id, limit=10)
+        try:
+            result = await classification_batcher.classify(
+                ClassificationRequest(key=last.id, prompt=_classifier_prompt(burst), deps=deps)
+            )
+        except Exception:
+            logger.exception("Classifier agent failed for messages %s", record_ids)
+            await _write_results(burst, None)
+            return
+
+    # Non-VIP alerts are held back by quiet hours and go to the briefing instead
+    held = quiet_hours and result.should_notify and not _from_vip(burst, prefs)
 
-    # 6. Act on urgency level
+    if preliminary:
+        metrics.incr("classifier.preliminary")
+        if held or not result.should_notify or result.urgency not in ("CRITICAL", "HIGH"):
+            return
+        for m in burst:
+            m.early_urgency = result.urgency
+    else:
+        metrics.incr(f"classifier.decided_by.{decided_by}", len(burst))
+
+        # 5. Write the decision (and any deferred audio results) to every message in the burst
+        await _write_results(burst, result, decided_by)
+
+        if held:
+            await _defer_until_quiet_hours_end(burst)
+            return
+
+    # 6. Act on urgency level, unless a partial transcript already raised this alert
     if not result.should_notify:
         return
+    alerted = [_URGENCY_ORDER.index(m.early_urgency) for m in burst if m.early_urgency]
+    if not preliminary and alerted and _URGENCY_ORDER.index(result.urgency) <= max(alerted):
+        return
+
+    content = " ".join(m.content for m in burst if m.content)
+    message_ids = [m.payload.id for m in burst]
 
     if result.urgency == "CRITICAL":
         await ProactiveNotifier.notify_text(
-            sender=msg.from_name,
-            content=effective_content[:200],
+            sender=last.from_name,
+            content=content[:200],
             urgency="CRITICAL",
+            message_ids=message_ids,
         )
 
     elif result.urgency == "HIGH":
         try:
             summary = await summarizer_agent.run("Resuma esta conversa", deps=deps)
             await ProactiveNotifier.notify_text(
-                sender=msg.from_name,
+                sender=last.from_name,
                 content=summary.output.summary,
                 urgency="HIGH",
+                message_ids=message_ids,
             )
         except Exception:
-            logger.exception("Summarizer failed for message %s", msg.id)
+            logger.exception("Summarizer failed for messages %s", record_ids)
 
     elif result.urgency == "MEDIUM":
-        if msg.message_type == "audio" and public_url:
+        audio = next((m for m in reversed(burst) if m.public_url), None)
+        if audio is not None and audio.public_url:
             await ProactiveNotifier.notify_audio(
-                sender=msg.from_name,
-                audio_url=public_url,
-                transcription=transcription,
+                sender=audio.payload.from_name,
+                audio_url=audio.public_url,
+                transcription=audio.transcription,
+                message_ids=message_ids,
             )
         else:
             await ProactiveNotifier.notify_silent()
+
+
+async def _write_results(
+    burst: list[IngestedMessage],
+    decision: NotificationDecision | None,
+    decided_by: str | None = None,
+) -> None:
+    """Persist the classification and any deferred audio columns for a burst in one write."""
+    audio = any(m.audio_pending for m in burst)
+    if decision is None and not audio:
+        return
+
+    with db_stage("write"):
+        async with async_session_factory() as session:
+            if decision is not None and not audio:
+                await MessageRepo.update_classification(
+                    session,
+                    [m.record_id for m in burst],
+                    urgency=decision.urgency,
+                    summary=decision.summary,
+                    notified=decision.should_notify,
+                    decided_by=decided_by or "llm",
+                )
+                return
+
+            values = {}
+            if decision is not None:
+                values = {
+                    "urgency": UrgencyLevel[decision.urgency],
+                    "summary": decision.summary,
+                    "notified": decision.should_notify,
+                    "decided_by": decided_by,
+                    "processed_at": datetime.datetime.now(UTC).replace(tzinfo=None),
+                }
+            # Every row carries the same keys, so they go out as one executemany batch
+            rows = [
+                {"id": m.record_id, **values, **m.audio_values()}
+                for m in burst
+                if values or m.audio_pending
+            ]
+            await MessageRepo.update_many(session, rows)
+
+
+async def _defer_until_quiet_hours_end(burst: list[IngestedMessage]) -> None:
+    try:
+        await defer(
+            [
+                DeferredMessage(
+                    id=m.payload.id,
+                    chat_jid=m.payload.chat_id,
+                    sender=m.payload.from_name,
+                    content=m.content,
+                )
+                for m in burst
+                if m.content
+            ]
+        )
+    except Exception:
+        logger.exception("Could not defer quiet-hours alerts for %s", burst[0].payload.chat_id)
+
+
+def _facts(m: IngestedMessage, unread: int = 0) -> MessageFacts:
+    return MessageFacts(
+        chat_jid=m.payload.chat_id,
+        sender_jid=m.payload.from_,
+        sender_name=m.payload.from_name,
+        is_group=m.payload.is_group,
+        content=m.content,
+        unread_in_chat=unread,
+    )
+
+
+def _from_vip(burst: list[IngestedMessage], prefs: PreferencesSnapshot) -> bool:
+    return any(is_vip(prefs, _facts(m)) for m in burst)
+
+
+def _evaluate_rules(
+    burst: list[IngestedMessage],
+    prefs: PreferencesSnapshot,
+    unread: int,
+    quiet_hours: bool,
+) -> NotificationDecision | None:
+    """
+    Apply the rules to each message of the burst.
+
+    A single CRITICAL message makes the burst CRITICAL; the burst is LOW only
+    when every message is LOW; anything else is left to the LLM.
+    """
+    decisions = [evaluate(prefs, _facts(m, unread), quiet_hours=quiet_hours) for m in burst]
+    decided = [d for d in decisions if d is not None]
+    critical = next((d for d in decided if d.urgency == "CRITICAL"), None)
+    if critical is not None:
+        return critical
+    if len(decided) < len(decisions):
+        return None
+    return max(decided, key=lambda d: _URGENCY_ORDER.index(d.urgency))
+
+
+def _classifier_prompt(burst: list[IngestedMessage]) -> str:
+    if len(burst) == 1:
+        m = burst[0]
+        return f"Mensagem de {m.payload.from_name}: {_prompt_content(m)}"
+    lines = "\n".join(f"- {m.payload.from_name}: {_prompt_content(m)}" for m in burst)
+    return f"Sequência de {len(burst)} mensagens na mesma conversa:\n{lines}"
+
+
+def _prompt_content(m: IngestedMessage) -> str:
+    if m.partial:
+        return f"{m.content} [...] (início de um áudio longo, transcrição parcial)"
+    return m.content
+
+
+async def _ingestion_backlog() -> int:
+    stats = await queue_stats()
+    return stats["pending"] + stats["lag"]
+
+
+classification_batcher = ClassificationBatcher(
+    backlog=_ingestion_backlog,
+    threshold=settings.classifier_batch_threshold,
+    max_batch=settings.classifier_batch_size,
+    linger=settings.classifier_batch_linger_seconds,
+)
+
+chat_coalescer: ChatCoalescer[IngestedMessage] = ChatCoalescer(
+    classify_burst,
+    quiet=settings.coalesce_quiet_seconds,
+    max_wait=settings.coalesce_max_wait_seconds,
+)
@@ -1,6 +1,6 @@
-from fastapi import APIRouter, BackgroundTasks, Depends, Request
+from fastapi import APIRouter, Depends, Request
 
-from webhook.processor import process_incoming_message
+from ingestion.stream import enqueue
 from whatsapp.models import WebhookPayload
 from whatsapp.webhook import verify_webhook_hmac
 
@@ -10,14 +10,13 @@ router = APIRouter()
 @router.post("/webhook")
 async def webhook_endpoint(
     request: Request,
-    background_tasks: BackgroundTasks,
     _body: bytes = Depends(verify_webhook_hmac),
 ) -> dict:
-    """Receive a WhatsApp webhook event and enqueue message processing in the background."""
+    """Receive a WhatsApp webhook event and append it to the ingestion stream."""
     body = await request.json()
     payload = WebhookPayload(**body)
 
     if payload.event == "message":
-        background_tasks.add_task(process_incoming_message, payload)
+        await enqueue(payload)
 
     return {"status": "ok"}
@@ -0,0 +1,78 @@
+"""
+Deterministic pre-classifier that settles clear-cut messages without calling the LLM.
+
+Rules read the pre-parsed :class:`PreferencesSnapshot` (VIP set, keyword
+matcher, important groups) and are evaluated in microseconds. Only the two
+ends of the scale are decided here — CRITICAL (VIP + urgent keyword) and LOW
+(quiet hours, low-traffic groups); everything in between falls through to
+``classifier_agent``.
+"""
+
+from dataclasses import dataclass
+
+from agents.classifier import NotificationDecision
+from database.preferences import PreferencesSnapshot
+
+
+@dataclass(frozen=True)
+class MessageFacts:
+    """The subset of an incoming message the rules look at."""
+
+    chat_jid: str
+    sender_jid: str | None
+    sender_name: str
+    is_group: bool
+    content: str
+    unread_in_chat: int = 0
+
+
+def is_vip(prefs: PreferencesSnapshot, facts: MessageFacts) -> bool:
+    """Match the sender by JID, phone number, or display name, or the chat by JID."""
+    candidates = {facts.chat_jid.casefold(), facts.sender_name.casefold()}
+    if facts.sender_jid:
+        jid = facts.sender_jid.casefold()
+        candidates |= {jid, jid.split("@", 1)[0]}
+    return not prefs.vip_lookup.isdisjoint(candidates)
+
+
+def evaluate(
+    prefs: PreferencesSnapshot, facts: MessageFacts, *, quiet_hours: bool
+) -> NotificationDecision | None:
+    """Return a decision for clear-cut cases, or None when the LLM should decide."""
+    vip = is_vip(prefs, facts)
+    keyword = prefs.match_keyword(facts.content)
+    summary = facts.content[:200] or f"Mensagem de {facts.sender_name}"
+
+    if vip and keyword and (not quiet_hours or prefs.quiet_hours_allow_vip):
+        return NotificationDecision(
+            should_notify=True,
+            urgency="CRITICAL",
+            summary=summary,
+            reason=f"Contato VIP usou a palavra urgente '{keyword}'.",
+        )
+
+    if vip or keyword:
+        return None
+
+    if quiet_hours:
+        return NotificationDecision(
+            should_notify=False,
+            urgency="LOW",
+            summary=summary,
+            reason="Horário de silêncio e remetente não é VIP.",
+        )
+
+    if (
+        facts.is_group
+        and facts.chat_jid.casefold() not in prefs.important_groups
+        and facts.unread_in_chat < prefs.group_notify_threshold
+        and len(facts.content) < prefs.long_message_threshold
+    ):
+        return NotificationDecision(
+            should_notify=False,
+            urgency="LOW",
+            summary=summary,
+            reason="Grupo comum com pouca atividade e sem palavras urgentes.",
+        )
+
+    return None
@@ -3,6 +3,7 @@
 import httpx
 
 from config import settings
+from whatsapp.contacts import ContactDirectory
 
 
 class WhatsAppClient:
@@ -19,6 +20,7 @@ class WhatsAppClient:
             headers={"X-Device-Id": settings.whatsapp_device_id},
             timeout=30.0,
         )
+        self.contacts = ContactDirectory(self.list_contacts)
 
     async def get_messages(self, chat_jid: str, limit: int = 20) -> list[dict]:
         """Fetch recent messages from a chat by JID."""
@@ -38,38 +40,15 @@ class WhatsAppClient:
         resp.raise_for_status()
         return resp.json()
 
-    async def find_contact(self, name: str) -> tuple[str, str] | None:
-        """Resolve a display name to a (matched_name, jid) tuple via fuzzy local matching."""
-        from difflib import get_close_matches
-
+    async def list_contacts(self) -> list[dict]:
+        """Fetch the full contact list of the connected account."""
         resp = await self._client.get("/user/my/contacts")
         resp.raise_for_status()
-        contacts: list[dict] = resp.json().get("results", {}).get("data", [])
-
-        if not contacts:
-            return None
+        return resp.json().get("results", {}).get("data", [])
 
-        query = name.strip().lower()
-        names = [c.get("name", "") for c in contacts if c.get("name")]
-
-        # 1. Exact word prefix match: "diego" matches "Diego Santos"
-        matched_name = next(
-            (n for n in names if any(word.lower().startswith(query) for word in n.split())),
-            None,
-        )
-
-        # 2. Fuzzy match with high cutoff as fallback
-        if not matched_name:
-            matches = get_close_matches(name, names, n=1, cutoff=0.7)
-            matched_name = matches[0] if matches else None
-
-        if matched_name:
-            contact = next(c for c in contacts if c.get("name") == matched_name)
-            jid = contact.get("jid")
-            if jid:
-                return matched_name, jid
-
-        return None
+    async def find_contact(self, name: str) -> tuple[str, str] | None:
+        """Resolve a display name to a (matched_name, jid) tuple via the cached contact index."""
+        return await self.contacts.find(name)
 
     async def close(self) -> None:
         """Close the underlying HTTP client connection."""
@@ -0,0 +1,251 @@
+"""
+In-memory contact directory with a precomputed search index.
+
+Contacts are fetched from the Go REST API once, persisted in Redis so restarts
+start warm, and refreshed in the background (or on a lookup miss). Names are
+accent-folded and lowercased into tokens, indexed by a prefix trie for
+"diego" → "Diego Santos" lookups and by trigrams for misspellings.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+import unicodedata
+from collections import Counter
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+
+from redis.exceptions import RedisError
+
+from config import settings
+from database.redis import get_redis
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY = "contacts:directory"
+FUZZY_CUTOFF = 0.45
+FUZZY_CANDIDATES = 50
+
+
+def fold(text: str) -> str:
+    """Lowercase and strip accents: "Júlia" → "julia"."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def trigrams(token: str) -> frozenset[str]:
+    """Return the padded character trigrams of a single token."""
+    padded = f"  {token} "
+    return frozenset(padded[i : i + 3] for i in range(len(padded) - 2))
+
+
+def _dice(a: frozenset[str], b: frozenset[str]) -> float:
+    return 2 * len(a & b) / (len(a) + len(b)) if a and b else 0.0
+
+
+@dataclass(frozen=True)
+class Contact:
+    """A WhatsApp contact as returned by ``/user/my/contacts``."""
+
+    name: str
+    jid: str
+
+
+@dataclass
+class _TrieNode:
+    children: dict[str, _TrieNode] = field(default_factory=dict)
+    ids: set[int] = field(default_factory=set)  # contacts with a token under this prefix
+
+
+class ContactIndex:
+    """Immutable-after-build search structures over a contact list."""
+
+    def __init__(self, contacts: list[Contact]) -> None:
+        # Stable order so ties always resolve the same way
+        self.contacts = sorted(set(contacts), key=lambda c: (fold(c.name), c.jid))
+        self._folded = [fold(c.name) for c in self.contacts]
+        self._tokens = [name.split() for name in self._folded]
+        self._token_trigrams = [[trigrams(t) for t in tokens] for tokens in self._tokens]
+        self._trie = _TrieNode()
+        self._postings: dict[str, set[int]] = {}
+
+        for cid, tokens in enumerate(self._tokens):
+            for token in tokens:
+                node = self._trie
+                for char in token:
+                    node = node.children.setdefault(char, _TrieNode())
+                    node.ids.add(cid)
+            for grams in self._token_trigrams[cid]:
+                for gram in grams:
+                    self._postings.setdefault(gram, set()).add(cid)
+
+    def __len__(self) -> int:
+        """Return the number of indexed contacts."""
+        return len(self.contacts)
+
+    def best(self, query: str) -> Contact | None:
+        """Return the best match for ``query``, or None when nothing is close enough."""
+        ranked = self.search(query, limit=1)
+        return ranked[0] if ranked else None
+
+    def search(self, query: str, limit: int = 5) -> list[Contact]:
+        """
+        Rank contacts for a spoken name.
+
+        Prefix matches (every query word starts some name word) beat fuzzy
+        matches. Within prefix matches, exact full names, then whole-word hits,
+        then matches on the first name, then shorter names win; fuzzy matches
+        are ranked by trigram similarity. Remaining ties break on name and JID.
+        """
+        words = fold(query).split()
+        if not words:
+            return []
+
+        prefix_ids = self._prefix_ids(words)
+        if prefix_ids:
+            folded_query = " ".join(words)
+            ranked = sorted(
+                prefix_ids,
+                key=lambda cid: (
+                    self._folded[cid] != folded_query,
+                    -sum(w in self._tokens[cid] for w in words),
+                    not self._tokens[cid][0].startswith(words[0]),
+                    len(self._folded[cid]),
+                    cid,
+                ),
+            )
+            return [self.contacts[cid] for cid in ranked[:limit]]
+
+        scored = [
+            (score, cid)
+            for cid in self._fuzzy_candidates(words)
+            if (score := self._fuzzy_score(words, cid)) >= FUZZY_CUTOFF
+        ]
+        scored.sort(key=lambda item: (-item[0], len(self._folded[item[1]]), item[1]))
+        return [self.contacts[cid] for _, cid in scored[:limit]]
+
+    def _prefix_ids(self, words: list[str]) -> set[int]:
+        result: set[int] | None = None
+        for word in words:
+            node: _TrieNode | None = self._trie
+            for char in word:
+                node = node.children.get(char)
+                if node is None:
+                    return set()
+            result = set(node.ids) if result is None else result & node.ids
+            if not result:
+                return set()
+        return result or set()
+
+    def _fuzzy_candidates(self, words: list[str]) -> list[int]:
+        hits: Counter[int] = Counter()
+        for word in words:
+            for gram in trigrams(word):
+                hits.update(self._postings.get(gram, ()))
+        return [cid for cid, _ in hits.most_common(FUZZY_CANDIDATES)]
+
+    def _fuzzy_score(self, words: list[str], cid: int) -> float:
+        """Average, over query words, of the best trigram similarity to any name word."""
+        contact_grams = self._token_trigrams[cid]
+        return sum(
+            max(_dice(trigrams(word), grams) for grams in contact_grams) for word in words
+        ) / len(words)
+
+
+class ContactDirectory:
+    """
+    Process-level contact cache backed by Redis and the Go REST contact list.
+
+    ``fetch`` returns the raw contact dicts from ``/user/my/contacts``.
+    """
+
+    def __init__(self, fetch: Callable[[], Awaitable[list[dict]]]) -> None:
+        self._fetch = fetch
+        self._index: ContactIndex | None = None
+        self._digest = ""
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def find(self, name: str) -> tuple[str, str] | None:
+        """Resolve a display name to a ``(matched_name, jid)`` tuple."""
+        index = await self._get_index()
+        start = time.perf_counter()
+        contact = index.best(name)
+        metrics.observe("contacts.lookup", time.perf_counter() - start)
+
+        # Maybe a brand-new contact: refresh once, unless we just did
+        if (
+            contact is None
+            and time.time() - self._fetched_at > settings.contacts_min_refresh_seconds
+        ):
+            metrics.incr("contacts.miss_refresh")
+            await self.refresh()
+            contact = (await self._get_index()).best(name)
+
+        return (contact.name, contact.jid) if contact else None
+
+    async def refresh(self) -> None:
+        """Fetch the contact list and rebuild the index if it changed."""
+        async with self._lock:
+            await self._refresh_locked()
+
+    async def run_refresher(self) -> None:
+        """Refresh the directory every ``contacts_refresh_seconds``. Runs until cancelled."""
+        while True:
+            try:
+                if time.time() - self._fetched_at >= settings.contacts_refresh_seconds:
+                    await self.refresh()
+            except Exception:
+                logger.exception("Background contact refresh failed")
+            await asyncio.sleep(settings.contacts_refresh_seconds / 4)
+
+    async def _get_index(self) -> ContactIndex:
+        if self._index is None:
+            async with self._lock:
+                if self._index is None and not await self._load_from_redis():
+                    await self._refresh_locked()
+        if self._index is None:
+            raise RuntimeError("Contact directory is empty after loading")
+        return self._index
+
+    async def _refresh_locked(self) -> None:
+        raw = await self._fetch()
+        contacts = [
+            Contact(name=c["name"], jid=c["jid"]) for c in raw if c.get("name") and c.get("jid")
+        ]
+        await self._install(contacts, fetched_at=time.time(), persist=True)
+
+    async def _install(self, contacts: list[Contact], *, fetched_at: float, persist: bool) -> None:
+        payload = json.dumps(sorted([c.name, c.jid] for c in contacts), ensure_ascii=False)
+        digest = hashlib.sha256(payload.encode()).hexdigest()
+        self._fetched_at = fetched_at
+
+        if digest != self._digest or self._index is None:
+            # Building is CPU-bound; keep the loop free for thousands of contacts
+            self._index = await asyncio.to_thread(ContactIndex, contacts)
+            self._digest = digest
+            metrics.gauge("contacts.size", len(contacts))
+            logger.info("Contact index rebuilt with %d contacts", len(contacts))
+
+        if persist:
+            try:
+                await get_redis().hset(
+                    REDIS_KEY, mapping={"contacts": payload, "fetched_at": fetched_at}
+                )
+            except RedisError:
+                logger.warning("Could not persist contact directory to Redis", exc_info=True)
+
+    async def _load_from_redis(self) -> bool:
+        try:
+            stored = await get_redis().hgetall(REDIS_KEY)
+        except RedisError:
+            logger.warning("Could not load contact directory from Redis", exc_info=True)
+            return False
+        if not stored:
+            return False
+        contacts = [Contact(name=n, jid=j) for n, j in json.loads(stored["contacts"])]
+        await self._install(contacts, fetched_at=float(stored["fetched_at"]), persist=False)
+        return True
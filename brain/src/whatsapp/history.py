@@ -0,0 +1,119 @@
+"""
+Per-chat ring buffer of recent messages, fed by incoming webhooks.
+
+Each chat keeps its newest ``history_max_messages`` entries in a capped Redis
+list (``history:{jid}``, newest first). Reads are served from it when the chat
+was backfilled from the REST API before (``history:{jid}:primed``) or already
+holds enough entries; otherwise — cold start or an expired buffer — the REST
+API is queried once and the buffer is rebuilt from its answer.
+"""
+
+import json
+import logging
+
+from redis.exceptions import RedisError
+
+from config import settings
+from database.redis import get_redis
+from metrics import metrics
+from whatsapp.client import WhatsAppClient, whatsapp_client
+from whatsapp.models import MessagePayload
+
+logger = logging.getLogger(__name__)
+
+
+def _key(chat_jid: str) -> str:
+    return f"history:{chat_jid}"
+
+
+def _primed_key(chat_jid: str) -> str:
+    return f"history:{chat_jid}:primed"
+
+
+def _from_webhook(msg: MessagePayload) -> dict:
+    return {
+        "id": msg.id,
+        "sender_jid": msg.from_,
+        "sender_name": msg.from_name,
+        "content": msg.body,
+        "media_type": None if msg.message_type == "text" else msg.message_type,
+        "timestamp": msg.timestamp,
+    }
+
+
+def _from_rest(item: dict) -> dict:
+    return {
+        "id": item.get("id"),
+        "sender_jid": item.get("sender_jid"),
+        "sender_name": item.get("sender_name") or item.get("push_name"),
+        "content": item.get("content"),
+        "media_type": item.get("media_type") or None,
+        "timestamp": item.get("timestamp"),
+    }
+
+
+class ChatHistory:
+    """Capped per-chat message history with REST fallback."""
+
+    def __init__(self, client: WhatsAppClient) -> None:
+        self._client = client
+
+    async def record(self, msg: MessagePayload) -> None:
+        """Append an incoming message to its chat's buffer."""
+        key = _key(msg.chat_id)
+        try:
+            async with get_redis().pipeline(transaction=True) as pipe:
+                pipe.lpush(key, json.dumps(_from_webhook(msg), ensure_ascii=False))
+                pipe.ltrim(key, 0, settings.history_max_messages - 1)
+                pipe.expire(key, settings.history_ttl_seconds)
+                pipe.expire(_primed_key(msg.chat_id), settings.history_ttl_seconds)
+                await pipe.execute()
+        except RedisError:
+            # A missing entry only degrades context; drop the buffer so reads go to REST
+            logger.warning("Could not record history for %s", msg.chat_id, exc_info=True)
+            await self._forget(msg.chat_id)
+
+    async def recent(self, chat_jid: str, limit: int = 20) -> list[dict]:
+        """Return up to ``limit`` recent messages of a chat, newest first."""
+        try:
+            async with get_redis().pipeline(transaction=False) as pipe:
+                pipe.lrange(_key(chat_jid), 0, limit - 1)
+                pipe.exists(_primed_key(chat_jid))
+                items, primed = await pipe.execute()
+        except RedisError:
+            logger.warning("History buffer unavailable, using REST", exc_info=True)
+            items, primed = [], False
+
+        if primed or len(items) >= limit:
+            metrics.incr("history.hit")
+            return [json.loads(item) for item in items]
+
+        metrics.incr("history.miss")
+        return await self._backfill(chat_jid, limit)
+
+    async def _backfill(self, chat_jid: str, limit: int) -> list[dict]:
+        fetch = max(limit, settings.history_max_messages)
+        messages = [_from_rest(m) for m in await self._client.get_messages(chat_jid, limit=fetch)]
+        key = _key(chat_jid)
+        try:
+            async with get_redis().pipeline(transaction=True) as pipe:
+                pipe.delete(key)
+                if messages:
+                    # REST answers newest first, same order as the buffer
+                    pipe.rpush(key, *(json.dumps(m, ensure_ascii=False) for m in messages))
+                    pipe.ltrim(key, 0, settings.history_max_messages - 1)
+                    pipe.expire(key, settings.history_ttl_seconds)
+                pipe.set(_primed_key(chat_jid), 1, ex=settings.history_ttl_seconds)
+                await pipe.execute()
+        except RedisError:
+            logger.warning("Could not store backfilled history for %s", chat_jid, exc_info=True)
+        return messages[:limit]
+
+    async def _forget(self, chat_jid: str) -> None:
+        try:
+            await get_redis().delete(_key(chat_jid), _primed_key(chat_jid))
+        except RedisError:
+            pass
+
+
+chat_history = ChatHistory(whatsapp_client)
@@ -1,6 +1,6 @@
 """Pydantic models for the WhatsApp Go REST API webhook payloads."""
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class MessagePayload(BaseModel):
@@ -8,7 +8,7 @@ class MessagePayload(BaseModel):
 
     id: str
     chat_id: str  # JID of the chat (e.g. "5511999999999@s.whatsapp.net" or "...@g.us")
-    from_: str | None = None  # sender JID (alias for 'from' — reserved keyword)
+    from_: str | None = Field(default=None, alias="from")  # sender JID ('from' is reserved)
     from_name: str = ""  # display name of the sender
     body: str | None = None  # text body (for text messages)
     audio: str | None = None  # local file path to OGG audio (voice notes)
@@ -0,0 +1,12 @@
+import pytest
+from fakeredis import FakeAsyncRedis, FakeServer
+
+import database.redis
+
+
+@pytest.fixture
+def redis(monkeypatch: pytest.MonkeyPatch) -> FakeAsyncRedis:
+    """Empty in-memory Redis (with Lua) returned by every ``get_redis()`` call."""
+    fake = FakeAsyncRedis(server=FakeServer(), decode_responses=True)
+    monkeypatch.setattr(database.redis, "_redis", fake)
+    return fake
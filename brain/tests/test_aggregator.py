@@ -0,0 +1,164 @@
+import asyncio
+
+import pytest
+from fakeredis import FakeAsyncRedis
+
+from notifications import aggregator as aggregator_module
+from notifications.aggregator import DUE_KEY, AlertAggregator, PendingAlert
+
+pytestmark = pytest.mark.usefixtures("redis")
+
+WINDOW = 0.05
+
+
+class Sender:
+    """Record sent alerts; optionally fail or run a hook while sending."""
+
+    def __init__(self) -> None:
+        self.sent: list[PendingAlert] = []
+        self.fail = False
+        self.during = None
+
+    async def __call__(self, alert: PendingAlert) -> None:
+        if self.during is not None:
+            await self.during()
+        if self.fail:
+            raise RuntimeError("Alexa unavailable")
+        self.sent.append(alert)
+
+
+def group(urgency: str) -> str:
+    return "high" if urgency in ("HIGH", "CRITICAL") else "normal"
+
+
+def aggregator(send: Sender, *, rate_limit: int = 0) -> AlertAggregator:
+    return AlertAggregator(send, group=group, window=WINDOW, rate_limit=rate_limit, rate_window=60)
+
+
+async def wait_window() -> None:
+    await asyncio.sleep(WINDOW * 2)
+
+
+@pytest.fixture(autouse=True)
+def scripts(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Cached scripts are bound to the client they were registered on
+    monkeypatch.setattr(aggregator_module, "_scripts", {})
+
+
+@pytest.fixture
+def send() -> Sender:
+    return Sender()
+
+
+async def test_alerts_within_the_window_are_merged(send: Sender) -> None:
+    agg = aggregator(send)
+    await agg.submit("Ana", "HIGH", "u1", ["m1"])
+    await agg.submit("Ana", "CRITICAL", "u1", ["m2", "m3"])
+    await agg.submit("Ana", "HIGH", "u1", ["m4"])
+    await wait_window()
+
+    assert await agg.flush_due() == 1
+    [alert] = send.sent
+    assert alert.urgency == "CRITICAL"
+    assert alert.message_ids == ["m1", "m2", "m3", "m4"]
+    assert alert.count == 4
+
+
+async def test_nothing_is_sent_before_the_window_closes(send: Sender) -> None:
+    agg = aggregator(send)
+    await agg.submit("Ana", "HIGH", "u1", ["m1"])
+    assert await agg.flush_due() == 0
+    assert send.sent == []
+
+
+async def test_senders_urgency_classes_and_users_stay_apart(send: Sender) -> None:
+    agg = aggregator(send)
+    await agg.submit("Ana", "HIGH", "u1", ["m1"])
+    await agg.submit("Ana", "MEDIUM", "u1", ["m2"])
+    await agg.submit("Bruno", "HIGH", "u1", ["m3"])
+    await agg.submit("Ana", "HIGH", "u2", ["m4"])
+    await wait_window()
+
+    assert await agg.flush_due() == 4
+    assert sorted(a.message_ids[0] for a in send.sent) == ["m1", "m2", "m3", "m4"]
+
+
+async def test_group_is_removed_once_sent(send: Sender, redis: FakeAsyncRedis) -> None:
+    agg = aggregator(send)
+    await agg.submit("Ana", "HIGH", "u1", ["m1"])
+    await wait_window()
+    await agg.flush_due()
+
+    assert await redis.zcard(DUE_KEY) == 0
+    assert await redis.keys("notify:pending:*") == []
+
+
+async def test_rate_limit_holds_alerts_back(send: Sender, redis: FakeAsyncRedis) -> None:
+    agg = aggregator(send, rate_limit=1)
+    await agg.submit("Ana", "HIGH", "u1", ["m1"])
+    await agg.submit("Bruno", "HIGH", "u1", ["m2"])
+    await wait_window()
+
+    assert await agg.flush_due() == 1
+    assert len(send.sent) == 1
+    # The held group is rescheduled for the next rate window, still pending
+    assert await redis.zcard(DUE_KEY) == 1
+    assert await agg.flush_due() == 0
+
+
+async def test_held_group_keeps_merging(send: Sender, redis: FakeAsyncRedis) -> None:
+    agg = aggregator(send, rate_limit=1)
+    await agg.submit("Ana", "HIGH", "u1", ["m1"])
+    await agg.submit("Bruno", "HIGH", "u1", ["m2"])
+    await wait_window()
+    await agg.flush_due()
+    [sent] = send.sent
+    held = "Bruno" if sent.sender == "Ana" else "Ana"
+    await agg.submit(held, "HIGH", "u1", ["m3"])
+
+    # Next rate window
+    await redis.delete(*await redis.keys("notify:rate:*"))
+    [gid] = await redis.zrange(DUE_KEY, 0, -1)
+    await redis.zadd(DUE_KEY, {gid: 0})
+    assert await agg.flush_due() == 1
+    assert send.sent[1].sender == held
+    assert send.sent[1].message_ids[-1] == "m3"
+    assert send.sent[1].count == 2
+
+
+async def test_failed_send_is_retried_after_the_lease(send: Sender, redis: FakeAsyncRedis) -> None:
+    agg = aggregator(send)
+    await agg.submit("Ana", "HIGH", "u1", ["m1"])
+    await wait_window()
+    send.fail = True
+    assert await agg.flush_due() == 0
+    assert await agg.flush_due() == 0  # still leased
+
+    send.fail = False
+    [gid] = await redis.zrange(DUE_KEY, 0, -1)
+    await redis.zadd(DUE_KEY, {gid: 0})  # lease expired
+    assert await agg.flush_due() == 1
+    assert send.sent[0].message_ids == ["m1"]
+
+
+async def test_alerts_submitted_while_sending_are_kept(send: Sender) -> None:
+    agg = aggregator(send)
+
+    async def late_alert() -> None:
+        send.during = None
+        await agg.submit("Ana", "HIGH", "u1", ["m2"])
+
+    await agg.submit("Ana", "HIGH", "u1", ["m1"])
+    await wait_window()
+    send.during = late_alert
+    assert await agg.flush_due() == 1
+    await wait_window()
+    assert await agg.flush_due() == 1
+    assert [a.message_ids for a in send.sent] == [["m1"], ["m2"]]
+
+
+async def test_any_instance_sends_what_another_stored(send: Sender) -> None:
+    await aggregator(Sender()).submit("Ana", "HIGH", "u1", ["m1"])
+    await wait_window()
+    assert await aggregator(send).flush_due() == 1
+    assert send.sent[0].message_ids == ["m1"]
@@ -0,0 +1,183 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from agents.base import WhatsAppDeps
+from agents.classifier import (
+    BatchNotificationDecisions,
+    KeyedNotificationDecision,
+    NotificationDecision,
+)
+from database.models import UserPreferences
+from database.preferences import PreferencesSnapshot
+from webhook import batcher
+from webhook.batcher import ClassificationBatcher, ClassificationRequest
+
+
+def decision(key: str) -> NotificationDecision:
+    return NotificationDecision(should_notify=True, urgency="MEDIUM", summary=key, reason="test")
+
+
+class FakeAgents:
+    """Stand-ins for both classifier agents, recording every run."""
+
+    def __init__(self) -> None:
+        self.single: list[str] = []
+        self.batches: list[list[str]] = []
+        self.fail_batches_over = 0  # batch runs with more messages than this raise
+        self.skip: set[str] = set()  # ids left out of batch answers
+
+    async def run_single(self, prompt: str, **_: object) -> SimpleNamespace:
+        self.single.append(prompt)
+        return SimpleNamespace(output=decision(prompt))
+
+    async def run_batch(self, prompt: str, **_: object) -> SimpleNamespace:
+        keys = [line.split("]", 1)[0].removeprefix("[message_id=") for line in prompt.split("\n\n")]
+        self.batches.append(keys)
+        if self.fail_batches_over and len(keys) > self.fail_batches_over:
+            raise RuntimeError("model overloaded")
+        return SimpleNamespace(
+            output=BatchNotificationDecisions(
+                decisions=[
+                    KeyedNotificationDecision(message_id=k, **decision(k).model_dump())
+                    for k in keys
+                    if k not in self.skip
+                ]
+            )
+        )
+
+
+@pytest.fixture
+def agents(monkeypatch: pytest.MonkeyPatch) -> FakeAgents:
+    fake = FakeAgents()
+    monkeypatch.setattr(batcher.classifier_agent, "run", fake.run_single)
+    monkeypatch.setattr(batcher.batch_classifier_agent, "run", fake.run_batch)
+    return fake
+
+
+def preferences(*vip: str) -> PreferencesSnapshot:
+    # Batches only compare snapshots, so the VIP list is enough to tell them apart
+    return PreferencesSnapshot.from_model(
+        UserPreferences(
+            vip_contacts=json.dumps(vip),
+            urgent_keywords="[]",
+            important_groups="[]",
+            quiet_hours_start="22:00",
+            quiet_hours_end="07:00",
+        )
+    )
+
+
+def requests(count: int, *vip: str) -> list[ClassificationRequest]:
+    snapshot = preferences(*vip)
+    return [
+        ClassificationRequest(
+            key=f"m{i}",
+            prompt=f"m{i}",
+            deps=WhatsAppDeps(
+                chat_jid=f"chat{i}",
+                recent_messages=[],
+                preferences=snapshot,
+                whatsapp_client=None,
+            ),
+        )
+        for i in range(count)
+    ]
+
+
+def make_batcher(backlog: int, max_batch: int = 8) -> ClassificationBatcher:
+    async def read() -> int:
+        return backlog
+
+    return ClassificationBatcher(backlog=read, threshold=5, max_batch=max_batch, linger=0.01)
+
+
+async def classify_all(
+    classifier: ClassificationBatcher, batch: list[ClassificationRequest]
+) -> list[NotificationDecision]:
+    return await asyncio.gather(*(classifier.classify(r) for r in batch))
+
+
+async def test_small_backlog_classifies_one_by_one(agents: FakeAgents) -> None:
+    batch = requests(3)
+    results = await classify_all(make_batcher(backlog=5), batch)
+    assert [r.summary for r in results] == ["m0", "m1", "m2"]
+    assert sorted(agents.single) == ["m0", "m1", "m2"]
+    assert agents.batches == []
+
+
+async def test_large_backlog_batches_up_to_max_batch(agents: FakeAgents) -> None:
+    batch = requests(5)
+    results = await classify_all(make_batcher(backlog=50, max_batch=3), batch)
+    assert [r.summary for r in results] == ["m0", "m1", "m2", "m3", "m4"]
+    assert agents.batches == [["m0", "m1", "m2"], ["m3", "m4"]]
+    assert agents.single == []
+
+
+async def test_batches_never_mix_preferences(agents: FakeAgents) -> None:
+    plain = requests(2)
+    vip = [
+        ClassificationRequest(key=f"v{i}", prompt=f"v{i}", deps=r.deps)
+        for i, r in enumerate(requests(2, "ana"))
+    ]
+    classifier = make_batcher(backlog=50)
+    await classify_all(classifier, [plain[0], vip[0], plain[1], vip[1]])
+    assert sorted(agents.batches) == [["m0", "m1"], ["v0", "v1"]]
+
+
+async def test_failed_batch_is_split_in_halves(agents: FakeAgents) -> None:
+    agents.fail_batches_over = 2
+    results = await classify_all(make_batcher(backlog=50), requests(4))
+    assert [r.summary for r in results] == ["m0", "m1", "m2", "m3"]
+    assert agents.batches == [["m0", "m1", "m2", "m3"], ["m0", "m1"], ["m2", "m3"]]
+
+
+async def test_failing_single_request_only_fails_its_caller(
+    agents: FakeAgents, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    async def run_single(prompt: str, **_: object) -> SimpleNamespace:
+        if prompt == "m1":
+            raise RuntimeError("bad message")
+        return SimpleNamespace(output=decision(prompt))
+
+    agents.fail_batches_over = 1
+    monkeypatch.setattr(batcher.classifier_agent, "run", run_single)
+    classifier = make_batcher(backlog=50)
+    results = await asyncio.gather(
+        *(classifier.classify(r) for r in requests(2)), return_exceptions=True
+    )
+    assert results[0].summary == "m0"
+    assert isinstance(results[1], RuntimeError)
+
+
+async def test_ids_missing_from_the_answer_are_retried_singly(agents: FakeAgents) -> None:
+    agents.skip = {"m1"}
+    results = await classify_all(make_batcher(backlog=50), requests(3))
+    assert [r.summary for r in results] == ["m0", "m1", "m2"]
+    assert agents.single == ["m1"]
+
+
+@pytest.mark.usefixtures("agents")
+async def test_backlog_is_read_once_per_ttl() -> None:
+    reads = 0
+
+    async def read() -> int:
+        nonlocal reads
+        reads += 1
+        return 0
+
+    classifier = ClassificationBatcher(backlog=read, threshold=5, max_batch=8, linger=0.01)
+    await classify_all(classifier, requests(4))
+    await classify_all(classifier, requests(4))
+    assert reads == 1
+
+
+async def test_unreadable_backlog_means_no_batching(agents: FakeAgents) -> None:
+    async def read() -> int:
+        raise ConnectionError("redis down")
+
+    classifier = ClassificationBatcher(backlog=read, threshold=5, max_batch=8, linger=0.01)
+    await classify_all(classifier, requests(2))
+    assert sorted(agents.single) == ["m0", "m1"]
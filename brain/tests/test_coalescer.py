@@ -0,0 +1,78 @@
+import asyncio
+import time
+
+import pytest
+
+from webhook.coalescer import ChatCoalescer
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.flushes: list[tuple[float, list[int]]] = []
+        self.start = time.monotonic()
+
+    async def __call__(self, items: list[int]) -> None:
+        self.flushes.append((time.monotonic() - self.start, items))
+
+
+async def test_burst_is_flushed_once_after_going_quiet() -> None:
+    flush = Recorder()
+    coalescer = ChatCoalescer(flush, quiet=0.1, max_wait=1.0)
+    waiters = []
+    for i in range(3):
+        waiters.append(coalescer.add("chat", i))
+        await asyncio.sleep(0.03)
+    await asyncio.gather(*waiters)
+
+    [(at, items)] = flush.flushes
+    assert items == [0, 1, 2]
+    assert 0.15 <= at < 0.5  # quiet period counted from the last item
+
+
+async def test_max_wait_caps_a_continuous_stream() -> None:
+    flush = Recorder()
+    coalescer = ChatCoalescer(flush, quiet=0.1, max_wait=0.2)
+    waiters = []
+    for i in range(12):
+        waiters.append(coalescer.add("chat", i))
+        await asyncio.sleep(0.04)
+    await asyncio.gather(*waiters)
+
+    assert len(flush.flushes) >= 2
+    assert [i for _, items in flush.flushes for i in items] == list(range(12))
+    assert flush.flushes[0][0] < 0.35
+
+
+async def test_chats_have_separate_windows() -> None:
+    flush = Recorder()
+    coalescer = ChatCoalescer(flush, quiet=0.05, max_wait=1.0)
+    await asyncio.gather(coalescer.add("a", 1), coalescer.add("b", 2), coalescer.add("a", 3))
+    assert sorted(items for _, items in flush.flushes) == [[1, 3], [2]]
+
+
+async def test_add_returns_before_the_window_closes() -> None:
+    flush = Recorder()
+    coalescer = ChatCoalescer(flush, quiet=0.05, max_wait=1.0)
+    waiter = coalescer.add("chat", 1)
+    assert flush.flushes == []
+    await waiter
+    assert len(flush.flushes) == 1
+
+
+async def test_disabled_window_flushes_each_item() -> None:
+    flush = Recorder()
+    coalescer = ChatCoalescer(flush, quiet=0, max_wait=1.0)
+    await coalescer.submit("chat", 1)
+    await coalescer.submit("chat", 2)
+    assert [items for _, items in flush.flushes] == [[1], [2]]
+
+
+async def test_flush_error_reaches_every_waiter() -> None:
+    async def fail(_items: list[int]) -> None:
+        raise RuntimeError("boom")
+
+    coalescer = ChatCoalescer(fail, quiet=0.05, max_wait=1.0)
+    first, second = coalescer.add("chat", 1), coalescer.add("chat", 2)
+    for waiter in (first, second):
+        with pytest.raises(RuntimeError):
+            await waiter
@@ -0,0 +1,55 @@
+from whatsapp.contacts import Contact, ContactIndex
+
+
+def names(index: ContactIndex, query: str) -> list[str]:
+    return [c.name for c in index.search(query)]
+
+
+def test_exact_full_name_beats_longer_names() -> None:
+    index = ContactIndex([Contact("Diego Santos", "1"), Contact("Diego", "2")])
+    assert names(index, "diego") == ["Diego", "Diego Santos"]
+
+
+def test_accents_and_case_are_folded() -> None:
+    index = ContactIndex([Contact("Júlia Souza", "1"), Contact("Marcos", "2")])
+    assert index.best("JULIA") == Contact("Júlia Souza", "1")
+
+
+def test_every_word_must_prefix_some_name_word() -> None:
+    index = ContactIndex(
+        [Contact("Diego Santos", "1"), Contact("Diego Lima", "2"), Contact("Sara", "3")]
+    )
+    assert names(index, "di sa") == ["Diego Santos"]
+
+
+def test_whole_word_hits_beat_prefix_hits() -> None:
+    index = ContactIndex([Contact("Anabela", "1"), Contact("Ana Paula Rocha", "2")])
+    assert names(index, "ana") == ["Ana Paula Rocha", "Anabela"]
+
+
+def test_first_name_matches_beat_later_words() -> None:
+    index = ContactIndex([Contact("Carla Diego", "1"), Contact("Diego Lima", "2")])
+    assert names(index, "diego") == ["Diego Lima", "Carla Diego"]
+
+
+def test_ties_break_on_name_then_jid() -> None:
+    index = ContactIndex([Contact("Bia", "b"), Contact("Bia", "a"), Contact("Bea", "c")])
+    assert [c.jid for c in index.search("b")] == ["c", "a", "b"]
+
+
+def test_misspelled_names_fall_back_to_trigrams() -> None:
+    index = ContactIndex([Contact("Fernanda Oliveira", "1"), Contact("Roberto", "2")])
+    assert index.best("fernada") == Contact("Fernanda Oliveira", "1")
+
+
+def test_nothing_close_enough() -> None:
+    index = ContactIndex([Contact("Fernanda Oliveira", "1")])
+    assert index.best("xyz") is None
+    assert index.search("   ") == []
+
+
+def test_limit_and_duplicates() -> None:
+    contacts = [Contact(f"Ana {i}", str(i)) for i in range(10)]
+    index = ContactIndex([*contacts, contacts[0]])
+    assert len(index) == 10
+    assert len(index.search("ana", limit=3)) == 3
@@ -0,0 +1,49 @@
+import pytest
+
+from audio.policy import TranscriptionPlan, choose_plan
+from config import settings
+
+
+@pytest.fixture(autouse=True)
+def whisper_settings(monkeypatch: pytest.MonkeyPatch) -> None:
+    for name, value in {
+        "whisper_model": "small",
+        "whisper_model_fast": "base",
+        "whisper_model_accurate": "medium",
+        "whisper_short_seconds": 15.0,
+        "whisper_long_seconds": 120.0,
+        "whisper_pressure_depth": 4,
+    }.items():
+        monkeypatch.setattr(settings, name, value)
+
+
+@pytest.mark.parametrize(
+    ("duration", "vip", "expected"),
+    [
+        (5.0, False, TranscriptionPlan("base", 1)),
+        (60.0, False, TranscriptionPlan("small", 5)),
+        (None, False, TranscriptionPlan("small", 5)),
+        (300.0, False, TranscriptionPlan("medium", 5)),
+        (5.0, True, TranscriptionPlan("medium", 5)),
+    ],
+)
+def test_plan_follows_duration_and_sender(
+    duration: float | None, vip: bool, expected: TranscriptionPlan
+) -> None:
+    assert choose_plan(duration, 0, vip=vip) == expected
+
+
+def test_backlog_steps_down_and_goes_greedy() -> None:
+    assert choose_plan(300.0, 3, vip=False) == TranscriptionPlan("medium", 5)
+    assert choose_plan(300.0, 4, vip=False) == TranscriptionPlan("small", 1)
+    assert choose_plan(300.0, 8, vip=False) == TranscriptionPlan("base", 1)
+    assert choose_plan(300.0, 100, vip=False) == TranscriptionPlan("tiny", 1)
+
+
+def test_vips_never_drop_below_the_default_model() -> None:
+    assert choose_plan(5.0, 100, vip=True) == TranscriptionPlan("small", 1)
+
+
+def test_pressure_can_be_disabled(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "whisper_pressure_depth", 0)
+    assert choose_plan(300.0, 100, vip=False) == TranscriptionPlan("medium", 5)
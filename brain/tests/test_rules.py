@@ -0,0 +1,118 @@
+import json
+
+import pytest
+
+from database.models import UserPreferences
+from database.preferences import PreferencesSnapshot
+from webhook.rules import MessageFacts, evaluate, is_vip
+
+ANA = "5511999990000@s.whatsapp.net"
+GROUP = "120363000000000000@g.us"
+
+
+def preferences(
+    *,
+    vip: tuple[str, ...] = (),
+    keywords: tuple[str, ...] = (),
+    groups: tuple[str, ...] = (),
+    allow_vip: bool = True,
+    group_threshold: int = 5,
+    long_message: int = 300,
+) -> PreferencesSnapshot:
+    return PreferencesSnapshot.from_model(
+        UserPreferences(
+            vip_contacts=json.dumps(vip),
+            urgent_keywords=json.dumps(keywords),
+            important_groups=json.dumps(groups),
+            quiet_hours_start="22:00",
+            quiet_hours_end="07:00",
+            quiet_hours_allow_vip=allow_vip,
+            group_notify_threshold=group_threshold,
+            long_message_threshold=long_message,
+        )
+    )
+
+
+def facts(content: str = "oi", **overrides: object) -> MessageFacts:
+    values = {
+        "chat_jid": ANA,
+        "sender_jid": ANA,
+        "sender_name": "Ana",
+        "is_group": False,
+        "content": content,
+    }
+    return MessageFacts(**{**values, **overrides})
+
+
+def group_facts(content: str = "bom dia", unread: int = 0) -> MessageFacts:
+    return facts(content, chat_jid=GROUP, is_group=True, unread_in_chat=unread)
+
+
+@pytest.mark.parametrize("entry", [ANA, "5511999990000", "ana"])
+def test_vip_matches_jid_phone_or_name(entry: str) -> None:
+    assert is_vip(preferences(vip=(entry,)), facts())
+
+
+def test_vip_with_keyword_is_critical() -> None:
+    prefs = preferences(vip=(ANA,), keywords=("urgente",))
+    decision = evaluate(prefs, facts("é URGENTE, me liga"), quiet_hours=False)
+    assert decision is not None
+    assert decision.should_notify
+    assert decision.urgency == "CRITICAL"
+
+
+def test_keyword_must_be_a_whole_word() -> None:
+    prefs = preferences(vip=(ANA,), keywords=("ajuda",))
+    assert evaluate(prefs, facts("o ajudante chegou"), quiet_hours=False) is None
+
+
+def test_vip_with_keyword_during_quiet_hours_when_vips_allowed() -> None:
+    prefs = preferences(vip=(ANA,), keywords=("urgente",), allow_vip=True)
+    decision = evaluate(prefs, facts("urgente"), quiet_hours=True)
+    assert decision is not None
+    assert decision.urgency == "CRITICAL"
+
+
+def test_vip_with_keyword_during_quiet_hours_goes_to_the_llm_when_vips_muted() -> None:
+    prefs = preferences(vip=(ANA,), keywords=("urgente",), allow_vip=False)
+    assert evaluate(prefs, facts("urgente"), quiet_hours=True) is None
+
+
+def test_keyword_from_non_vip_during_quiet_hours_goes_to_the_llm() -> None:
+    # The keyword fall-through comes before the quiet-hours rule
+    prefs = preferences(keywords=("urgente",))
+    assert evaluate(prefs, facts("urgente"), quiet_hours=True) is None
+
+
+def test_vip_during_quiet_hours_goes_to_the_llm() -> None:
+    assert evaluate(preferences(vip=(ANA,)), facts(), quiet_hours=True) is None
+
+
+def test_plain_message_during_quiet_hours_is_low() -> None:
+    decision = evaluate(preferences(), facts(), quiet_hours=True)
+    assert decision is not None
+    assert not decision.should_notify
+    assert decision.urgency == "LOW"
+
+
+def test_plain_direct_message_goes_to_the_llm() -> None:
+    assert evaluate(preferences(), facts(), quiet_hours=False) is None
+
+
+def test_quiet_group_is_low() -> None:
+    decision = evaluate(preferences(group_threshold=5), group_facts(unread=2), quiet_hours=False)
+    assert decision is not None
+    assert decision.urgency == "LOW"
+
+
+@pytest.mark.parametrize(
+    ("prefs_kwargs", "message"),
+    [
+        ({"groups": (GROUP,)}, group_facts()),
+        ({"group_threshold": 5}, group_facts(unread=5)),
+        ({"long_message": 10}, group_facts("uma mensagem bem comprida")),
+    ],
+    ids=["important", "busy", "long"],
+)
+def test_group_left_to_the_llm(prefs_kwargs: dict, message: MessageFacts) -> None:
+    assert evaluate(preferences(**prefs_kwargs), message, quiet_hours=False) is None
@@ -0,0 +1,69 @@
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from config import settings
+from media.signing import _signature, sign_url, verify
+
+URL = "https://brain.example.com/media/abc.mp3"
+
+
+def params(url: str) -> tuple[str, int, str]:
+    parts = urlsplit(url)
+    query = parse_qs(parts.query)
+    return parts.path.rsplit("/", 1)[-1], int(query["exp"][0]), query["sig"][0]
+
+
+@pytest.fixture
+def secret(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "media_url_secret", "s3cret")
+    monkeypatch.setattr(settings, "media_url_ttl_seconds", 3600)
+
+
+def test_unsigned_without_a_secret(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "media_url_secret", "")
+    assert sign_url(URL) == URL
+    assert verify("abc.mp3", None, None)
+
+
+@pytest.mark.usefixtures("secret")
+def test_signed_url_verifies() -> None:
+    name, expires, signature = params(sign_url(URL))
+    assert name == "abc.mp3"
+    assert 3590 < expires - time.time() <= 3600
+    assert verify(name, expires, signature)
+
+
+@pytest.mark.usefixtures("secret")
+def test_ttl_override() -> None:
+    _, expires, _ = params(sign_url(URL, ttl=60))
+    assert expires - time.time() <= 60
+
+
+@pytest.mark.usefixtures("secret")
+def test_signature_is_bound_to_the_file_and_expiry() -> None:
+    name, expires, signature = params(sign_url(URL))
+    assert not verify("other.mp3", expires, signature)
+    assert not verify(name, expires + 1, signature)
+    assert not verify(name, expires, signature[:-1] + ("A" if signature[-1] != "A" else "B"))
+
+
+@pytest.mark.usefixtures("secret")
+def test_expired_url_is_rejected() -> None:
+    expires = int(time.time()) - 1
+    assert not verify("abc.mp3", expires, _signature("abc.mp3", expires))
+
+
+@pytest.mark.usefixtures("secret")
+def test_missing_parameters_are_rejected() -> None:
+    name, expires, signature = params(sign_url(URL))
+    assert not verify(name, None, signature)
+    assert not verify(name, expires, None)
+
+
+def test_changing_the_secret_invalidates_urls(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "media_url_secret", "old")
+    name, expires, signature = params(sign_url(URL))
+    monkeypatch.setattr(settings, "media_url_secret", "new")
+    assert not verify(name, expires, signature)
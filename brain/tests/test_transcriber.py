@@ -0,0 +1,22 @@
+from audio.transcriber import pack_chunks
+
+
+def test_consecutive_spans_share_a_chunk() -> None:
+    spans = [(0.0, 5.0), (6.0, 12.0), (13.0, 28.0), (29.0, 40.0)]
+    assert pack_chunks(spans, 30.0) == [(0.0, 28.0), (29.0, 40.0)]
+
+
+def test_long_span_is_cut_at_fixed_intervals() -> None:
+    assert pack_chunks([(10.0, 75.0)], 30.0) == [(10.0, 40.0), (40.0, 70.0), (70.0, 75.0)]
+
+
+def test_chunks_never_exceed_the_limit() -> None:
+    spans = [(float(i), i + 0.8) for i in range(0, 200, 3)]
+    chunks = pack_chunks(spans, 20.0)
+    assert all(end - start <= 20.0 for start, end in chunks)
+    assert chunks[0][0] == spans[0][0]
+    assert chunks[-1][1] == spans[-1][1]
+
+
+def test_no_speech_no_chunks() -> None:
+    assert pack_chunks([], 30.0) == []